@@ -0,0 +1,217 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module implements a non-interactive batch mode for the program.
+The grid is loaded once, and route queries are streamed from a file (or standard input), one per line, in the
+csv format:
+
+    start,end[,amenity,amenity,...]
+
+For example "BA,SS,coffee,atm". Empty lines and lines starting with '#' are skipped.
+One JSON object is written to standard output per query, in the order of the queries. A route is written as
+
+    {"line": 1, "start": "BA", "end": "SS", "distance": 512.3, "intersections": [3, 71, ...],
+     "stopovers": [{"amenity": "coffee", "building": "SS", "distance": 0.0, "intersections": [...]}, ...]}
+
+and an invalid or unroutable query as {"line": 2, "error": "..."}.
+With --polyline, every "intersections" list is replaced by a "polyline": the encoded polyline of the coordinates of
+the path (see route_encoding), for clients drawing the routes themselves.
+
+Usage:
+    python batch_query.py queries.csv > routes.jsonl
+    python batch_query.py --workers 4 < queries.csv > routes.jsonl
+    python batch_query.py --profile covered queries.csv > routes.jsonl
+    python batch_query.py --polyline queries.csv > routes.jsonl
+    python batch_query.py --contract --polyline queries.csv > routes.jsonl
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Iterable, Iterator, Optional, TextIO
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+
+import load_all_data
+import route_planning
+from entities import AMENITIES, DISTANCE_MODES, HAVERSINE, SHORTEST, AbstractGrid
+
+DEFAULT_FILES = ('data/building_data.csv', 'data/intersections_data.csv')
+DEFAULT_PROFILE_FILE = 'data/edge_profiles.csv'
+DEFAULT_INDOOR_FILES = ('data/building_entrances.csv', 'data/indoor_edges.csv')
+
+# The weight profile every query is routed on, and whether paths are written as encoded polylines.
+# Set once per process, like _engine.
+_profile = SHORTEST
+_polyline = False
+
+# The routing engine of the current process. Worker processes each load their own in _init_worker.
+_engine: Optional[AbstractGrid] = None
+
+
+def parse_queries(lines: Iterable[str]) -> Iterator[tuple[int, list[str]]]:
+    """Yield the (line number, fields) of every query in lines, skipping empty lines and comments.
+
+    >>> list(parse_queries(['# start,end,amenities', 'BA,SS,coffee', '', 'RL, MP']))
+    [(2, ['BA', 'SS', 'coffee']), (4, ['RL', 'MP'])]
+    """
+    for number, row in enumerate(csv.reader(lines), start=1):
+        fields = [field.strip() for field in row]
+        if not any(fields) or fields[0].startswith('#'):
+            continue
+        yield number, [field for field in fields if field != '']
+
+
+def route_query(engine: AbstractGrid, number: int, fields: list[str], profile: str = SHORTEST,
+                polyline: bool = False) -> dict[str, object]:
+    """Return the JSON-ready result of the query on the given line number, made of the given csv fields,
+    with paths shortest for the given weight profile, written as encoded polylines if polyline is True.
+    """
+    if len(fields) < 2:
+        return {'line': number, 'error': 'expected at least a start and an end building code'}
+    start, end, amenities = fields[0], fields[1], fields[2:]
+    for code in (start, end):
+        if code not in engine.buildings:
+            return {'line': number, 'error': f'unknown building code {code!r}'}
+    for amenity in amenities:
+        if amenity not in AMENITIES:
+            return {'line': number, 'error': f'unknown amenity {amenity!r}'}
+
+    try:
+        route = route_planning.plan_route(engine, start, end, amenities, profile=profile)
+    except ValueError as error:
+        return {'line': number, 'error': str(error)}
+    return {'line': number, **route.as_dict(polyline)}
+
+
+def check_profile(profile: str, profile_file: Optional[str]) -> None:
+    """Raise a ValueError, as AbstractGrid.edge_weights does, if profile is neither SHORTEST nor a profile of
+    profile_file (see load_all_data.load_weight_profiles). Only the header of profile_file is read.
+
+    >>> check_profile('covered', DEFAULT_PROFILE_FILE)
+    >>> check_profile('nope', None)
+    Traceback (most recent call last):
+    ValueError: unknown weight profile 'nope'
+    """
+    if profile == SHORTEST:
+        return
+    if profile_file is None or profile not in load_all_data.weight_profile_names(profile_file):
+        raise ValueError(f'unknown weight profile {profile!r}')
+
+
+def load_engine(building_file: str, intersection_file: str, profile_file: Optional[str] = None,
+                indoor_files: Optional[tuple[str, str]] = None, distance_mode: str = HAVERSINE,
+                contract: bool = False) -> AbstractGrid:
+    """Load the grid (and the weight profiles in profile_file, and the building entrances and indoor edges in
+    indoor_files, if any) from the given files in the given distance mode, and return a routing engine over it.
+    If contract is True, the intersections that only continue a street are contracted away after loading
+    (see load_all_data.contract_degree_two).
+    """
+    grid = load_all_data.load_data(building_file, intersection_file, distance_mode=distance_mode)
+    if indoor_files is not None:
+        load_all_data.load_indoor_edges(grid, *indoor_files)
+    if profile_file is not None:
+        load_all_data.load_weight_profiles(grid, profile_file)
+    if contract:
+        load_all_data.contract_degree_two(grid)
+    return load_all_data.DijkstraGrid(grid.intersections, grid.buildings, grid.weight_profiles, grid.amenity_index)
+
+
+def _init_worker(building_file: str, intersection_file: str, profile_file: Optional[str], profile: str,
+                 indoor_files: Optional[tuple[str, str]], distance_mode: str, contract: bool, polyline: bool) -> None:
+    """Load the routing engine of a worker process, once for all the queries it answers."""
+    global _engine, _profile, _polyline
+    _engine = load_engine(building_file, intersection_file, profile_file, indoor_files, distance_mode, contract)
+    _profile = profile
+    _polyline = polyline
+
+
+def _route_in_worker(query: tuple[int, list[str]]) -> str:
+    """Answer a single query in a worker process, and return its JSON line."""
+    return json.dumps(route_query(_engine, *query, _profile, _polyline))
+
+
+def run_batch(lines: Iterable[str], output: TextIO, building_file: str, intersection_file: str,
+              workers: int = 1, chunk_size: int = 64, profile_file: Optional[str] = None,
+              profile: str = SHORTEST, indoor_files: Optional[tuple[str, str]] = None,
+              distance_mode: str = HAVERSINE, contract: bool = False, polyline: bool = False) -> int:
+    """Route every query in lines, writing one JSON line per query to output, in order.
+    Return the number of queries routed.
+    If workers > 1, the queries are split between that many processes, each loading the grid once.
+    Paths are shortest for the given weight profile, loaded from profile_file unless it is SHORTEST.
+    If indoor_files is not None, paths can pass through the buildings it describes (see load_engine).
+    Distances are measured in the given distance mode (see load_all_data.load_data).
+    If contract is True, the grid is contracted after loading (see load_engine).
+    If polyline is True, paths are written as encoded polylines instead of lists of intersections.
+    Raise a ValueError before routing any query if profile is unknown (see check_profile).
+    """
+    check_profile(profile, profile_file)
+    count = 0
+    queries = parse_queries(lines)
+    if workers <= 1:
+        engine = load_engine(building_file, intersection_file, profile_file, indoor_files, distance_mode, contract)
+        for number, fields in queries:
+            output.write(json.dumps(route_query(engine, number, fields, profile, polyline)) + '\n')
+            count += 1
+    else:
+        with multiprocessing.Pool(workers, _init_worker,
+                                  (building_file, intersection_file, profile_file, profile, indoor_files,
+                                   distance_mode, contract, polyline)) as pool:
+            for line in pool.imap(_route_in_worker, queries, chunksize=chunk_size):
+                output.write(line + '\n')
+                count += 1
+    return count
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Parse the command line arguments and route every query of the input."""
+    parser = argparse.ArgumentParser(description='Route a batch of UofT Speedrunner queries.')
+    parser.add_argument('queries', nargs='?', default='-',
+                        help='csv file of start,end[,amenity,...] queries; - (the default) reads standard input')
+    parser.add_argument('--workers', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--building-file', default=DEFAULT_FILES[0])
+    parser.add_argument('--intersection-file', default=DEFAULT_FILES[1])
+    parser.add_argument('--profile-file', default=DEFAULT_PROFILE_FILE,
+                        help='csv file of edge weight profiles, see load_all_data.load_weight_profiles')
+    parser.add_argument('--profile', default=SHORTEST, help='the weight profile to route on, e.g. covered')
+    parser.add_argument('--entrance-file', default=DEFAULT_INDOOR_FILES[0])
+    parser.add_argument('--indoor-file', default=DEFAULT_INDOOR_FILES[1])
+    parser.add_argument('--no-indoor', action='store_true', help='only route along streets, never through buildings')
+    parser.add_argument('--distance-mode', default=HAVERSINE, choices=DISTANCE_MODES,
+                        help='planar projects coordinates once at load time for cheaper distances')
+    parser.add_argument('--contract', action='store_true',
+                        help='contract the intersections that only continue a street; paths then list fewer '
+                             'intersections, and their polylines keep the exact street shape')
+    parser.add_argument('--polyline', action='store_true',
+                        help='write paths as encoded polylines of their coordinates instead of intersection lists')
+    args = parser.parse_args(argv)
+
+    try:
+        check_profile(args.profile, args.profile_file)
+    except ValueError as error:
+        sys.exit(str(error))
+    options = {'workers': args.workers, 'profile_file': args.profile_file, 'profile': args.profile,
+               'indoor_files': None if args.no_indoor else (args.entrance_file, args.indoor_file),
+               'distance_mode': args.distance_mode, 'contract': args.contract, 'polyline': args.polyline}
+    if args.queries == '-':
+        run_batch(sys.stdin, sys.stdout, args.building_file, args.intersection_file, **options)
+    else:
+        with open(args.queries, newline='') as query_file:
+            run_batch(query_file, sys.stdout, args.building_file, args.intersection_file, **options)
+
+
+if __name__ == '__main__':
+    main()
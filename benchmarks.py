@@ -0,0 +1,560 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains the benchmark suite for the routing engines.
+Every engine registered in ENGINES is run over the real campus data and over synthetic grids of increasing size,
+generated by synthetic_data.py and loaded through load_all_data.load_data.
+For every (dataset, engine) pair we measure:
+- the time needed to load the grid,
+- the preprocessing cost of the engine (the time needed to construct it),
+- the distribution of the query latency over a fixed, seeded set of random queries,
+- the average number of settled intersections per query, also reported relative to plain Dijkstra's algorithm
+  for the goal-directed engines (A* and ALT),
+- the peak memory allocated while loading the grid, preparing the engine and answering one query.
+
+The results are written as a JSON file, so that runs on different commits can be compared with --compare.
+
+With --encoding-routes, the compact route format (encoded polylines, see route_encoding.py) is compared with
+GeoJSON on that many random routes of every dataset: payload size, and encoding and decoding time.
+
+With --entity-memory, the memory retained by the intersections and edges of a synthetic grid with the given
+number of edges is also reported, in bytes per intersection and per edge (see entity_memory).
+
+Usage:
+    python benchmarks.py --sizes 1000 10000 --queries 50 --output bench_results.json
+    python benchmarks.py --output new.json --compare old.json
+    python benchmarks.py --sizes --engines --entity-memory 1000000
+    python benchmarks.py --sizes 10000 --engines --encoding-routes 200
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+import argparse
+import json
+import platform
+import random
+import statistics
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import landmarks
+import load_all_data
+import route_encoding
+import synthetic_data
+from entities import DISTANCE_MODES, HAVERSINE, AbstractGrid, Edge
+from frozen_grid import freeze
+from instrumentation import QueryStats
+from query_planner import QueryPlanner
+
+CAMPUS_FILES = ('data/building_data.csv', 'data/intersections_data.csv')
+CAMPUS_INDOOR_FILES = ('data/building_entrances.csv', 'data/indoor_edges.csv')
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+
+class EngineSpec:
+    """
+    The description of a routing engine in the benchmark suite.
+
+    Instance Attributes:
+      - name: the name of the engine, as used on the command line and in the results
+      - prepare: a function returning an engine (a concrete grid) built on top of the given loaded grid
+      - query: a function running a single query on a prepared engine, returning the path found
+      - max_nodes: the largest grid (in number of intersections) the engine is run on by default
+      - max_queries: the largest number of queries the engine is asked to answer on a single grid
+
+    Representation Invariants:
+      - self.max_nodes > 0
+      - self.max_queries > 0
+    """
+    name: str
+    prepare: Callable[[AbstractGrid], AbstractGrid]
+    query: Callable[[AbstractGrid, int, int, QueryStats], list[Edge]]
+    max_nodes: int
+    max_queries: int
+
+    def __init__(self, name: str, prepare: Callable[[AbstractGrid], AbstractGrid],
+                 query: Callable[[AbstractGrid, int, int, QueryStats], list[Edge]],
+                 max_nodes: int, max_queries: int) -> None:
+        """Initialize a new engine description."""
+        self.name = name
+        self.prepare = prepare
+        self.query = query
+        self.max_nodes = max_nodes
+        self.max_queries = max_queries
+
+
+# The engines run by the suite. Newer engines are registered here.
+ENGINES = {
+    'dijkstra': EngineSpec(
+        'dijkstra',
+        lambda grid: load_all_data.DijkstraGrid(grid.intersections, grid.buildings, grid.weight_profiles,
+                                                grid.amenity_index),
+        lambda engine, id1, id2, stats: engine.find_shortest_path(id1, id2, stats),
+        max_nodes=10_000, max_queries=1000),
+    # Heap-based Dijkstra on the flat arrays of a frozen snapshot, as served to concurrent queries.
+    'frozen': EngineSpec(
+        'frozen',
+        freeze,
+        lambda engine, id1, id2, stats: engine.find_shortest_path(id1, id2, stats),
+        max_nodes=1_000_000, max_queries=1000),
+    # Goal-directed searches: A* on the straight-line distance, and ALT on 8 landmarks, computed in preprocessing.
+    'astar': EngineSpec(
+        'astar',
+        lambda grid: load_all_data.AStarGrid(grid.intersections, grid.buildings, grid.weight_profiles,
+                                             grid.amenity_index),
+        lambda engine, id1, id2, stats: engine.find_shortest_path(id1, id2, stats),
+        max_nodes=100_000, max_queries=1000),
+    'alt': EngineSpec(
+        'alt',
+        lambda grid: landmarks.ALTGrid(grid.intersections, grid.buildings, grid.weight_profiles,
+                                       grid.amenity_index),
+        lambda engine, id1, id2, stats: engine.find_shortest_path(id1, id2, stats),
+        max_nodes=100_000, max_queries=1000),
+    # The engine the query planner picks for every grid (without a landmark table, as none is saved for it).
+    'planner': EngineSpec(
+        'planner',
+        QueryPlanner,
+        lambda engine, id1, id2, stats: engine.find_route(id1, id2, stats),
+        max_nodes=1_000_000, max_queries=1000),
+    # The DFS branch and bound still walks many simple paths on large grids, so it only runs on small ones.
+    'dfs': EngineSpec(
+        'dfs',
+        lambda grid: load_all_data.DFSGrid(grid.intersections, grid.buildings, grid.weight_profiles,
+                                           grid.amenity_index),
+        lambda engine, id1, id2, stats: engine.find_shortest_path(id1, id2, max_distance=1000, stats=stats),
+        max_nodes=1000, max_queries=100),
+}
+
+
+# Datasets
+def load_campus(distance_mode: str = HAVERSINE) -> AbstractGrid:
+    """Load the real St. George campus grid, with its building entrances and indoor edges."""
+    grid = load_all_data.load_data(*CAMPUS_FILES, distance_mode=distance_mode)
+    load_all_data.load_indoor_edges(grid, *CAMPUS_INDOOR_FILES)
+    return grid
+
+
+def synthetic_loader(directory: str, n_nodes: int, seed: int = 0, distance_mode: str = HAVERSINE,
+                     shape_points: int = 0) -> Callable[[], AbstractGrid]:
+    """Write a synthetic dataset of n_nodes intersections (see synthetic_data.py), with streets drawn through
+    shape_points points each, into directory, and return a function loading it with load_all_data.load_data in
+    the given distance mode.
+    """
+    building_file = os.path.join(directory, f'building_data_{n_nodes}_{shape_points}.csv')
+    intersection_file = os.path.join(directory, f'intersections_data_{n_nodes}_{shape_points}.csv')
+    synthetic_data.write_grid_data(building_file, intersection_file, n_nodes, seed=seed, shape_points=shape_points)
+    return lambda: load_all_data.load_data(building_file, intersection_file, distance_mode=distance_mode)
+
+
+# Measurements
+def _latency_summary(latencies: list[float]) -> dict[str, float]:
+    """Return the summary statistics (in seconds) of the given query latencies.
+
+    >>> summary = _latency_summary([1.0, 2.0, 3.0, 4.0])
+    >>> summary['min'], summary['max'], summary['mean']
+    (1.0, 4.0, 2.5)
+    """
+    ordered = sorted(latencies)
+    if len(ordered) >= 2:
+        percentiles = statistics.quantiles(ordered, n=100, method='inclusive')
+        p50, p90, p99 = percentiles[49], percentiles[89], percentiles[98]
+    else:
+        p50 = p90 = p99 = ordered[0]
+    return {'min': ordered[0], 'p50': p50, 'p90': p90, 'p99': p99, 'max': ordered[-1],
+            'mean': statistics.fmean(ordered)}
+
+
+def _random_queries(grid: AbstractGrid, n_queries: int, seed: int) -> list[tuple[int, int]]:
+    """Return n_queries random (start, end) pairs of distinct intersection identifiers of grid."""
+    rng = random.Random(seed)
+    ids = sorted(grid.intersections)
+    return [tuple(rng.sample(ids, 2)) for _ in range(n_queries)]
+
+
+def _peak_memory(loader: Callable[[], AbstractGrid], spec: EngineSpec, query: tuple[int, int]) -> int:
+    """Return the peak memory (in bytes) allocated while loading a grid, preparing the engine and answering
+    a single query. This is measured in a separate pass, because tracing allocations slows everything down.
+    """
+    tracemalloc.start()
+    try:
+        grid = loader()
+        engine = spec.prepare(grid)
+        spec.query(engine, query[0], query[1], QueryStats())
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_benchmark(dataset: str, loader: Callable[[], AbstractGrid], spec: EngineSpec, n_queries: int,
+                  seed: int = 0, measure_memory: bool = True) -> dict[str, object]:
+    """Run a single engine on a single dataset, and return the measurements as a dictionary."""
+    start = time.perf_counter()
+    grid = loader()
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    engine = spec.prepare(grid)
+    preprocessing_time = time.perf_counter() - start
+
+    queries = _random_queries(grid, min(n_queries, spec.max_queries), seed)
+    latencies = []
+    settled = []
+    found = 0
+    for id1, id2 in queries:
+        stats = QueryStats()
+        start = time.perf_counter()
+        path = spec.query(engine, id1, id2, stats)
+        latencies.append(time.perf_counter() - start)
+        settled.append(stats.settled_nodes)
+        found += bool(path)
+
+    result = {
+        'dataset': dataset,
+        'engine': spec.name,
+        'nodes': len(grid.intersections),
+        'buildings': len(grid.buildings),
+        'load_time': load_time,
+        'preprocessing_time': preprocessing_time,
+        'queries': len(queries),
+        'paths_found': found,
+        'latency': _latency_summary(latencies),
+        'mean_settled_nodes': statistics.fmean(settled),
+    }
+    if measure_memory:
+        result['memory_peak_bytes'] = _peak_memory(loader, spec, queries[0])
+    return result
+
+
+def entity_memory(grid: AbstractGrid) -> dict[str, float]:
+    """Return the memory (in bytes) retained by the intersections and edges of grid: the objects themselves, and
+    the attributes they own (street names, coordinates, edge and building sets, endpoints, distances, indices).
+    Objects shared between entities, like the street names of intersections of the same streets, are only counted
+    once. Building objects and the dictionaries of the grid are not counted.
+    """
+    seen = set()
+    node_bytes = edge_bytes = 0
+    edges = set()
+    for intersection in grid.intersections.values():
+        node_bytes += _retained_size(intersection, seen)
+        for value in (intersection.identifier, intersection.name, intersection.coordinates, intersection.projected,
+                      intersection.edges, intersection.close_buildings, intersection.wait_profile):
+            node_bytes += _retained_size(value, seen)
+        edges.update(intersection.edges)
+    for edge in edges:
+        edge_bytes += _retained_size(edge, seen)
+        for value in (edge.endpoints, edge.distance, edge.index, edge.time_profile):
+            edge_bytes += _retained_size(value, seen)
+    return {
+        'nodes': len(grid.intersections),
+        'edges': len(edges),
+        'bytes_per_node': node_bytes / max(len(grid.intersections), 1),
+        'bytes_per_edge': edge_bytes / max(len(edges), 1),
+        'total_bytes': node_bytes + edge_bytes,
+    }
+
+
+def _retained_size(value: object, seen: set[int]) -> int:
+    """Return the size of value (with its __dict__, if it has one, and the strings and numbers it holds, if it is
+    a tuple or frozenset), counting nothing already in seen, the identifiers of the objects counted so far.
+    Values of None, small integers and other cached objects are shared by the whole program: they count as 0.
+    """
+    if value is None or id(value) in seen or (isinstance(value, int) and -5 <= value <= 256):
+        return 0
+    seen.add(id(value))
+    size = sys.getsizeof(value)
+    if hasattr(value, '__dict__'):
+        size += _retained_size(vars(value), seen)
+    if isinstance(value, (tuple, frozenset)):
+        size += sum(_retained_size(item, seen) for item in value if isinstance(item, (str, int, float)))
+    return size
+
+
+def encoding_comparison(dataset: str, grid: AbstractGrid, n_routes: int, seed: int = 0) -> dict[str, object]:
+    """Return the mean payload size (in bytes) and encoding and decoding times (in seconds) of n_routes random
+    routes of grid, as JSON documents holding an encoded polyline and holding a GeoJSON LineString.
+    Decoding includes parsing the JSON document and, for polylines, decoding the coordinates.
+    """
+    engine = freeze(grid)
+    routes = [route for route in (engine.find_route(id1, id2) for id1, id2 in _random_queries(grid, n_routes, seed))
+              if route is not None]
+    encoders = {
+        'polyline': lambda route: json.dumps({'polyline': route_encoding.encode_route(route),
+                                              'distance': route.distance()}),
+        'geojson': lambda route: json.dumps(route_encoding.to_geojson(route)),
+    }
+    decoders = {
+        'polyline': lambda payload: route_encoding.decode_polyline(json.loads(payload)['polyline']),
+        'geojson': lambda payload: json.loads(payload)['geometry']['coordinates'],
+    }
+    result = {'dataset': dataset, 'routes': len(routes),
+              'mean_nodes': statistics.fmean(len(route.nodes) for route in routes) if routes else 0.0}
+    for name, encode in encoders.items():
+        start = time.perf_counter()
+        payloads = [encode(route) for route in routes]
+        encode_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for payload in payloads:
+            decoders[name](payload)
+        decode_time = time.perf_counter() - start
+        result[name] = {
+            'mean_bytes': statistics.fmean(len(payload.encode()) for payload in payloads) if routes else 0.0,
+            'mean_encode_time': encode_time / max(len(routes), 1),
+            'mean_decode_time': decode_time / max(len(routes), 1),
+        }
+    return result
+
+
+def contraction_comparison(dataset: str, grid: AbstractGrid, n_queries: int, seed: int = 0) -> dict[str, object]:
+    """Return the number of intersections and edges of grid before and after load_all_data.contract_degree_two,
+    the time the contraction takes, and the latency of the same n_queries random queries on the frozen snapshot
+    of grid before and after. grid is contracted.
+    """
+    def measure(label: str) -> None:
+        """Record the size of grid and the latency of the queries under the given label."""
+        engine = freeze(grid)
+        latencies = []
+        for id1, id2 in queries:
+            start = time.perf_counter()
+            engine.find_route(id1, id2)
+            latencies.append(time.perf_counter() - start)
+        result[label] = {
+            'nodes': len(grid.intersections),
+            'edges': len(grid.edge_weights()),
+            'latency': _latency_summary(latencies),
+        }
+
+    result = {'dataset': dataset}
+    # queries between intersections that are never contracted (street junctions), so that both grids have them
+    queries = _random_queries(AbstractGrid({identifier: intersection for identifier, intersection
+                                            in grid.intersections.items() if len(intersection.edges) != 2}, {}),
+                              n_queries, seed)
+    measure('before')
+    start = time.perf_counter()
+    load_all_data.contract_degree_two(grid)
+    result['contraction_time'] = time.perf_counter() - start
+    measure('after')
+    return result
+
+
+def _format_contraction(result: dict[str, object]) -> str:
+    """Return a one-line, human-readable summary of a contraction_comparison."""
+    before, after = result['before'], result['after']
+    return (f"{result['dataset']:>18} contracted nodes {before['nodes']} -> {after['nodes']} "
+            f"(x{before['nodes'] / max(after['nodes'], 1):.2f}) edges {before['edges']} -> {after['edges']} "
+            f"in {result['contraction_time']:.2f}s | p50 {before['latency']['p50'] * 1000:.2f}ms -> "
+            f"{after['latency']['p50'] * 1000:.2f}ms")
+
+
+def _format_encoding(result: dict[str, object]) -> str:
+    """Return a one-line, human-readable summary of an encoding_comparison."""
+    parts = [f"{result['dataset']:>18} {result['routes']} routes of {result['mean_nodes']:.0f} nodes"]
+    for name in ('polyline', 'geojson'):
+        measure = result[name]
+        parts.append(f"{name} {measure['mean_bytes']:.0f} B enc={measure['mean_encode_time'] * 1e6:.1f}us "
+                     f"dec={measure['mean_decode_time'] * 1e6:.1f}us")
+    return ' | '.join(parts)
+
+
+def run_suite(sizes: list[int], engines: list[str], n_queries: int, seed: int = 0,
+              max_nodes: Optional[int] = None, measure_memory: bool = True,
+              distance_mode: str = HAVERSINE) -> list[dict[str, object]]:
+    """Run every given engine over the campus grid and over a synthetic grid of every given size, all loaded in
+    the given distance mode.
+    An engine is skipped on the grids larger than its max_nodes (or the given max_nodes, if there is one),
+    and the skip is recorded in the results.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        datasets = [('campus', len(load_campus().intersections), lambda: lambda: load_campus(distance_mode))]
+        for size in sizes:
+            datasets.append((f'synthetic-{size}', size,
+                             lambda size=size: synthetic_loader(directory, size, seed, distance_mode)))
+        return _run_datasets(datasets, engines, n_queries, seed, max_nodes, measure_memory)
+
+
+def _run_datasets(datasets: list[tuple[str, int, Callable[[], Callable[[], AbstractGrid]]]], engines: list[str],
+                  n_queries: int, seed: int, max_nodes: Optional[int], measure_memory: bool) \
+        -> list[dict[str, object]]:
+    """Helper to run_suite, running the engines over every (name, size, make_loader) dataset.
+    The dataset files are only generated (by make_loader) if at least one engine runs on them.
+    """
+    results = []
+    for dataset, size, make_loader in datasets:
+        loader = None
+        for name in engines:
+            spec = ENGINES[name]
+            limit = spec.max_nodes if max_nodes is None else max_nodes
+            if size > limit:
+                results.append({'dataset': dataset, 'engine': name, 'nodes': size, 'skipped': True})
+                continue
+            if loader is None:
+                loader = make_loader()
+            result = run_benchmark(dataset, loader, spec, n_queries, seed, measure_memory)
+            results.append(result)
+            print(_format_result(result), file=sys.stderr)
+    return results
+
+
+def _synthetic_entity_memory(n_edges: int, seed: int, distance_mode: str) -> dict[str, float]:
+    """Return the entity_memory of a synthetic grid with about n_edges edges."""
+    degrees = synthetic_data.DEGREE_WEIGHTS
+    mean_degree = sum(degree * weight for degree, weight in degrees.items()) / sum(degrees.values())
+    with tempfile.TemporaryDirectory() as directory:
+        grid = synthetic_loader(directory, round(2 * n_edges / mean_degree), seed, distance_mode)()
+    return entity_memory(grid)
+
+
+def _format_entity_memory(memory: dict[str, float]) -> str:
+    """Return a one-line, human-readable summary of an entity_memory measurement."""
+    return (f"entities nodes={memory['nodes']} edges={memory['edges']} "
+            f"{memory['bytes_per_node']:.0f} B/node {memory['bytes_per_edge']:.0f} B/edge "
+            f"total={memory['total_bytes'] / 2 ** 20:.1f} MiB")
+
+
+def _format_result(result: dict[str, object]) -> str:
+    """Return a one-line, human-readable summary of a single benchmark result."""
+    latency = result['latency']
+    return (f"{result['dataset']:>18} {result['engine']:>10} nodes={result['nodes']:<8} "
+            f"load={result['load_time']:.3f}s prep={result['preprocessing_time']:.3f}s "
+            f"p50={latency['p50'] * 1000:.2f}ms p99={latency['p99'] * 1000:.2f}ms "
+            f"settled={result['mean_settled_nodes']:.0f}")
+
+
+def compare(old: list[dict[str, object]], new: list[dict[str, object]]) -> list[str]:
+    """Return one line per (dataset, engine) pair present in both runs, with the ratio new / old of
+    the load time, the median latency and the peak memory.
+    """
+    old_by_key = {(r['dataset'], r['engine']): r for r in old if not r.get('skipped')}
+    lines = []
+    for result in new:
+        key = (result['dataset'], result['engine'])
+        if result.get('skipped') or key not in old_by_key:
+            continue
+        before = old_by_key[key]
+        ratios = [f"load x{result['load_time'] / before['load_time']:.2f}",
+                  f"p50 x{result['latency']['p50'] / before['latency']['p50']:.2f}"]
+        if 'memory_peak_bytes' in result and 'memory_peak_bytes' in before:
+            ratios.append(f"memory x{result['memory_peak_bytes'] / before['memory_peak_bytes']:.2f}")
+        lines.append(f'{key[0]:>18} {key[1]:>10} ' + ' '.join(ratios))
+    return lines
+
+
+def settled_reduction(results: list[dict[str, object]], baselines: tuple[str, ...] = ('dijkstra', 'astar')) \
+        -> list[str]:
+    """Return one line per goal-directed (A* or ALT) result, with the ratio of its mean number of settled
+    intersections to that of every baseline engine run on the same dataset.
+
+    >>> results = [{'dataset': 'campus', 'engine': 'dijkstra', 'mean_settled_nodes': 40.0},
+    ...            {'dataset': 'campus', 'engine': 'astar', 'mean_settled_nodes': 20.0},
+    ...            {'dataset': 'campus', 'engine': 'alt', 'mean_settled_nodes': 10.0}]
+    >>> for line in settled_reduction(results):
+    ...     print(line)
+                campus      astar settled x0.50 vs dijkstra
+                campus        alt settled x0.25 vs dijkstra x0.50 vs astar
+    """
+    settled = {(r['dataset'], r['engine']): r['mean_settled_nodes'] for r in results if not r.get('skipped')}
+    lines = []
+    for (dataset, engine), mean in settled.items():
+        if engine not in ('astar', 'alt'):
+            continue
+        ratios = [f'x{mean / settled[(dataset, baseline)]:.2f} vs {baseline}' for baseline in baselines
+                  if baseline != engine and settled.get((dataset, baseline))]
+        if ratios:
+            lines.append(f'{dataset:>18} {engine:>10} settled ' + ' '.join(ratios))
+    return lines
+
+
+def _git_commit() -> Optional[str]:
+    """Return the hash of the current git commit, or None if it cannot be determined."""
+    try:
+        output = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Parse the command line arguments, run the suite and write the results."""
+    parser = argparse.ArgumentParser(description='Benchmark the UofT Speedrunner routing engines.')
+    parser.add_argument('--sizes', type=int, nargs='*', default=list(DEFAULT_SIZES),
+                        help='number of intersections of the synthetic grids')
+    parser.add_argument('--engines', nargs='*', default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument('--queries', type=int, default=50, help='number of random queries per grid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-nodes', type=int, default=None,
+                        help='override the per-engine limit on the grid size')
+    parser.add_argument('--no-memory', action='store_true', help='skip the (slow) peak memory measurement')
+    parser.add_argument('--distance-mode', default=HAVERSINE, choices=DISTANCE_MODES,
+                        help='the distance mode the grids are loaded in (see load_all_data.load_data)')
+    parser.add_argument('--entity-memory', type=int, default=None, metavar='EDGES',
+                        help='also report the memory per intersection and per edge of a synthetic grid with about '
+                             'this many edges')
+    parser.add_argument('--encoding-routes', type=int, default=None, metavar='ROUTES',
+                        help='also compare encoded polylines with GeoJSON on this many routes of every dataset')
+    parser.add_argument('--contraction', type=int, default=None, metavar='SHAPE_POINTS',
+                        help='also contract every synthetic grid, drawn with this many shape points per street, '
+                             'and compare its size and query latency before and after')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help='a previous results file to compare against')
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.engines, args.queries, args.seed, args.max_nodes, not args.no_memory,
+                        args.distance_mode)
+    document = {
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'timestamp': time.time(),
+        'seed': args.seed,
+        'distance_mode': args.distance_mode,
+        'results': results,
+    }
+    if args.encoding_routes is not None:
+        document['encoding'] = []
+        with tempfile.TemporaryDirectory() as directory:
+            loaders = [('campus', lambda: load_campus(args.distance_mode))]
+            loaders.extend((f'synthetic-{size}', synthetic_loader(directory, size, args.seed, args.distance_mode))
+                           for size in args.sizes)
+            for dataset, loader in loaders:
+                document['encoding'].append(encoding_comparison(dataset, loader(), args.encoding_routes, args.seed))
+                print(_format_encoding(document['encoding'][-1]), file=sys.stderr)
+    if args.contraction is not None:
+        document['contraction'] = []
+        with tempfile.TemporaryDirectory() as directory:
+            for size in args.sizes:
+                grid = synthetic_loader(directory, size, args.seed, args.distance_mode, args.contraction)()
+                document['contraction'].append(contraction_comparison(
+                    f'synthetic-{size}+{args.contraction}', grid, args.queries, args.seed))
+                print(_format_contraction(document['contraction'][-1]), file=sys.stderr)
+    if args.entity_memory is not None:
+        document['entity_memory'] = _synthetic_entity_memory(args.entity_memory, args.seed, args.distance_mode)
+        print(_format_entity_memory(document['entity_memory']), file=sys.stderr)
+    with open(args.output, 'w') as output_file:
+        json.dump(document, output_file, indent=2)
+
+    for line in settled_reduction(results):
+        print(line)
+
+    if args.compare is not None:
+        with open(args.compare) as previous_file:
+            previous = json.load(previous_file)
+        for line in compare(previous['results'], results):
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
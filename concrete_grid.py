@@ -6,9 +6,12 @@ Module Description
 This module contains the concrete classes (Concrete Grids) inheriting from AbstractGrid, each implementing
 its graph searching algorithm. Additionally, the module contains other data structures such as Priority Queues needed
 for the implementation of such algorithms.
-There are two concrete classes:
-- DFSGrid, which implements a depth-first search algorithm
+There are five concrete classes:
+- DFSGrid, which implements a depth-first branch-and-bound search algorithm
 - DijkstraGrid, whcih implements Dijkstra's algorithm
+- AStarGrid, which implements the A* algorithm, guided by the straight-line distance to the destination
+- TimeDependentDijkstraGrid, which implements Dijkstra's algorithm on walking times that depend on the time of day
+- ParetoGrid, which implements a bi-criteria label-setting search, returning every non-dominated path
 
 Copyright and Usage Information
 ===============================
@@ -21,22 +24,47 @@ this code, whether modified or otherwise.
 This file is Copyright (c) 2023.
 Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
 """
+from __future__ import annotations
+from typing import Callable, Iterator, Optional
+import heapq
+import logging
 import math
-from entities import Building, Intersection, AbstractGrid, Edge
+import time
+from array import array
+from entities import AmenityIndex, Building, Intersection, AbstractGrid, Edge, Route, SHORTEST, WALKING_SPEED, \
+    distance_between, time_slot
+from instrumentation import QueryStats, phase
+
+logger = logging.getLogger(__name__)
+
+# The built-in secondary criterion of ParetoGrid: the number of junctions (street intersections where three or
+# more streets meet, or with a waiting time to cross) a path walks through, counting its last intersection.
+CROSSINGS = 'crossings'
 
 
 class DFSGrid(AbstractGrid):
     """A concrete class for AbstractGrid.
     It finds the shortest path between two buildings using a Depth First Search Algorithm
+
+    The search is a branch and bound: it walks the simple paths from the start depth first, with an explicit
+    stack, and abandons a path as soon as its length plus a lower bound on the rest is no shorter than the best
+    complete path found so far. The bound is the straight-line distance (scaled as in AStarGrid) left to the
+    destination, through the farthest intermediate intersection not visited yet.
     """
+    # Private Instance Attributes:
+    #   - _scales: the scale of the straight-line bound of every weight profile searched so far
+    _scales: dict[str, float]
 
     def __init__(self, intersections: dict[int, Intersection],
-                 buildings: dict[str, Building]) -> None:
+                 buildings: dict[str, Building],
+                 weight_profiles: Optional[dict[str, array]] = None,
+                 amenity_index: Optional[AmenityIndex] = None) -> None:
         """Initialize a DFSGrid object, representing a map of the U of T campus"""
-        AbstractGrid.__init__(self, intersections, buildings)
+        AbstractGrid.__init__(self, intersections, buildings, weight_profiles, amenity_index)
+        self._scales = {}
 
-    def find_shortest_path(self, id1: int, id2: int, intermediates: set[int] = None, max_distance: int = 2000) \
-            -> list[Edge]:
+    def find_shortest_path(self, id1: int, id2: int, intermediates: set[int] = None, max_distance: int = 2000,
+                           stats: Optional[QueryStats] = None, profile: str = SHORTEST) -> list[Edge]:
         """Find the shortest path between two intertersections in the grid (using DFS) while accounting for
         any intermediate and unordered intersections along the way.
 
@@ -44,55 +72,134 @@ class DFSGrid(AbstractGrid):
         representing the shortest possible walking distance to get from the start to the destination.
 
         If no path exists that traverses through *all* intermediate intersections in an allotted total distance length,
-        a path list will be returned that goes through as many as possible. *
+        an empty list is returned.
 
         id1: The starting intersection.
         id2: The ending intersection.
         intermediates: The set of intesection identifiers that can be visited in any order in between
          visiting id1 and id2. If nothing is passed, it is defaulted to None.
         max_distance: The maximum distance (in meters) of the total path distance that the algorithm will check.
-         Set to 2000m (2km) by default. 2000m will take about 4 seconds with an empty intermediates set.
-         3000m will take about 15 seconds with the same set.
+         Set to 2000m (2km) by default.
 
-         NOTE: if the algorith is returning None, this may be because you inputted many intermediates and
+         NOTE: if the algorith is returning an empty list, this may be because you inputted many intermediates and
           a path cannot be found under the given max_distance. To fix this, try increasing the max_distance parameter
           by increments of 500m until a path is returned.
-
-        * Not implemented yet *
+        stats: An optional QueryStats object collecting the counters and phase timings of this query.
+        profile: The weight profile (see AbstractGrid.weight_profiles) whose weights are used instead of distances,
+         both for comparing paths and for max_distance.
         """
-        # 1. Store all the paths (under a certain total distance) in a single list.
-        start_intersection = self.intersections[id1]
-        all_paths = start_intersection.find_all_paths(id2, set(), max_distance)
+        if not self.connected(id1, id2):
+            return []
 
-        # 2. Fix the variables to store the shortest path.
-        shortest_so_far = math.inf
         shortest_path_so_far = []
+        with phase(stats, 'search'):
+            for path in self.candidate_paths(id1, id2, intermediates, max_distance, stats, profile):
+                shortest_path_so_far = path
+        return shortest_path_so_far
 
-        # 3. Loop through all the paths.
-        if intermediates is None or len(intermediates) == 0:
-            # 3. A. In this case, we have no intermedidate intersections.
-            for path in all_paths:
-                path_distance = sum(e.distance for e in path)
-                if path_distance < shortest_so_far:
-                    shortest_so_far = path_distance
-                    shortest_path_so_far = path
-        else:
-            for path in all_paths:
-                # 3. B. In this case, make a list (or set, doesn't matter) of all intersection IDs we've been to.
-                # This way, we can simply check that all the intermediates are in the path.
-                list_of_ids = []
-                for edge in path:
-                    list_of_ids.extend(
-                        [endpoint.identifier for endpoint in edge.endpoints])
-                if all(intermediate in list_of_ids
-                       for intermediate in intermediates):
-                    # 3. C. If this is the case: continue checking by comparing path distances.
-                    path_distance = sum(e.distance for e in path)
-                    if path_distance < shortest_so_far:
-                        shortest_so_far = path_distance
-                        shortest_path_so_far = path
+    def candidate_paths(self, id1: int, id2: int, intermediates: Optional[set[int]] = None,
+                        max_distance: float = 2000, stats: Optional[QueryStats] = None,
+                        profile: str = SHORTEST) -> Iterator[list[Edge]]:
+        """Generate paths from id1 to id2 visiting every intersection of intermediates and shorter than
+        max_distance (in the given weight profile), each one strictly shorter than the one before: the last path
+        generated is the shortest one (see find_shortest_path).
 
-        return shortest_path_so_far
+        The paths are generated as the search finds them, so a caller can stop the search at any time (and keep
+        the best path so far) by no longer asking for paths. The search only keeps the current path in memory.
+        If stats is not None, every intersection added to the current path and every edge leaving it is counted.
+
+        Preconditions:
+         - id1 in self.intersections
+         - id2 in self.intersections
+        """
+        weights = self.edge_weights(profile)
+        scale = self._scale(profile)
+        target = self.intersections[id2]
+        intermediates = set() if intermediates is None else set(intermediates) - {id2}
+        # the intermediates as intersections, and the straight-line lower bound from each of them to id2
+        waypoints = [self.intersections[identifier] for identifier in intermediates]
+        waypoint_bounds = [scale * distance_between(waypoint, target) for waypoint in waypoints]
+        straight_lines = {}  # the straight-line bounds from every intersection reached to id2 and to the waypoints
+
+        def lower_bound(intersection: Intersection) -> float:
+            """Return a lower bound on the weight of the rest of a path through intersection: the path must still
+            reach id2, through every waypoint not on the current path.
+            """
+            if intersection not in straight_lines:
+                straight_lines[intersection] = [scale * distance_between(intersection, point)
+                                                for point in [target] + waypoints]
+            bounds = straight_lines[intersection]
+            best_bound = bounds[0]
+            for i in range(len(waypoints)):
+                if waypoints[i] not in on_path:
+                    best_bound = max(best_bound, bounds[i + 1] + waypoint_bounds[i])
+            return best_bound
+
+        def ordered_edges(intersection: Intersection) -> list[tuple[float, Edge, Intersection]]:
+            """Return (weight of edge plus the lower bound of the rest, edge, neighbour) for every edge of
+            intersection, most promising last, as they are popped from the end.
+            """
+            candidates = []
+            for edge in intersection.edges:
+                neighbour = edge.get_other_endpoint(intersection)
+                candidates.append((weights[edge.index] + lower_bound(neighbour), edge, neighbour))
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            return candidates
+
+        start = self.intersections[id1]
+        if id1 == id2:
+            if not intermediates:
+                yield []
+            return
+
+        best = math.inf
+        path, distances, on_path = [], [0.0], {start}
+        missing = len(intermediates - {id1})  # the intermediates not on the current path
+        stack = [ordered_edges(start)]  # the edges left to try from every intersection of the current path
+        current = start
+        if stats is not None:
+            stats.settled_nodes += 1
+            stats.edge_relaxations += len(start.edges)
+        while stack:
+            if not stack[-1]:
+                # every edge from the current intersection was tried: backtrack
+                stack.pop()
+                if path:
+                    if current.identifier in intermediates:
+                        missing += 1
+                    on_path.remove(current)
+                    current = path.pop().get_other_endpoint(current)
+                    distances.pop()
+                continue
+
+            bound, edge, neighbour = stack[-1].pop()
+            distance = distances[-1] + weights[edge.index]
+            if neighbour in on_path or distances[-1] + bound >= min(best, max_distance):
+                continue
+            if neighbour is target:
+                if missing == 0:
+                    best = distance
+                    yield path + [edge]
+                continue
+
+            if stats is not None:
+                stats.settled_nodes += 1
+                stats.edge_relaxations += len(neighbour.edges)
+                if stats.on_settle is not None:
+                    stats.on_settle(neighbour.identifier)
+            path.append(edge)
+            distances.append(distance)
+            on_path.add(neighbour)
+            if neighbour.identifier in intermediates:
+                missing -= 1
+            current = neighbour
+            stack.append(ordered_edges(neighbour))
+
+    def _scale(self, profile: str) -> float:
+        """Return the scale of the straight-line lower bound of the given profile (see _straight_line_scale)."""
+        if profile not in self._scales:
+            self._scales[profile] = _straight_line_scale(self, self.edge_weights(profile))
+        return self._scales[profile]
 
 
 class DijkstraGrid(AbstractGrid):
@@ -102,49 +209,81 @@ class DijkstraGrid(AbstractGrid):
     """
 
     def __init__(self, intersections: dict[int, Intersection],
-                 buildings: dict[str, Building]) -> None:
+                 buildings: dict[str, Building],
+                 weight_profiles: Optional[dict[str, array]] = None,
+                 amenity_index: Optional[AmenityIndex] = None) -> None:
         """Initialize a DijkstraGrid object, representing a map of the U of T campus"""
-        AbstractGrid.__init__(self, intersections, buildings)
+        AbstractGrid.__init__(self, intersections, buildings, weight_profiles, amenity_index)
 
-    def find_shortest_path(self, id1: int, id2: int) -> list[Edge]:
+    def find_shortest_path(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST) -> list[Edge]:
         """Find the shortest path between two intertersections in the Dijkstra Grid.
         The optimal (shortest) path is defined as the list of edges with the least sum of their edge.distance attribute,
         representing the shortest possible walking distance to get from the start to the destination.
         We treat #1 as the START and #2 as the END.
-        Input: The identifiers of the two intersections.
+        Input: The identifiers of the two intersections, an optional QueryStats object collecting the counters
+        and phase timings of this query, and the weight profile to search on (see AbstractGrid.weight_profiles).
         Output: The edges connecting all intersections, in order, to visit (including intersection1 and intersection 2).
         """
-        path_of_intersections = self.find_path_dijkstra(id1, id2)
-
-        # convert the list of intersection into a list of edges
-        if not path_of_intersections:
-            print('Sorry, it seems like your destination is not reacheable :(')
+        route = self.find_route(id1, id2, stats, profile)
+        if route is None:
+            logger.warning('Sorry, it seems like your destination is not reacheable :(')
         else:
-            path_with_edges = []
-            for i in range(len(path_of_intersections) - 1):
-                first_intersection = self.intersections[path_of_intersections[i]]
-                second_intersection = self.intersections[path_of_intersections[i + 1]]
-                edge = first_intersection.find_edge(second_intersection)
-                path_with_edges.append(edge)
-            return path_with_edges
-
-    def find_path_dijkstra(self, id1: int, id2: int) -> list[int]:
+            return route.edges
+
+    def find_route(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                   profile: str = SHORTEST) -> Optional[Route]:
+        """Return the shortest route from id1 to id2 using Dijkstra's algorithm, or None if id2 is not reachable.
+        The route is built in a single pass over the predecessor edges recorded during the search.
+        If stats is not None, the search counters and timings are added to it.
+        Edges are weighted by the given weight profile (see AbstractGrid.weight_profiles); edges of infinite
+        weight are never used.
+        """
+        weights = self.edge_weights(profile)
+        if not self.connected(id1, id2):
+            return None  # in another connected component: no need to search
+        with phase(stats, 'search'):
+            predecessors = self._search_dijkstra(id1, id2, stats, weights)
+
+        if id2 not in predecessors:
+            return None
+        with phase(stats, 'reconstruction'):
+            return _route_from_predecessors(self, id1, id2, predecessors)
+
+    def find_path_dijkstra(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST) -> list[int]:
         """Finds the optimal path from id1 to id2 using an implementation of Dijkstra's algorithm.
-        This method returns the IDs of all Intersections that must be visited to obtain the shortest path.
+        This method returns the IDs of all Intersections that must be visited to obtain the shortest path,
+        or an empty list if there is no path (see find_route).
+        """
+        route = self.find_route(id1, id2, stats, profile)
+        if route is None:
+            return []
+        return route.identifiers()
+
+    def _search_dijkstra(self, id1: int, id2: int, stats: Optional[QueryStats],
+                         weights: array) -> dict[int, Optional[Edge]]:
+        """Helper to find_route, running the actual search.
         This implementation uses a Priority Queue, and some minor adjustments have been made in the base
         logic of the algorithm to practically accomodate for our code and purposes (further details in the report)
+        Return the last edge of the shortest path to every dequeued intersection reachable from id1
+        (None for id1 itself). The search stops as soon as id2 is dequeued.
         """
         source = self.intersections[id1]  # source is the intersection object corresponding to integer id1
 
         labeled_intersections = {
-            i.identifier: [math.inf, id1]
+            i.identifier: [math.inf, None]
             for i in self.intersections.values()
         }  # labelled_intersections is a dictionary of intersections that stores the id of an intersection as key and
-        # a list containing the known distance from start to this intersection and last intersection visited as value
+        # a list containing the known distance from start to this intersection and the last edge walked as value
         labeled_intersections[source.identifier] = [0, None]
-        dequeued = []
+        predecessors = {}
         queue = _PriorityQueue()
 
+        # local counters, only reported when stats is not None
+        settled = relaxations = queue_operations = 0
+        on_settle = None if stats is None else stats.on_settle
+
         # enqeueue all intersections with an initial distance and previous node
         for intersection_id in self.intersections:
             if intersection_id == id1:
@@ -154,52 +293,515 @@ class DijkstraGrid(AbstractGrid):
                 distance = math.inf
                 prev_id = id1
             queue.enqueue(distance, intersection_id, prev_id)
+        queue_operations += len(self.intersections)
 
-        while not queue.is_empty() and id2 not in [i[0] for i in dequeued]:
+        while not queue.is_empty() and id2 not in predecessors:
             current_id = queue.dequeue()
+            queue_operations += 1
+            if labeled_intersections[current_id][0] == math.inf:
+                break  # every intersection left in the queue is unreachable
+            settled += 1
+            if on_settle is not None:
+                on_settle(current_id)
             current_intersection = self.intersections[current_id]
             for edge in current_intersection.edges:  # for every edge connected to this intersection
+                relaxations += 1
                 neighbour = edge.get_other_endpoint(current_intersection)  # getting a neighbour to that intersection
-                new_distance = labeled_intersections[current_id][0] + edge.distance
+                new_distance = labeled_intersections[current_id][0] + weights[edge.index]
                 old_distance = labeled_intersections[neighbour.identifier][0]
                 if new_distance < old_distance:
                     queue.remove(neighbour.identifier)
                     queue.enqueue(new_distance, neighbour.identifier,
                                   current_id)
-                    labeled_intersections[neighbour.identifier] = [new_distance, current_id]
+                    queue_operations += 2
+                    labeled_intersections[neighbour.identifier] = [new_distance, edge]
+
+            predecessors[current_id] = labeled_intersections[current_id][1]
+
+        if stats is not None:
+            stats.add_search_counts(settled, relaxations, queue_operations)
 
-            prev = labeled_intersections[current_id][1]
-            dequeued.append((current_id, prev))
+        return predecessors
 
-        if id2 in [i[0] for i in dequeued]:
-            path_of_ids = self.traceback_dijkstra(dequeued)
-            return path_of_ids
-        else:  # queue.is_empty and destination was not dequeued => we haven't found a path
+    def shortest_path_tree(self, source_id: int, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST) -> ShortestPathTree:
+        """Run Dijkstra's algorithm from source_id until every reachable intersection is settled, and return
+        the resulting shortest-path tree. The shortest path from source_id to any intersection can then be read
+        from the tree without searching again.
+        If stats is not None, the search counters and timings are added to it.
+        Edges are weighted by the given weight profile (see AbstractGrid.weight_profiles).
+
+        Preconditions:
+         - source_id in self.intersections
+        """
+        weights = self.edge_weights(profile)
+        with phase(stats, 'search'):
+            distances = {source_id: 0.0}
+            predecessors = {}
+            settled = set()
+            heap = [(0.0, source_id)]
+            relaxations = queue_operations = 0
+            on_settle = None if stats is None else stats.on_settle
+
+            while heap:
+                distance, current_id = heapq.heappop(heap)
+                queue_operations += 1
+                if current_id in settled:
+                    continue  # a stale entry, superseded by a shorter distance
+                settled.add(current_id)
+                if on_settle is not None:
+                    on_settle(current_id)
+                current_intersection = self.intersections[current_id]
+                for edge in current_intersection.edges:
+                    relaxations += 1
+                    neighbour_id = edge.get_other_endpoint(current_intersection).identifier
+                    new_distance = distance + weights[edge.index]
+                    if new_distance < distances.get(neighbour_id, math.inf):
+                        distances[neighbour_id] = new_distance
+                        predecessors[neighbour_id] = edge
+                        heapq.heappush(heap, (new_distance, neighbour_id))
+                        queue_operations += 1
+
+            if stats is not None:
+                stats.add_search_counts(len(settled), relaxations, queue_operations)
+
+        return ShortestPathTree(self, source_id, distances, predecessors, profile)
+
+
+class AStarGrid(DijkstraGrid):
+    """
+    A concrete class for AbstractGrid.
+    It finds the shortest path between two intersections using the A* algorithm: Dijkstra's algorithm, where
+    intersections are settled in order of their distance from the start plus a lower bound on their distance to
+    the destination, so that the search is drawn towards the destination instead of growing in every direction.
+
+    The lower bound is the straight-line distance to the destination (see distance_between), scaled so that it never
+    exceeds the weight of any edge of the weight profile searched (see _scale). Subclasses can give tighter bounds
+    by overriding lower_bound.
+    """
+    # Private Instance Attributes:
+    #   - _scales: the scale of the straight-line bound of every weight profile searched so far
+    _scales: dict[str, float]
+
+    def __init__(self, intersections: dict[int, Intersection],
+                 buildings: dict[str, Building],
+                 weight_profiles: Optional[dict[str, array]] = None,
+                 amenity_index: Optional[AmenityIndex] = None) -> None:
+        """Initialize an AStarGrid object, representing a map of the U of T campus"""
+        DijkstraGrid.__init__(self, intersections, buildings, weight_profiles, amenity_index)
+        self._scales = {}
+
+    def find_route(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                   profile: str = SHORTEST) -> Optional[Route]:
+        """Return the shortest route from id1 to id2 using the A* algorithm, or None if id2 is not reachable.
+        The route found is as short as the one found by DijkstraGrid.find_route, for fewer settled intersections.
+        If stats is not None, the search counters and timings are added to it.
+        Edges are weighted by the given weight profile (see AbstractGrid.weight_profiles); edges of infinite
+        weight are never used.
+        """
+        weights = self.edge_weights(profile)
+        if not self.connected(id1, id2):
+            return None  # in another connected component: no need to search
+        with phase(stats, 'search'):
+            predecessors = self._search_astar(id1, id2, stats, weights, self.lower_bound(id2, profile))
+
+        if id2 not in predecessors:
+            return None
+        with phase(stats, 'reconstruction'):
+            return _route_from_predecessors(self, id1, id2, predecessors)
+
+    def lower_bound(self, target_id: int, profile: str = SHORTEST) -> Callable[[int], float]:
+        """Return a function giving, for any intersection identifier, a lower bound on the weight of the shortest
+        path from that intersection to target_id in the given weight profile.
+        The bound must be consistent: it never decreases by more than the weight of an edge along that edge.
+        """
+        scale = self._scale(profile)
+        target = self.intersections[target_id]
+        return lambda identifier: scale * distance_between(self.intersections[identifier], target)
+
+    def _scale(self, profile: str) -> float:
+        """Return the scale of the straight-line lower bound of the given profile (see _straight_line_scale)."""
+        if profile not in self._scales:
+            self._scales[profile] = _straight_line_scale(self, self.edge_weights(profile))
+        return self._scales[profile]
+
+    def _search_astar(self, id1: int, id2: int, stats: Optional[QueryStats], weights: array,
+                      bound: Callable[[int], float]) -> dict[int, Optional[Edge]]:
+        """Helper to find_route, running the actual search with a binary heap, ordered by the distance from id1
+        plus the given lower bound on the distance to id2.
+        Return the last edge of the shortest path to every settled intersection (None for id1 itself).
+        The search stops as soon as id2 is settled.
+        """
+        distances = {id1: 0.0}
+        labels = {id1: None}
+        predecessors = {}
+        heap = [(bound(id1), id1)]
+        relaxations = queue_operations = 0
+        on_settle = None if stats is None else stats.on_settle
+
+        while heap and id2 not in predecessors:
+            _, current_id = heapq.heappop(heap)
+            queue_operations += 1
+            if current_id in predecessors:
+                continue  # a stale entry, superseded by a shorter distance
+            predecessors[current_id] = labels[current_id]
+            if on_settle is not None:
+                on_settle(current_id)
+            current_intersection = self.intersections[current_id]
+            for edge in current_intersection.edges:
+                relaxations += 1
+                neighbour_id = edge.get_other_endpoint(current_intersection).identifier
+                new_distance = distances[current_id] + weights[edge.index]
+                if new_distance < distances.get(neighbour_id, math.inf):
+                    distances[neighbour_id] = new_distance
+                    labels[neighbour_id] = edge
+                    heapq.heappush(heap, (new_distance + bound(neighbour_id), neighbour_id))
+                    queue_operations += 1
+
+        if stats is not None:
+            stats.add_search_counts(len(predecessors), relaxations, queue_operations)
+
+        return predecessors
+
+
+class TimeDependentDijkstraGrid(DijkstraGrid):
+    """
+    A concrete class for AbstractGrid.
+    It finds the fastest walking route between two intersections for a given departure time, using Dijkstra's
+    algorithm on walking times: the time_profile of every edge (the time needed to walk it) and the wait_profile of
+    every intersection (the time spent waiting to cross it) are looked up for the time slot in which they are
+    reached. Both profiles are precomputed per time slot when they are loaded (see load_all_data.load_time_profiles),
+    so each relaxation costs an index lookup, like the static search.
+
+    The result is exact when the profiles never let a later arrival leave an intersection earlier, which holds
+    for waits that change by less than the length of a time slot between consecutive slots.
+
+    A weight profile other than SHORTEST scales the walking time of every edge by its weight in that profile
+    divided by its distance, so that edges of infinite weight are never used.
+    """
+
+    def find_shortest_path(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST, departure: Optional[float] = None) -> Optional[list[Edge]]:
+        """Return the edges of the fastest walking route from id1 to id2, leaving at the given departure time
+        (in seconds since midnight; the current time of day if departure is None), or None if id2 is not reachable.
+        If stats is not None, the search counters and timings are added to it.
+
+        Preconditions:
+         - id1 in self.intersections
+         - id2 in self.intersections
+        """
+        route = self.find_route(id1, id2, stats, profile, departure)
+        if route is None:
+            logger.warning('Sorry, it seems like your destination is not reacheable :(')
+            return None
+        return route.edges
+
+    def find_route(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                   profile: str = SHORTEST, departure: Optional[float] = None) -> Optional[Route]:
+        """Return the fastest walking route from id1 to id2, leaving at the given departure time (the current
+        time of day if departure is None), or None if id2 is not reachable.
+        """
+        route, _ = self.find_fastest_route(id1, id2, _now() if departure is None else departure, stats, profile)
+        return route
+
+    def find_fastest_path(self, id1: int, id2: int, departure: float, stats: Optional[QueryStats] = None,
+                          profile: str = SHORTEST) -> tuple[Optional[list[Edge]], float]:
+        """Return the edges of the fastest walking route from id1 to id2 leaving at departure (in seconds since
+        midnight), together with the arrival time at id2 (in seconds since midnight of the departure day).
+        If id2 is not reachable, return (None, math.inf).
+        Waiting is counted at every intersection crossed, but not at id1 and id2 themselves.
+
+        Preconditions:
+         - id1 in self.intersections
+         - id2 in self.intersections
+        """
+        route, arrival = self.find_fastest_route(id1, id2, departure, stats, profile)
+        return (None if route is None else route.edges), arrival
+
+    def find_fastest_route(self, id1: int, id2: int, departure: float, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST) -> tuple[Optional[Route], float]:
+        """Return the fastest walking route from id1 to id2 leaving at departure, together with the arrival time
+        at id2, or (None, math.inf) if id2 is not reachable (see find_fastest_path).
+
+        Preconditions:
+         - id1 in self.intersections
+         - id2 in self.intersections
+        """
+        weights = None if profile == SHORTEST else self.edge_weights(profile)
+        if not self.connected(id1, id2):
+            return None, math.inf
+        with phase(stats, 'search'):
+            # leave[i] is the earliest time the route can leave intersection i, after crossing it
+            leave = {id1: departure}
+            predecessors = {}
+            settled = set()
+            heap = [(departure, id1)]
+            relaxations = queue_operations = 0
+            arrival = math.inf
+
+            while heap:
+                current_time, current_id = heapq.heappop(heap)
+                queue_operations += 1
+                if current_id in settled:
+                    continue
+                settled.add(current_id)
+                if current_id == id2:
+                    arrival = current_time
+                    break
+                current_intersection = self.intersections[current_id]
+                slot = time_slot(current_time)
+                for edge in current_intersection.edges:
+                    relaxations += 1
+                    neighbour = edge.get_other_endpoint(current_intersection)
+                    if weights is None:
+                        new_time = current_time + edge.walking_time(slot)
+                    elif edge.distance > 0:
+                        new_time = current_time + edge.walking_time(slot) * weights[edge.index] / edge.distance
+                    else:
+                        new_time = current_time + weights[edge.index] / WALKING_SPEED
+                    wait_profile = neighbour.wait_profile
+                    if wait_profile is not None and neighbour.identifier != id2:
+                        new_time += wait_profile[time_slot(new_time)]
+                    if new_time < leave.get(neighbour.identifier, math.inf):
+                        leave[neighbour.identifier] = new_time
+                        predecessors[neighbour.identifier] = edge
+                        heapq.heappush(heap, (new_time, neighbour.identifier))
+                        queue_operations += 1
+
+            if stats is not None:
+                stats.add_search_counts(len(settled), relaxations, queue_operations)
+
+        if arrival == math.inf:
+            return None, math.inf
+        with phase(stats, 'reconstruction'):
+            route = _route_from_predecessors(self, id1, id2, predecessors)
+        return route, arrival
+
+
+class ParetoGrid(DijkstraGrid):
+    """
+    A concrete class for AbstractGrid.
+    It finds the Pareto front of the paths between two intersections for two criteria: the distance (weighted
+    by a weight profile) and a secondary cost, which is either CROSSINGS or the weights of another profile
+    (for example the exposed distance of a path, from an 'exposure' profile).
+    A path is on the front if no other path is at most as long and at most as costly, and strictly better
+    for one of the two.
+
+    The search is a bi-criteria label-setting algorithm: labels (distance, cost) are settled in lexicographic
+    order, so the labels settled at an intersection have increasing distances and decreasing costs, and a new
+    label is dominated exactly when its cost is not below the last cost settled there (or at the destination).
+    At most max_labels labels are settled per intersection, which bounds the work on large graphs: labels over
+    the bound are dropped, so the front may then miss some of the costliest trade-offs.
+    """
+
+    def find_pareto_paths(self, id1: int, id2: int, criterion: str = CROSSINGS,
+                          stats: Optional[QueryStats] = None, profile: str = SHORTEST,
+                          max_labels: int = 16) -> list[ParetoPath]:
+        """Return the Pareto-optimal paths from id1 to id2, by increasing distance (and so decreasing cost).
+        Return an empty list if id2 is not reachable from id1.
+        If stats is not None, the search counters and timings are added to it.
+
+        Preconditions:
+         - id1 in self.intersections and id2 in self.intersections
+         - criterion == CROSSINGS or criterion in self.weight_profiles
+         - max_labels >= 1
+        """
+        weights = self.edge_weights(profile)
+        if criterion == CROSSINGS:
+            costs = None
+        else:
+            costs = self.edge_weights(criterion)
+        if not self.connected(id1, id2):
             return []
 
-    def traceback_dijkstra(self,
-                           dequeued: list[tuple[int, int]]) -> list[int]:
-        """Helper method for finding an optimal path between intersections using Dijkstra's algorithm. Traces back
-        through the deqeued intersections to find the true optimal path calculated using the algorithm."""
-        path_so_far = []  # creating list of our path, starting with adding in the final node
-        last_item = dequeued[-1]
+        with phase(stats, 'search'):
+            # every label is a (distance, cost, intersection id, parent label, edge) tuple;
+            # the heap holds (distance, cost, label index) entries
+            labels = [(0.0, 0.0, id1, -1, None)]
+            heap = [(0.0, 0.0, 0)]
+            last_cost = {}  # the cost of the last label settled at every intersection
+            settled_count = {}
+            front = []
+            settled = relaxations = queue_operations = dropped = 0
+            on_settle = None if stats is None else stats.on_settle
+
+            while heap:
+                distance, cost, label_index = heapq.heappop(heap)
+                queue_operations += 1
+                current_id = labels[label_index][2]
+                if cost >= last_cost.get(current_id, math.inf) or cost >= last_cost.get(id2, math.inf):
+                    continue  # dominated by a label settled since this one was pushed
+                if settled_count.get(current_id, 0) >= max_labels:
+                    dropped += 1
+                    continue
+                last_cost[current_id] = cost
+                settled_count[current_id] = settled_count.get(current_id, 0) + 1
+                settled += 1
+                if on_settle is not None:
+                    on_settle(current_id)
+                if current_id == id2:
+                    front.append(label_index)
+                    continue
+
+                current_intersection = self.intersections[current_id]
+                for edge in current_intersection.edges:
+                    relaxations += 1
+                    neighbour = edge.get_other_endpoint(current_intersection)
+                    new_distance = distance + weights[edge.index]
+                    if costs is None:
+                        new_cost = cost + _is_junction(neighbour)
+                    else:
+                        new_cost = cost + costs[edge.index]
+                    if new_distance == math.inf or new_cost == math.inf:
+                        continue  # an impassable edge
+                    if new_cost >= last_cost.get(neighbour.identifier, math.inf) \
+                            or new_cost >= last_cost.get(id2, math.inf):
+                        continue
+                    labels.append((new_distance, new_cost, neighbour.identifier, label_index, edge))
+                    heapq.heappush(heap, (new_distance, new_cost, len(labels) - 1))
+                    queue_operations += 1
+
+            if stats is not None:
+                stats.add_search_counts(settled, relaxations, queue_operations)
+            if dropped:
+                logger.debug('Pareto search from %d to %d dropped %d labels over the bound of %d',
+                             id1, id2, dropped, max_labels)
+
+        with phase(stats, 'reconstruction'):
+            paths = []
+            for label_index in front:
+                distance, cost = labels[label_index][0], labels[label_index][1]
+                edges = []
+                while labels[label_index][3] != -1:
+                    edges.append(labels[label_index][4])
+                    label_index = labels[label_index][3]
+                edges.reverse()
+                paths.append(ParetoPath(Route(self.intersections[id1], edges), distance, cost))
+        return paths
+
+
+def _is_junction(intersection: Intersection) -> int:
+    """Return 1 if crossing the given intersection counts as a road crossing (see CROSSINGS), and 0 otherwise."""
+    if intersection.building is not None:
+        return 0  # a building entrance
+    return 1 if len(intersection.edges) >= 3 or intersection.wait_profile is not None else 0
+
+
+class ParetoPath:
+    """
+    A path on the Pareto front returned by ParetoGrid.find_pareto_paths.
+
+    Instance Attributes:
+      - route: the route followed by the path
+      - distance: the (weighted) length of the path
+      - cost: the secondary cost of the path
+
+    Representation Invariants:
+      - self.distance >= 0 and self.cost >= 0
+    """
+    route: Route
+    distance: float
+    cost: float
+
+    def __init__(self, route: Route, distance: float, cost: float) -> None:
+        """Initialize a path of the front."""
+        self.route = route
+        self.distance = distance
+        self.cost = cost
+
+    def __repr__(self) -> str:
+        """Return a string representation of this path.
+
+        >>> ParetoPath(Route(Intersection(1, {'A Street'}, (43.66, -79.39))), 120.5, 2)
+        ParetoPath(distance=120.5, cost=2, edges=0)
+        """
+        return f'ParetoPath(distance={self.distance}, cost={self.cost}, edges={len(self.route.edges)})'
+
+
+def _straight_line_scale(grid: AbstractGrid, weights: array) -> float:
+    """Return the smallest ratio of the weight of an edge of grid to the straight-line distance between its
+    endpoints. The straight-line distance times this scale is then a consistent lower bound on the weight of
+    a path. Edges are compared to the straight line rather than to their distance, as indoor edges and weight
+    profiles can make them shorter.
+    """
+    scale = math.inf
+    for intersection in grid.intersections.values():
+        for edge in intersection.edges:
+            straight = distance_between(*edge.endpoints)
+            if straight > 0:
+                scale = min(scale, weights[edge.index] / straight)
+    return 0.0 if scale == math.inf else scale
 
-        popped = dequeued.pop()
 
-        assert last_item == popped
+def _route_from_predecessors(grid: AbstractGrid, source_id: int, target_id: int,
+                             predecessors: dict[int, Optional[Edge]]) -> Route:
+    """Return the route from source_id to target_id made of the predecessor edges recorded by a search.
 
-        path_so_far.append(last_item[0])
-        next_item = last_item[1]
+    Preconditions:
+     - following predecessors back from target_id reaches source_id
+    """
+    edges = []
+    current = grid.intersections[target_id]
+    while current.identifier != source_id:
+        edge = predecessors[current.identifier]
+        edges.append(edge)
+        current = edge.get_other_endpoint(current)
+    edges.reverse()
+    return Route(grid.intersections[source_id], edges)
 
-        while dequeued:
-            popped = dequeued.pop()
-            if next_item == popped[0]:
-                path_so_far.append(popped[0])
-                next_item = popped[1]
 
-        path_so_far.reverse()
+def _now() -> float:
+    """Return the current local time of day, in seconds since midnight."""
+    now = time.localtime()
+    return float(now.tm_hour * 3600 + now.tm_min * 60 + now.tm_sec)
 
-        return path_so_far
+
+class ShortestPathTree:
+    """
+    The shortest paths from a single source intersection to every intersection reachable from it,
+    as computed by DijkstraGrid.shortest_path_tree.
+
+    Instance Attributes:
+      - grid: the grid the tree was computed on
+      - source_id: the identifier of the source intersection
+      - distances: the length of the shortest path from the source to every reachable intersection
+      - predecessors: the last edge of the shortest path to every reachable intersection (but the source)
+      - profile: the weight profile the paths are shortest for
+
+    Representation Invariants:
+      - self.distances[self.source_id] == 0
+      - self.source_id not in self.predecessors
+      - all(i in self.distances for i in self.predecessors)
+    """
+    grid: AbstractGrid
+    source_id: int
+    distances: dict[int, float]
+    predecessors: dict[int, Edge]
+    profile: str
+
+    def __init__(self, grid: AbstractGrid, source_id: int, distances: dict[int, float],
+                 predecessors: dict[int, Edge], profile: str = SHORTEST) -> None:
+        """Initialize a shortest-path tree rooted at source_id."""
+        self.grid = grid
+        self.source_id = source_id
+        self.distances = distances
+        self.predecessors = predecessors
+        self.profile = profile
+
+    def path_to(self, target_id: int) -> Optional[list[Edge]]:
+        """Return the edges of the shortest path from the source to target_id, in order,
+        or None if target_id is not reachable from the source.
+        """
+        route = self.route_to(target_id)
+        return None if route is None else route.edges
+
+    def route_to(self, target_id: int) -> Optional[Route]:
+        """Return the shortest route from the source to target_id, or None if target_id is not reachable
+        from the source.
+        """
+        if target_id not in self.distances:
+            return None
+        return _route_from_predecessors(self.grid, self.source_id, target_id, self.predecessors)
 
 
 class EmptyPriorityQueueError(Exception):
@@ -0,0 +1,434 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains FrozenGrid, an immutable snapshot of a grid for serving queries from many threads at once.
+freeze() copies the routing graph of a loaded grid into flat arrays (in compressed sparse row form: the
+neighbours of every node are stored contiguously), and nothing in the snapshot can be mutated afterwards.
+The intersections, buildings and edges of the snapshot are immutable copies of those of the grid, so that the
+routes it returns, and the closest intersections plan_route reads, do not change with the grid either.
+All the state of a search (distances, predecessors) lives in scratch buffers owned by the thread running it,
+so any number of threads can search the same snapshot concurrently.
+GridHolder holds the snapshot currently served, and swaps in a new one atomically.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from array import array
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
+import heapq
+import math
+import threading
+from concrete_grid import ShortestPathTree
+from entities import SHORTEST, AbstractGrid, AmenityIndex, Building, Edge, Intersection, Route
+from instrumentation import QueryStats, phase
+
+
+class FrozenGrid:
+    """
+    An immutable snapshot of a grid, which many threads can search concurrently.
+    It answers the same routing queries as DijkstraGrid (find_route, find_shortest_path, shortest_path_tree),
+    so it can be used as the engine of route_planning.plan_route and route_planning.SpeculativeRoute.
+
+    Node i of the snapshot is the i-th intersection of the grid it was frozen from. The edges leaving node i are
+    at positions offsets[i] to offsets[i + 1] - 1 of targets (the node reached) and edge_ids (the edge.index of
+    the edge walked). Every array is read-only.
+
+    The intersections, buildings and edges of the snapshot are copies of those of the grid, whose attributes
+    cannot be set, and whose collections are frozensets, tuples and read-only mappings (see _freeze_entities).
+
+    Instance Attributes:
+      - intersections: immutable copies of the intersections of the grid, keyed by identifier (read-only)
+      - buildings: immutable copies of the buildings of the grid, keyed by code (read-only)
+      - weight_profiles: a read-only copy of every weight profile of the grid, indexed by edge.index
+      - amenity_index: the index of the buildings providing each amenity
+
+    Representation Invariants:
+      - len(self._offsets) == len(self.intersections) + 1
+      - len(self._targets) == len(self._edge_ids) == self._offsets[-1]
+    """
+    intersections: Mapping[int, Intersection]
+    buildings: Mapping[str, Building]
+    weight_profiles: Mapping[str, memoryview]
+    amenity_index: AmenityIndex
+    # Private Instance Attributes:
+    #   - _nodes: the intersection of every node
+    #   - _positions: the node of every intersection identifier
+    #   - _components: the connected component of every node
+    #   - _offsets, _targets, _edge_ids: the adjacency of every node, as described above
+    #   - _edges: the edge of every edge.index
+    #   - _scratch: the scratch buffers of every thread that searched this snapshot
+    _nodes: tuple[Intersection, ...]
+    _positions: Mapping[int, int]
+    _components: memoryview
+    _offsets: memoryview
+    _targets: memoryview
+    _edge_ids: memoryview
+    _edges: tuple[Edge, ...]
+    _scratch: threading.local
+
+    def __init__(self, grid: AbstractGrid) -> None:
+        """Initialize a snapshot of the routing state of grid. Use freeze(grid) instead of calling this directly."""
+        intersections, buildings = _freeze_entities(grid)
+        nodes = tuple(intersections.values())
+        positions = {intersection.identifier: position for position, intersection in enumerate(nodes)}
+        offsets, targets, edge_ids = array('l', [0]), array('l'), array('l')
+        edges = [None] * len(grid.edge_weights(SHORTEST))
+        for intersection in nodes:
+            for edge in sorted(intersection.edges, key=lambda e: e.index):
+                targets.append(positions[edge.get_other_endpoint(intersection).identifier])
+                edge_ids.append(edge.index)
+                edges[edge.index] = edge
+            offsets.append(len(targets))
+
+        # object.__setattr__, as assigning attributes is disabled on frozen grids
+        attributes = {
+            'intersections': MappingProxyType(intersections),
+            'buildings': MappingProxyType(buildings),
+            'weight_profiles': MappingProxyType({name: _read_only(array('d', weights))
+                                                 for name, weights in grid.weight_profiles.items()}),
+            'amenity_index': AmenityIndex(buildings),
+            '_nodes': nodes,
+            '_positions': MappingProxyType(positions),
+            '_components': _read_only(array('l', (intersection.component for intersection in nodes))),
+            '_offsets': _read_only(offsets),
+            '_targets': _read_only(targets),
+            '_edge_ids': _read_only(edge_ids),
+            '_edges': tuple(edges),
+            '_scratch': threading.local(),
+        }
+        for name, value in attributes.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Raise an AttributeError: a frozen grid cannot be modified."""
+        raise AttributeError(f'cannot set {name!r}: FrozenGrid is immutable')
+
+    def edge_weights(self, profile: str = SHORTEST) -> memoryview:
+        """Return the read-only edge-weight array of the given profile, indexed by edge.index.
+        Raise a ValueError if the snapshot has no such profile.
+        """
+        if profile not in self.weight_profiles:
+            raise ValueError(f'unknown weight profile {profile!r}')
+        return self.weight_profiles[profile]
+
+    def connected(self, id1: int, id2: int) -> bool:
+        """Return False if id1 and id2 are known to be in different connected components (see
+        AbstractGrid.connected).
+        """
+        component1 = self._components[self._positions[id1]]
+        component2 = self._components[self._positions[id2]]
+        return component1 == -1 or component2 == -1 or component1 == component2
+
+    def buildings_with(self, amenities: Iterable[str]) -> list[str]:
+        """Return the codes of the buildings providing every one of the given amenities (see AmenityIndex)."""
+        return self.amenity_index.buildings_with(amenities)
+
+    def find_shortest_path(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST) -> Optional[list[Edge]]:
+        """Return the edges of the shortest path from id1 to id2, in order, or None if id2 is not reachable.
+
+        Preconditions:
+         - id1 in self.intersections
+         - id2 in self.intersections
+        """
+        route = self.find_route(id1, id2, stats, profile)
+        return None if route is None else route.edges
+
+    def find_route(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                   profile: str = SHORTEST) -> Optional[Route]:
+        """Return the shortest route from id1 to id2 for the given weight profile, or None if there is none.
+        If stats is not None, the search counters and timings are added to it.
+
+        Preconditions:
+         - id1 in self.intersections
+         - id2 in self.intersections
+        """
+        weights = self.edge_weights(profile)
+        if not self.connected(id1, id2):
+            return None
+        source, target = self._positions[id1], self._positions[id2]
+        with phase(stats, 'search'):
+            buffers = self._buffers()
+            found = buffers.search(self, source, target, weights, stats)
+        if not found:
+            return None
+        with phase(stats, 'reconstruction'):
+            edges = []
+            current = target
+            while current != source:
+                edge_id = buffers.predecessor_edges[current]
+                edges.append(self._edges[edge_id])
+                current = buffers.predecessors[current]
+            edges.reverse()
+            return Route(self._nodes[source], edges)
+
+    def shortest_path_tree(self, source_id: int, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST) -> ShortestPathTree:
+        """Return the shortest-path tree rooted at source_id (see DijkstraGrid.shortest_path_tree).
+
+        Preconditions:
+         - source_id in self.intersections
+        """
+        weights = self.edge_weights(profile)
+        source = self._positions[source_id]
+        with phase(stats, 'search'):
+            buffers = self._buffers()
+            buffers.search(self, source, -1, weights, stats)
+            distances, predecessors = {}, {}
+            for node in buffers.settled_nodes:
+                distances[self._nodes[node].identifier] = buffers.distances[node]
+                if node != source:
+                    predecessors[self._nodes[node].identifier] = self._edges[buffers.predecessor_edges[node]]
+        return ShortestPathTree(self, source_id, distances, predecessors, profile)
+
+    def _buffers(self) -> _SearchBuffers:
+        """Return the scratch buffers of the calling thread, creating them on its first search."""
+        buffers = getattr(self._scratch, 'buffers', None)
+        if buffers is None:
+            buffers = _SearchBuffers(len(self._nodes))
+            self._scratch.buffers = buffers
+        return buffers
+
+
+class _SearchBuffers:
+    """
+    The scratch state of the searches run by one thread on a FrozenGrid.
+    The arrays are allocated once and reused by every search: an entry is only valid if its stamp equals the
+    generation of the current search, so nothing has to be cleared between searches.
+
+    Instance Attributes:
+      - distances: the distance from the source to every reached node
+      - predecessors: the node before every reached node on its shortest path
+      - predecessor_edges: the edge.index of the last edge of the shortest path to every reached node
+      - settled_nodes: the nodes settled by the last search, in order
+    """
+    distances: array
+    predecessors: array
+    predecessor_edges: array
+    settled_nodes: list[int]
+    # Private Instance Attributes:
+    #   - _stamps: the generation of the search that last reached every node
+    #   - _settled_stamps: the generation of the search that last settled every node
+    #   - _generation: the generation of the current search
+    _stamps: array
+    _settled_stamps: array
+    _generation: int
+
+    def __init__(self, size: int) -> None:
+        """Allocate the buffers for searches on a grid of size nodes."""
+        self.distances = array('d', [math.inf]) * size
+        self.predecessors = array('l', [-1]) * size
+        self.predecessor_edges = array('l', [-1]) * size
+        self.settled_nodes = []
+        self._stamps = array('l', [0]) * size
+        self._settled_stamps = array('l', [0]) * size
+        self._generation = 0
+
+    def search(self, grid: FrozenGrid, source: int, target: int, weights: memoryview,
+               stats: Optional[QueryStats]) -> bool:
+        """Run Dijkstra's algorithm on grid from the node source, until the node target is settled (or every
+        reachable node, if target is -1). Return whether target was settled.
+        """
+        self._generation += 1
+        generation = self._generation
+        distances, stamps, settled_stamps = self.distances, self._stamps, self._settled_stamps
+        offsets, targets, edge_ids = grid._offsets, grid._targets, grid._edge_ids
+        self.settled_nodes = []
+
+        distances[source] = 0.0
+        stamps[source] = generation
+        heap = [(0.0, source)]
+        relaxations = queue_operations = 0
+        on_settle = None if stats is None else stats.on_settle
+        found = False
+
+        while heap:
+            distance, node = heapq.heappop(heap)
+            queue_operations += 1
+            if settled_stamps[node] == generation:
+                continue  # a stale entry, superseded by a shorter distance
+            settled_stamps[node] = generation
+            self.settled_nodes.append(node)
+            if on_settle is not None:
+                on_settle(grid._nodes[node].identifier)
+            if node == target:
+                found = True
+                break
+            for position in range(offsets[node], offsets[node + 1]):
+                relaxations += 1
+                neighbour = targets[position]
+                new_distance = distance + weights[edge_ids[position]]
+                if stamps[neighbour] != generation or new_distance < distances[neighbour]:
+                    if new_distance == math.inf:
+                        continue  # an impassable edge
+                    stamps[neighbour] = generation
+                    distances[neighbour] = new_distance
+                    self.predecessors[neighbour] = node
+                    self.predecessor_edges[neighbour] = edge_ids[position]
+                    heapq.heappush(heap, (new_distance, neighbour))
+                    queue_operations += 1
+
+        if stats is not None:
+            stats.add_search_counts(len(self.settled_nodes), relaxations, queue_operations)
+        return found
+
+
+class GridHolder:
+    """
+    The frozen grid currently served, which can be replaced by a new snapshot while queries are running.
+    Readers take self.current once per query and keep using that snapshot, so a query never sees a mix of two
+    snapshots; swapping is a single reference assignment.
+
+    Instance Attributes:
+      - current: the snapshot served to new queries
+    """
+    current: FrozenGrid
+    # Private Instance Attributes:
+    #   - _lock: serializes concurrent swaps
+    _lock: threading.Lock
+
+    def __init__(self, grid: FrozenGrid) -> None:
+        """Initialize the holder serving grid."""
+        self.current = grid
+        self._lock = threading.Lock()
+
+    def swap(self, grid: FrozenGrid) -> FrozenGrid:
+        """Serve grid to every new query from now on, and return the snapshot it replaces.
+        Queries already running keep the snapshot they started with.
+        """
+        with self._lock:
+            previous = self.current
+            self.current = grid
+        return previous
+
+
+def freeze(grid: AbstractGrid) -> FrozenGrid:
+    """Return an immutable snapshot of the routing state of grid. Later changes to grid do not affect it.
+
+    >>> a = Intersection(1, {'A Street'}, (43.6600, -79.3950))
+    >>> b = Intersection(2, {'B Street'}, (43.6610, -79.3950))
+    >>> edge = Edge(a, b, 0)
+    >>> a.edges.add(edge)
+    >>> b.edges.add(edge)
+    >>> building = Building('SS', 'Sidney Smith Hall', {'study'}, (43.6605, -79.3950))
+    >>> building.closest_intersection = a
+    >>> frozen = freeze(AbstractGrid({1: a, 2: b}, {'SS': building}))
+    >>> frozen.find_route(1, 2).identifiers()
+    [1, 2]
+    >>> building.closest_intersection = b
+    >>> edge.index = 5
+    >>> frozen.buildings['SS'].closest_intersection.identifier, frozen.find_route(1, 2).edges[0].index
+    (1, 0)
+    >>> frozen.buildings = {}
+    Traceback (most recent call last):
+    AttributeError: cannot set 'buildings': FrozenGrid is immutable
+    >>> frozen.buildings['SS'].closest_intersection = frozen.intersections[2]
+    Traceback (most recent call last):
+    AttributeError: cannot set 'closest_intersection': the buildings of a FrozenGrid are immutable
+    >>> frozen.intersections[1].edges.add(edge)
+    Traceback (most recent call last):
+    AttributeError: 'frozenset' object has no attribute 'add'
+    """
+    return FrozenGrid(grid)
+
+
+class _FrozenIntersection(Intersection):
+    """An intersection of a FrozenGrid, whose attributes cannot be set."""
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Raise an AttributeError: the intersections of a frozen grid cannot be modified."""
+        raise AttributeError(f'cannot set {name!r}: the intersections of a FrozenGrid are immutable')
+
+
+class _FrozenBuilding(Building):
+    """A building of a FrozenGrid, whose attributes cannot be set."""
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Raise an AttributeError: the buildings of a frozen grid cannot be modified."""
+        raise AttributeError(f'cannot set {name!r}: the buildings of a FrozenGrid are immutable')
+
+
+class _FrozenEdge(Edge):
+    """An edge of a FrozenGrid, whose attributes cannot be set."""
+    __slots__ = ()
+
+    def __setattr__(self, name: str, value: object) -> None:
+        """Raise an AttributeError: the edges of a frozen grid cannot be modified."""
+        raise AttributeError(f'cannot set {name!r}: the edges of a FrozenGrid are immutable')
+
+
+def _freeze_entities(grid: AbstractGrid) -> tuple[dict[int, Intersection], dict[str, Building]]:
+    """Return immutable copies of the intersections and buildings of grid, joined by immutable copies of its
+    edges, keyed as in grid. Sets become frozensets, profiles become tuples, and entrances a read-only mapping.
+    """
+    intersections = {identifier: object.__new__(_FrozenIntersection) for identifier in grid.intersections}
+    buildings = {code: object.__new__(_FrozenBuilding) for code in grid.buildings}
+    edges = {}
+    for intersection in grid.intersections.values():
+        for edge in intersection.edges:
+            if edge not in edges:
+                edges[edge] = _frozen_copy(object.__new__(_FrozenEdge), {
+                    'endpoints': tuple(intersections[endpoint.identifier] for endpoint in edge.endpoints),
+                    'distance': edge.distance,
+                    'time_profile': None if edge.time_profile is None else tuple(edge.time_profile),
+                    'index': edge.index,
+                    'via': tuple(edge.via),
+                })
+
+    for identifier, intersection in grid.intersections.items():
+        _frozen_copy(intersections[identifier], {
+            'identifier': identifier,
+            'name': intersection.name,
+            'close_buildings': frozenset(buildings[building.code] for building in intersection.close_buildings),
+            'coordinates': intersection.coordinates,
+            'projected': intersection.projected,
+            'edges': frozenset(edges[edge] for edge in intersection.edges),
+            'wait_profile': None if intersection.wait_profile is None else tuple(intersection.wait_profile),
+            'building': None if intersection.building is None else buildings[intersection.building.code],
+            'component': intersection.component,
+        })
+    for code, building in grid.buildings.items():
+        closest = building.closest_intersection
+        _frozen_copy(buildings[code], {
+            'code': code,
+            'name': building.name,
+            'closest_intersection': None if closest is None else intersections[closest.identifier],
+            'amenities': frozenset(building.amenities),
+            'coordinates': building.coordinates,
+            'projected': building.projected,
+            'entrances': MappingProxyType({name: intersections[entrance.identifier]
+                                           for name, entrance in building.entrances.items()}),
+        })
+    return intersections, buildings
+
+
+def _frozen_copy(entity: object, attributes: dict[str, object]) -> object:
+    """Set the given attributes of the frozen entity, bypassing its __setattr__, and return it."""
+    for name, value in attributes.items():
+        object.__setattr__(entity, name, value)
+    return entity
+
+
+def _read_only(values: array) -> memoryview:
+    """Return a read-only view of the given array."""
+    return memoryview(values).toreadonly()
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
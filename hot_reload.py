@@ -0,0 +1,238 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module reloads the data files of a running program when they change, without restarting it.
+
+A GridVersion bundles a grid with every index derived from it: its frozen snapshot, its query planner (and
+landmark table) and its place index. Nothing in a version is modified once it is served. DataWatcher holds the
+version currently served, and polls the modification times of the data files in a background thread: when they
+change, it builds the next version in that thread, then swaps it in with a single reference assignment, like
+frozen_grid.GridHolder. Queries take the current version once, when they start, so a query started before the
+swap finishes on the version it started on, and serving never waits for a reload.
+
+When only the building file changed, the next version copies the routing graph of the current one instead of
+loading every file again (see load_all_data.reload_buildings), and keeps its landmark table, which only depends
+on the routing graph.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import logging
+import os
+import threading
+import time
+
+import load_all_data
+from entities import AbstractGrid
+from frozen_grid import FrozenGrid, GridHolder, freeze
+from landmarks import DEFAULT_LANDMARK_FILE, saved_landmarks
+from place_index import PlaceIndex
+from query_planner import QueryPlanner
+
+logger = logging.getLogger(__name__)
+
+# The number of seconds between two polls of the data files.
+DEFAULT_INTERVAL = 1.0
+
+# The signature of a data file: its modification time (in nanoseconds) and size, or None if it does not exist.
+Signature = Optional[tuple[int, int]]
+
+
+class GridVersion:
+    """
+    One version of the data served: a grid loaded from the data files, with every index derived from it.
+
+    Instance Attributes:
+      - number: the number of the version, from 1 for the version loaded first
+      - grid: the grid loaded from the data files
+      - frozen: the immutable snapshot of grid that the planner's frozen engine searches
+      - planner: the query planner over grid
+      - places: the search index over the buildings and streets of grid
+      - signatures: the signature of every data file, taken just before it was read
+
+    Representation Invariants:
+      - self.number >= 1
+      - self.planner.grid is self.grid
+    """
+    number: int
+    grid: AbstractGrid
+    frozen: FrozenGrid
+    planner: QueryPlanner
+    places: PlaceIndex
+    signatures: dict[str, Signature]
+
+    def __init__(self, number: int, grid: AbstractGrid, signatures: dict[str, Signature],
+                 landmark_file: str = DEFAULT_LANDMARK_FILE, previous: Optional[GridVersion] = None) -> None:
+        """Initialize the version number of the data, deriving every index from grid.
+        The landmark table is the one of previous if it is not None, as its routing graph is the same as the one
+        of grid; otherwise, it is read from landmark_file if it was computed on grid.
+        """
+        self.number = number
+        self.grid = grid
+        self.frozen = freeze(grid)
+        landmarks = previous.planner.landmarks if previous is not None else saved_landmarks(grid, landmark_file)
+        self.planner = QueryPlanner(grid, GridHolder(self.frozen), landmarks)
+        self.places = PlaceIndex(grid)
+        self.signatures = signatures
+
+
+class DataWatcher:
+    """
+    The version of the data currently served, reloaded when the data files change (see the module description).
+
+    Instance Attributes:
+      - current: the version served to new queries
+      - building_file: the csv file of the buildings
+      - intersection_file: the csv file of the intersections
+      - indoor_files: the csv files of the building entrances and indoor edges, or None for street routes only
+      - profile_file: the csv file of the edge weight profiles, or None for the SHORTEST profile only
+      - landmark_file: the file the landmark table of the grid is saved in (see landmarks.saved_landmarks)
+    """
+    current: GridVersion
+    building_file: str
+    intersection_file: str
+    indoor_files: Optional[tuple[str, str]]
+    profile_file: Optional[str]
+    landmark_file: str
+    # Private Instance Attributes:
+    #   - _lock: serializes concurrent reloads
+    #   - _stopped: set to stop the watching thread
+    #   - _thread: the watching thread, or None if it is not running
+    _lock: threading.Lock
+    _stopped: threading.Event
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, building_file: str, intersection_file: str, indoor_files: Optional[tuple[str, str]] = None,
+                 profile_file: Optional[str] = None, landmark_file: str = DEFAULT_LANDMARK_FILE) -> None:
+        """Initialize the watcher, loading the first version of the data from the given files.
+        The files are only watched once start is called.
+        """
+        self.building_file = building_file
+        self.intersection_file = intersection_file
+        self.indoor_files = indoor_files
+        self.profile_file = profile_file
+        self.landmark_file = landmark_file
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        signatures = file_signatures(self.files())
+        self.current = GridVersion(1, self._load_grid(), signatures, landmark_file)
+
+    def files(self) -> list[str]:
+        """Return the data files the grid is loaded from."""
+        files = [self.building_file, self.intersection_file]
+        if self.indoor_files is not None:
+            files.extend(self.indoor_files)
+        if self.profile_file is not None:
+            files.append(self.profile_file)
+        return files
+
+    def reload(self) -> bool:
+        """Build the next version of the data and serve it to every new query, if a data file changed since the
+        current version read it. Return whether a new version is served.
+        Queries already running keep the version they started with. If the data files cannot be loaded, the
+        error is raised and the current version is still served.
+        """
+        with self._lock:
+            signatures = file_signatures(self.files())
+            previous = self.current
+            changed = {file for file, signature in signatures.items() if signature != previous.signatures[file]}
+            if not changed:
+                return False
+
+            start = time.perf_counter()
+            if changed == {self.building_file}:
+                grid = load_all_data.reload_buildings(previous.grid, self.building_file)
+                version = GridVersion(previous.number + 1, grid, signatures, previous=previous)
+            else:
+                version = GridVersion(previous.number + 1, self._load_grid(), signatures, self.landmark_file)
+            self.current = version
+        logger.info('Serving version %d of the data, reloaded in %.0f ms after changes to %s', version.number,
+                    (time.perf_counter() - start) * 1000, ', '.join(sorted(changed)))
+        return True
+
+    def start(self, interval: float = DEFAULT_INTERVAL) -> None:
+        """Start watching the data files in a background thread, polling them every interval seconds.
+        A version is only reloaded once its files stayed unchanged for a whole interval, so that a file being
+        written is not read half-way.
+
+        Preconditions:
+          - interval > 0
+        """
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._watch, args=(interval,), name='data-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching the data files, waiting for a reload in progress to finish."""
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _watch(self, interval: float) -> None:
+        """Poll the data files every interval seconds until stop is called, reloading them once they changed and
+        then stayed unchanged for an interval. Errors are logged, and the current version is kept until the files
+        change again.
+        """
+        pending = failed = None
+        while not self._stopped.wait(interval):
+            signatures = file_signatures(self.files())
+            if signatures == self.current.signatures or signatures == failed:
+                pending = None
+            elif signatures != pending:
+                pending = signatures  # maybe still being written: wait for one more interval
+            else:
+                pending = None
+                try:
+                    self.reload()
+                except Exception:  # a bad edit of a data file must not stop the watcher, nor the program
+                    logger.exception('Could not reload the data; still serving version %d', self.current.number)
+                    failed = signatures
+
+    def _load_grid(self) -> AbstractGrid:
+        """Load the grid from every data file."""
+        grid = load_all_data.load_data(self.building_file, self.intersection_file)
+        if self.indoor_files is not None:
+            load_all_data.load_indoor_edges(grid, *self.indoor_files)
+        if self.profile_file is not None:
+            load_all_data.load_weight_profiles(grid, self.profile_file)
+        return grid
+
+
+def file_signatures(files: Iterable[str]) -> dict[str, Signature]:
+    """Return the signature of every file in files: its modification time and size, or None if it does not exist.
+
+    >>> file_signatures(['no/such/file.csv'])
+    {'no/such/file.csv': None}
+    """
+    signatures = {}
+    for file in files:
+        try:
+            status = os.stat(file)
+        except FileNotFoundError:
+            signatures[file] = None
+        else:
+            signatures[file] = (status.st_mtime_ns, status.st_size)
+    return signatures
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,166 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains the instrumentation surface shared by the loader and the routing engines.
+A QueryStats object is passed (optionally) into a route request, and collects counters from the search
+(settled intersections, edge relaxations, priority queue operations) together with the wall time spent in
+each phase of the request: loading the grid, searching, reconstructing the path and rendering the map.
+
+When no QueryStats object is passed, the engines skip all bookkeeping, so instrumentation costs close to
+nothing when it is disabled.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator, Optional, ContextManager
+import logging
+import time
+
+# The phases of a route request, in the order they normally happen.
+PHASES = ('load', 'search', 'reconstruction', 'render')
+
+_NO_PHASE = nullcontext()
+
+
+class QueryStats:
+    """
+    Counters and per-phase wall times collected during a single route request.
+
+    Instance Attributes:
+      - settled_nodes: the number of intersections whose distance was finalized by the search
+      - edge_relaxations: the number of edges examined while expanding settled intersections
+      - queue_operations: the number of enqueue, dequeue and remove calls on the priority queue
+      - phase_times: the wall time (in seconds) spent in each phase, keyed by phase name
+      - on_phase_end: an optional callback, called with the phase name and its duration when a phase ends
+      - on_settle: an optional callback, called with the identifier of every settled intersection
+      - engines: the name of the engine chosen by the query planner for every query it answered, in order
+        (see query_planner.QueryPlanner)
+      - latency: the wall time (in seconds) of the queries answered by the query planner, from dispatch to result
+
+    Representation Invariants:
+      - self.settled_nodes >= 0
+      - self.edge_relaxations >= 0
+      - self.queue_operations >= 0
+      - all(t >= 0 for t in self.phase_times.values())
+      - self.latency >= 0
+    """
+    settled_nodes: int
+    edge_relaxations: int
+    queue_operations: int
+    phase_times: dict[str, float]
+    on_phase_end: Optional[Callable[[str, float], None]]
+    on_settle: Optional[Callable[[int], None]]
+    engines: list[str]
+    latency: float
+
+    def __init__(self, on_phase_end: Optional[Callable[[str, float], None]] = None,
+                 on_settle: Optional[Callable[[int], None]] = None) -> None:
+        """Initialize an empty QueryStats object with the given (optional) callback hooks."""
+        self.settled_nodes = 0
+        self.edge_relaxations = 0
+        self.queue_operations = 0
+        self.phase_times = {}
+        self.on_phase_end = on_phase_end
+        self.on_settle = on_settle
+        self.engines = []
+        self.latency = 0.0
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the body of a with-statement, and add its duration to the given phase.
+
+        >>> stats = QueryStats()
+        >>> with stats.phase('search'):
+        ...     pass
+        >>> stats.phase_times['search'] >= 0
+        True
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - start)
+
+    def record_phase(self, name: str, seconds: float) -> None:
+        """Add seconds to the wall time of the given phase, and call the on_phase_end hook if there is one."""
+        self.phase_times[name] = self.phase_times.get(name, 0.0) + seconds
+        if self.on_phase_end is not None:
+            self.on_phase_end(name, seconds)
+
+    def add_search_counts(self, settled_nodes: int, edge_relaxations: int, queue_operations: int) -> None:
+        """Add the counters of one search to this object.
+
+        >>> stats = QueryStats()
+        >>> stats.add_search_counts(3, 5, 8)
+        >>> (stats.settled_nodes, stats.edge_relaxations, stats.queue_operations)
+        (3, 5, 8)
+        """
+        self.settled_nodes += settled_nodes
+        self.edge_relaxations += edge_relaxations
+        self.queue_operations += queue_operations
+
+    def record_engine(self, engine: str, seconds: float) -> None:
+        """Record that the query planner answered a query with the given engine, in the given wall time.
+
+        >>> stats = QueryStats()
+        >>> stats.record_engine('alt', 0.002)
+        >>> stats.engines, stats.latency
+        (['alt'], 0.002)
+        """
+        self.engines.append(engine)
+        self.latency += seconds
+
+    def total_time(self) -> float:
+        """Return the total wall time (in seconds) over all the recorded phases."""
+        return sum(self.phase_times.values())
+
+    def as_dict(self) -> dict[str, object]:
+        """Return a plain dictionary representation of this object, suitable for JSON output."""
+        return {
+            'settled_nodes': self.settled_nodes,
+            'edge_relaxations': self.edge_relaxations,
+            'queue_operations': self.queue_operations,
+            'phase_times': dict(self.phase_times),
+            'engines': list(self.engines),
+            'latency': self.latency,
+        }
+
+    def __repr__(self) -> str:
+        """Return a string representation of this object."""
+        return f'QueryStats({self.as_dict()})'
+
+
+def phase(stats: Optional[QueryStats], name: str) -> ContextManager:
+    """Return a context manager timing the given phase into stats, or a no-op one if stats is None.
+
+    >>> with phase(None, 'load'):
+    ...     pass
+    """
+    if stats is None:
+        return _NO_PHASE
+    return stats.phase(name)
+
+
+def configure_logging(level: int | str = logging.WARNING) -> None:
+    """Configure the log output of the whole program.
+    Diagnostics are logged at the DEBUG level, so they are hidden unless level is set to logging.DEBUG.
+    """
+    logging.basicConfig(level=level, format='%(levelname)s %(name)s: %(message)s')
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,247 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module plans a whole day on campus at once: an ordered list of stops (usually classes), each with optional
+class times, and optional amenities to visit on the way to it. Every leg between consecutive stops is routed
+with route_planning.plan_route, sharing the work between legs:
+  - the buildings providing every requested amenity are looked up once for the whole day;
+  - consecutive legs share a building, so a single shortest-path tree rooted there answers both of them: the
+    leg leaving the building reads its route from the tree, and the leg arriving at it reads the route from
+    the tree walked backwards, as campus streets are walkable both ways. Trees are also reused by every later
+    leg leaving from or arriving at the same building.
+Each leg is then checked against the gap between the end of one class and the start of the next, at
+WALKING_SPEED, and flagged if it cannot be walked in time.
+
+A timetable file has one stop per line, in the csv format
+
+    building,start,end[,amenity,amenity,...]
+
+where start and end are the class times (HH:MM, either may be empty), and the amenities are visited on the way
+to the building. For example:
+
+    BA,09:00,09:50
+    SS,10:00,10:50,coffee
+
+Usage:
+    python itinerary.py timetable.csv
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import argparse
+import csv
+import math
+import sys
+
+import load_all_data
+from entities import AMENITIES, SHORTEST, WALKING_SPEED, AbstractGrid, time_to_seconds
+from frozen_grid import freeze
+from instrumentation import QueryStats
+from route_planning import PlannedRoute, plan_route
+
+
+class Stop:
+    """
+    A stop of a day itinerary.
+
+    Instance Attributes:
+      - building: the code of the building of the stop
+      - start: the time the class at this stop starts (in seconds since midnight), or None if there is no deadline
+      - end: the time the class at this stop ends (in seconds since midnight), or None if the stop can be left
+        at any time
+      - amenities: the amenities to visit on the way to this stop, from the previous one
+
+    Representation Invariants:
+      - self.start is None or self.end is None or self.start <= self.end
+      - all(a in AMENITIES for a in self.amenities)
+    """
+    building: str
+    start: Optional[float]
+    end: Optional[float]
+    amenities: list[str]
+
+    def __init__(self, building: str, start: Optional[str] = None, end: Optional[str] = None,
+                 amenities: Iterable[str] = ()) -> None:
+        """Initialize a stop at the given building, with class times written as 'HH:MM' (or None).
+
+        >>> stop = Stop('SS', '10:00', '10:50', ['coffee'])
+        >>> stop.start, stop.end, stop.amenities
+        (36000.0, 39000.0, ['coffee'])
+        """
+        self.building = building
+        self.start = None if start is None else time_to_seconds(start)
+        self.end = None if end is None else time_to_seconds(end)
+        self.amenities = list(amenities)
+
+
+class Leg:
+    """
+    The walk between two consecutive stops of an itinerary.
+
+    Instance Attributes:
+      - origin: the stop the leg leaves from
+      - destination: the stop the leg arrives at
+      - route: the planned route of the leg, with a detour for every amenity of the destination stop
+      - walking_time: the time (in seconds) needed to walk the route at WALKING_SPEED, detours there and back
+        included
+      - gap: the time (in seconds) between the end of the class at origin and the start of the class at
+        destination, or None if either time is unknown
+
+    Representation Invariants:
+      - self.walking_time >= 0
+    """
+    origin: Stop
+    destination: Stop
+    route: PlannedRoute
+    walking_time: float
+    gap: Optional[float]
+
+    def __init__(self, origin: Stop, destination: Stop, route: PlannedRoute) -> None:
+        """Initialize the leg from origin to destination following route."""
+        self.origin = origin
+        self.destination = destination
+        self.route = route
+        distance = route.distance() + 2 * sum(detour.distance() for detour in route.detours)
+        self.walking_time = distance / WALKING_SPEED
+        if origin.end is None or destination.start is None:
+            self.gap = None
+        else:
+            self.gap = destination.start - origin.end
+
+    def is_late(self) -> bool:
+        """Return whether this leg takes longer to walk than the gap between the two classes."""
+        return self.gap is not None and self.walking_time > self.gap
+
+    def slack(self) -> float:
+        """Return the time (in seconds) left before the next class once this leg is walked; negative if the
+        leg is late, and math.inf if there is no gap to fit in.
+        """
+        return math.inf if self.gap is None else self.gap - self.walking_time
+
+    def as_dict(self) -> dict[str, object]:
+        """Return a plain dictionary representation of this leg, suitable for JSON output."""
+        return {
+            **self.route.as_dict(),
+            'walking_time': self.walking_time,
+            'gap': self.gap,
+            'late': self.is_late(),
+        }
+
+
+def plan_itinerary(engine: AbstractGrid, stops: list[Stop], stats: Optional[QueryStats] = None,
+                   profile: str = SHORTEST) -> list[Leg]:
+    """Return the legs between every pair of consecutive stops, in order.
+
+    All the legs are planned together: the buildings providing the amenities of every stop are looked up once,
+    and the main route of every leg is read from a shortest-path tree rooted at one of its two buildings.
+    A tree is only computed when neither building of a leg has one yet, and it is rooted at the destination,
+    so that the next leg (which leaves from there) reuses it. This needs about half as many trees as legs.
+
+    Raise a ValueError if a stop is not reachable from the previous one, or if no building provides one of the
+    amenities.
+
+    Preconditions:
+      - len(stops) >= 2
+      - all(stop.building in engine.buildings for stop in stops)
+    """
+    amenities = sorted({amenity for stop in stops[1:] for amenity in stop.amenities})
+    amenity_buildings = {amenity: engine.buildings_with([amenity]) for amenity in amenities}
+
+    trees = {}
+    legs = []
+    for origin, destination in zip(stops, stops[1:]):
+        origin_id = engine.buildings[origin.building].closest_intersection.identifier
+        destination_id = engine.buildings[destination.building].closest_intersection.identifier
+        if origin_id in trees:
+            tree = trees[origin_id]
+        elif destination_id in trees:
+            tree = trees[destination_id]
+        else:
+            tree = trees[destination_id] = engine.shortest_path_tree(destination_id, stats, profile)
+        route = plan_route(engine, origin.building, destination.building, destination.amenities, stats,
+                           tree, amenity_buildings, profile)
+        legs.append(Leg(origin, destination, route))
+    return legs
+
+
+def read_timetable(lines: Iterable[str]) -> list[Stop]:
+    """Return the stops of the timetable in lines (see the module description), skipping empty lines and
+    comments. Raise a ValueError on an unknown amenity.
+
+    >>> stops = read_timetable(['# building,start,end,amenities', 'BA,09:00,09:50', 'SS,10:00,,coffee'])
+    >>> [(s.building, s.start, s.end, s.amenities) for s in stops]
+    [('BA', 32400.0, 35400.0, []), ('SS', 36000.0, None, ['coffee'])]
+    """
+    stops = []
+    for row in csv.reader(lines):
+        fields = [field.strip() for field in row]
+        if not any(fields) or fields[0].startswith('#'):
+            continue
+        fields.extend([''] * (3 - len(fields)))
+        amenities = [field for field in fields[3:] if field != '']
+        for amenity in amenities:
+            if amenity not in AMENITIES:
+                raise ValueError(f'unknown amenity {amenity!r}')
+        stops.append(Stop(fields[0], fields[1] or None, fields[2] or None, amenities))
+    return stops
+
+
+def _format_time(seconds: float) -> str:
+    """Return a duration in seconds as minutes and seconds.
+
+    >>> _format_time(754.2)
+    '12 min 34 s'
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    return f'{minutes} min {seconds} s'
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Parse the command line arguments, plan the itinerary of the timetable and print a summary of every leg."""
+    parser = argparse.ArgumentParser(description='Plan a day of classes with UofT Speedrunner.')
+    parser.add_argument('timetable', help='csv file of building,start,end[,amenity,...] stops, in order')
+    parser.add_argument('--building-file', default='data/building_data.csv')
+    parser.add_argument('--intersection-file', default='data/intersections_data.csv')
+    args = parser.parse_args(argv)
+
+    with open(args.timetable, newline='') as timetable_file:
+        try:
+            stops = read_timetable(timetable_file)
+        except ValueError as error:
+            sys.exit(str(error))
+    if len(stops) < 2:
+        sys.exit('the timetable needs at least two stops')
+    grid = load_all_data.load_data(args.building_file, args.intersection_file)
+    unknown = [stop.building for stop in stops if stop.building not in grid.buildings]
+    if unknown:
+        sys.exit(f'unknown building codes: {", ".join(unknown)}')
+
+    try:
+        legs = plan_itinerary(freeze(grid), stops)
+    except ValueError as error:
+        sys.exit(str(error))
+    for leg in legs:
+        via = ''.join(f' via {building.code} ({amenity})'
+                      for amenity, building in zip(leg.route.amenities, leg.route.stopovers))
+        line = f'{leg.origin.building} -> {leg.destination.building}{via}: {_format_time(leg.walking_time)}'
+        if leg.gap is not None:
+            line += f' of {_format_time(leg.gap)}'
+        if leg.is_late():
+            line += '  LATE'
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
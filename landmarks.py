@@ -0,0 +1,284 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module implements ALT (A*, Landmarks and the Triangle inequality) preprocessing for goal-directed queries.
+
+The straight-line distance used by AStarGrid is a weak lower bound on our campus, where walks around Queen's Park
+or the Robarts block are much longer than the straight line. Instead, a few intersections are picked as landmarks,
+and the distance from every landmark to every intersection is computed once. By the triangle inequality, for any
+landmark L, intersection v and destination t,
+
+    distance(v, t) >= |distance(L, t) - distance(L, v)|
+
+and the largest of these bounds over all landmarks is usually far tighter than the straight line, as it already
+accounts for the detours the landmark's own shortest paths take.
+
+Landmarks are picked by farthest-point selection: each new landmark is the intersection farthest from the
+landmarks picked so far, so that they end up on the edges of the grid, "behind" most destinations.
+
+Landmark tables can be saved alongside the grid data, and loaded back instead of being computed again. A saved
+table records a fingerprint of the grid it was computed on, and is only loaded on that same grid.
+
+Usage:
+    python landmarks.py --count 8 --output data/landmarks.csv
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Callable, Optional
+import argparse
+import csv
+import math
+import os
+import zlib
+from array import array
+from collections import Counter
+
+import load_all_data
+from concrete_grid import AStarGrid, DijkstraGrid
+from entities import SHORTEST, AbstractGrid, AmenityIndex, Building, Intersection
+
+DEFAULT_LANDMARK_COUNT = 8
+DEFAULT_LANDMARK_FILE = 'data/landmarks.csv'
+
+
+class LandmarkTable:
+    """
+    The distances from a few landmark intersections to every intersection of a grid.
+    As every edge can be walked both ways with the same weight, these are also the distances from every
+    intersection to the landmarks, so a single table gives lower bounds in both directions.
+
+    Instance Attributes:
+      - landmarks: the identifiers of the landmark intersections
+      - profile: the weight profile the distances are measured in (see AbstractGrid.weight_profiles)
+      - fingerprint: the fingerprint of the grid the table was computed on (see grid_fingerprint)
+      - positions: the position of every intersection identifier in the distance arrays
+      - distances: for every landmark, in order, the distance from that landmark to every intersection, by
+        position; math.inf for intersections in another connected component
+
+    Representation Invariants:
+      - len(self.distances) == len(self.landmarks)
+      - all(len(row) == len(self.positions) for row in self.distances)
+    """
+    landmarks: list[int]
+    profile: str
+    fingerprint: int
+    positions: dict[int, int]
+    distances: list[array]
+
+    def __init__(self, landmarks: list[int], profile: str, fingerprint: int, positions: dict[int, int],
+                 distances: list[array]) -> None:
+        """Initialize a landmark table. Use build_landmarks or load_landmarks instead of calling this directly."""
+        self.landmarks = landmarks
+        self.profile = profile
+        self.fingerprint = fingerprint
+        self.positions = positions
+        self.distances = distances
+
+    def lower_bound(self, id1: int, id2: int) -> float:
+        """Return a lower bound on the distance between the intersections id1 and id2, by the triangle inequality
+        over every landmark reaching both of them (0 if there is none).
+
+        >>> table = LandmarkTable([1], SHORTEST, 0, {1: 0, 2: 1, 3: 2}, [array('d', [0, 40, 100])])
+        >>> table.lower_bound(2, 3), table.lower_bound(3, 2)
+        (60.0, 60.0)
+        """
+        position1, position2 = self.positions[id1], self.positions[id2]
+        best = 0.0
+        for row in self.distances:
+            distance1, distance2 = row[position1], row[position2]
+            if distance1 != math.inf and distance2 != math.inf:
+                best = max(best, abs(distance2 - distance1))
+        return best
+
+
+class ALTGrid(AStarGrid):
+    """
+    A concrete class for AbstractGrid.
+    It finds the shortest path between two intersections using the A* algorithm, guided by the lower bounds of
+    a landmark table (on the table's weight profile) as well as by the straight-line distance.
+
+    Instance Attributes:
+      - landmarks: the landmark table of the grid
+    """
+    landmarks: LandmarkTable
+
+    def __init__(self, intersections: dict[int, Intersection],
+                 buildings: dict[str, Building],
+                 weight_profiles: Optional[dict[str, array]] = None,
+                 amenity_index: Optional[AmenityIndex] = None,
+                 landmarks: Optional[LandmarkTable] = None) -> None:
+        """Initialize an ALTGrid object, representing a map of the U of T campus.
+        If landmarks is None, a table of DEFAULT_LANDMARK_COUNT landmarks is computed on the shortest profile.
+        """
+        AStarGrid.__init__(self, intersections, buildings, weight_profiles, amenity_index)
+        self.landmarks = build_landmarks(self) if landmarks is None else landmarks
+
+    def lower_bound(self, target_id: int, profile: str = SHORTEST) -> Callable[[int], float]:
+        """Return a function giving, for any intersection identifier, a lower bound on the weight of the shortest
+        path from that intersection to target_id in the given weight profile: the largest of the landmark and
+        straight-line bounds. Other profiles than the one of the landmark table only use the straight line.
+        """
+        straight_line = AStarGrid.lower_bound(self, target_id, profile)
+        if profile != self.landmarks.profile:
+            return straight_line
+
+        table = self.landmarks
+        target_position = table.positions[target_id]
+        # (row, distance from the landmark to the target) of every landmark reaching the target
+        rows = [(row, row[target_position]) for row in table.distances if row[target_position] != math.inf]
+        positions = table.positions
+
+        def bound(identifier: int) -> float:
+            """Return the lower bound of the intersection identifier."""
+            position = positions[identifier]
+            best = straight_line(identifier)
+            for row, target_distance in rows:
+                best = max(best, abs(target_distance - row[position]))
+            return best
+
+        return bound
+
+
+def build_landmarks(grid: AbstractGrid, count: int = DEFAULT_LANDMARK_COUNT,
+                    profile: str = SHORTEST) -> LandmarkTable:
+    """Pick count landmarks of grid by farthest-point selection (see the module description), and return the
+    table of their distances in the given weight profile.
+    Landmarks are picked in the largest connected component of grid. The first one is the intersection farthest
+    from an arbitrary intersection of that component; every next one is the intersection whose distance to its
+    nearest landmark is largest. This costs count + 1 shortest-path trees.
+    """
+    engine = DijkstraGrid(grid.intersections, grid.buildings, grid.weight_profiles)
+    positions = {identifier: position for position, identifier in enumerate(grid.intersections)}
+    landmarks, distances = [], []
+    if not positions:
+        return LandmarkTable(landmarks, profile, grid_fingerprint(grid, profile), positions, distances)
+
+    # the distance from every intersection to its nearest landmark so far
+    nearest = array('d', [math.inf]) * len(positions)
+    largest = Counter(intersection.component for intersection in grid.intersections.values()).most_common(1)[0][0]
+    start = next(identifier for identifier, intersection in grid.intersections.items()
+                 if intersection.component == largest)
+    candidate = _farthest(engine.shortest_path_tree(start, profile=profile).distances)
+    while len(landmarks) < min(count, len(positions)) and candidate not in landmarks:
+        landmarks.append(candidate)
+        tree = engine.shortest_path_tree(candidate, profile=profile)
+        row = array('d', [math.inf]) * len(positions)
+        for identifier, distance in tree.distances.items():
+            row[positions[identifier]] = distance
+            nearest[positions[identifier]] = min(nearest[positions[identifier]], distance)
+        distances.append(row)
+        candidate = _farthest({identifier: nearest[positions[identifier]] for identifier in tree.distances})
+    return LandmarkTable(landmarks, profile, grid_fingerprint(grid, profile), positions, distances)
+
+
+def _farthest(distances: dict[int, float]) -> int:
+    """Return the identifier with the largest distance (the smallest identifier on ties).
+
+    >>> _farthest({4: 10.0, 2: 30.0, 7: 30.0})
+    2
+    """
+    return max(distances, key=lambda identifier: (distances[identifier], -identifier))
+
+
+def grid_fingerprint(grid: AbstractGrid, profile: str = SHORTEST) -> int:
+    """Return a checksum of the intersections, edges and edge weights of grid in the given profile.
+    A landmark table is only valid on grids with the same fingerprint as the one it was computed on.
+    """
+    adjacency = array('q')
+    for intersection in grid.intersections.values():
+        adjacency.append(intersection.identifier)
+        adjacency.extend(sorted(edge.index for edge in intersection.edges))
+    return zlib.crc32(array('d', grid.edge_weights(profile)).tobytes(), zlib.crc32(adjacency.tobytes()))
+
+
+def save_landmarks(table: LandmarkTable, landmark_file: str) -> None:
+    """Write table to landmark_file, in csv format: a header row with the profile and fingerprint of the table,
+    a row with the identifiers of the landmarks, then one row per intersection with its distance to every landmark.
+    """
+    with open(landmark_file, 'w', newline='') as output_file:
+        writer = csv.writer(output_file)
+        writer.writerow(['profile', table.profile, 'fingerprint', table.fingerprint])
+        writer.writerow(['intersection'] + table.landmarks)
+        for identifier, position in table.positions.items():
+            writer.writerow([identifier] + [repr(row[position]) for row in table.distances])
+
+
+def load_landmarks(grid: AbstractGrid, landmark_file: str) -> LandmarkTable:
+    """Return the landmark table saved in landmark_file by save_landmarks.
+    Raise a ValueError if it was computed on a grid with another fingerprint than grid (see grid_fingerprint).
+    """
+    with open(landmark_file) as imported_landmark_file:
+        reader = csv.reader(imported_landmark_file)
+        _, profile, _, fingerprint = next(reader)
+        if int(fingerprint) != grid_fingerprint(grid, profile):
+            raise ValueError(f'{landmark_file} was computed on another grid')
+        landmarks = [int(identifier) for identifier in next(reader)[1:]]
+        positions = {}
+        distances = [array('d') for _ in landmarks]
+        for row in reader:
+            positions[int(row[0])] = len(positions)
+            for distance, values in zip(row[1:], distances):
+                values.append(float(distance))
+    return LandmarkTable(landmarks, profile, int(fingerprint), positions, distances)
+
+
+def saved_landmarks(grid: AbstractGrid, landmark_file: str = DEFAULT_LANDMARK_FILE) -> Optional[LandmarkTable]:
+    """Return the landmark table saved in landmark_file if it exists and was computed on grid, or None."""
+    if not os.path.exists(landmark_file):
+        return None
+    try:
+        return load_landmarks(grid, landmark_file)
+    except ValueError:
+        return None
+
+
+def load_or_build_landmarks(grid: AbstractGrid, landmark_file: str = DEFAULT_LANDMARK_FILE,
+                            count: int = DEFAULT_LANDMARK_COUNT, profile: str = SHORTEST) -> LandmarkTable:
+    """Return the landmark table saved in landmark_file if it was computed on grid, with the given profile and
+    number of landmarks. Otherwise, compute the table and save it to landmark_file for the next time.
+    """
+    table = saved_landmarks(grid, landmark_file)
+    if table is not None and table.profile == profile and len(table.landmarks) == count:
+        return table
+    table = build_landmarks(grid, count, profile)
+    save_landmarks(table, landmark_file)
+    return table
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Parse the command line arguments, and compute and save the landmark table of the campus grid."""
+    parser = argparse.ArgumentParser(description='Compute the ALT landmark table of the UofT Speedrunner grid.')
+    parser.add_argument('--count', type=int, default=DEFAULT_LANDMARK_COUNT, help='number of landmarks')
+    parser.add_argument('--profile', default=SHORTEST, help='the weight profile to measure distances in')
+    parser.add_argument('--output', default=DEFAULT_LANDMARK_FILE)
+    parser.add_argument('--building-file', default='data/building_data.csv')
+    parser.add_argument('--intersection-file', default='data/intersections_data.csv')
+    parser.add_argument('--profile-file', default='data/edge_profiles.csv')
+    parser.add_argument('--entrance-file', default='data/building_entrances.csv')
+    parser.add_argument('--indoor-file', default='data/indoor_edges.csv')
+    parser.add_argument('--no-indoor', action='store_true', help='only route along streets, never through buildings')
+    args = parser.parse_args(argv)
+
+    grid = load_all_data.load_data(args.building_file, args.intersection_file)
+    if not args.no_indoor:
+        load_all_data.load_indoor_edges(grid, args.entrance_file, args.indoor_file)
+    load_all_data.load_weight_profiles(grid, args.profile_file)
+    table = build_landmarks(grid, args.count, args.profile)
+    save_landmarks(table, args.output)
+    print(f'{len(table.landmarks)} landmarks written to {args.output}: {table.landmarks}')
+
+
+if __name__ == '__main__':
+    main()
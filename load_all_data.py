@@ -17,49 +17,75 @@ this code, whether modified or otherwise.
 This file is Copyright (c) 2023
 Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
 """
+import copy
 import csv
+import logging
+from array import array
+from typing import Optional
 from entities import *
 from concrete_grid import *
+from instrumentation import QueryStats, phase
+from spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
 
 
 # import the csv and read data
-def load_data(building_file: str, intersection_file: str) -> AbstractGrid:
+def load_data(building_file: str, intersection_file: str, stats: Optional[QueryStats] = None,
+              distance_mode: str = HAVERSINE) -> AbstractGrid:
     """
     Load in data on all the buildings from data/building_data.csv and all the intersections from
     data/interasection_data.csv.
     This function will also create an AbstractGrid object using the buildings and intersections given, and will update
     the closest_intersection instance attribute in every building object, and the close_buildings instance attribute
     in every intersection object according to the datasets provided.
+    If stats is not None, the time spent loading is recorded in its 'load' phase.
+
+    In the PLANAR distance mode, the coordinates of every building and intersection are projected once to local
+    metres (see entities.Projection), and every distance (edge lengths, closest intersections, search heuristics)
+    is then a cheap planar distance instead of the haversine formula. Raise a ValueError on an unknown mode.
 
     Preconditions:
       - building_file is the path to a csv file in the format of the provided building_data.csv
       - intersection_file is the path to a csv file in the format of the provided intersection_data.csv
     """
+    if distance_mode not in DISTANCE_MODES:
+        raise ValueError(f'unknown distance mode {distance_mode!r}')
+    with phase(stats, 'load'):
+        return _load_grid(building_file, intersection_file, distance_mode)
+
+
+def _load_grid(building_file: str, intersection_file: str, distance_mode: str) -> AbstractGrid:
+    """Helper to load_data, reading both files and building the connected grid."""
     # loading in buildings
     buildings_dict = load_buildings(building_file)
 
     # loading in intersections
     intersections, intersections_dict = load_intersections(intersection_file)
 
-    my_grid = AbstractGrid(intersections_dict, buildings_dict)
+    my_grid = AbstractGrid(intersections_dict, buildings_dict, amenity_index=AmenityIndex(buildings_dict))
+    if distance_mode == PLANAR and intersections_dict:
+        project_grid(my_grid)
 
     # now, connect the graph
-    edges_so_far = []
+    edges_so_far = set()
     for i in range(1, len(intersections)):
         row = intersections[i]
         current_intersection_id = int(row[0])
         for j in range(5, len(row)):
-            if row[j] != '' and {current_intersection_id, int(row[j])} not in edges_so_far:
+            if row[j] != '' and frozenset((current_intersection_id, int(row[j]))) not in edges_so_far:
                 intersection1 = my_grid.intersections[current_intersection_id]
                 intersection2 = my_grid.intersections[int(row[j])]
-                new_edge = Edge(intersection1, intersection2)
+                new_edge = Edge(intersection1, intersection2, len(edges_so_far))
                 # update the two intersections
                 intersection1.edges.add(new_edge)
                 intersection2.edges.add(new_edge)
                 # update the accumulator
-                edges_so_far.append({current_intersection_id, int(row[j])})
+                edges_so_far.add(frozenset((current_intersection_id, int(row[j]))))
 
     join_buildings_intersections(my_grid)
+    my_grid.edge_weights(SHORTEST)
+    label_components(my_grid)
 
     return my_grid
 
@@ -107,20 +133,337 @@ def load_intersections(intersection_file: str) -> tuple[list, dict[int, Intersec
     return intersections, intersections_dict
 
 
-def join_buildings_intersections(my_grid: AbstractGrid) -> None:
-    """Helper method that mutates grid to connect buildings with closest intersections."""
-    for building in my_grid.buildings:
-        intersection_id = my_grid.find_closest_intersection(my_grid.buildings[building].code)
-        my_grid.buildings[building].closest_intersection = my_grid.intersections[
-            intersection_id]
-
-    for intersection_obj in my_grid.intersections:
-        buildings_code_set = my_grid.find_close_buildings(my_grid.intersections[intersection_obj].identifier)
-        close_buildings_set = set()
-        for code in buildings_code_set:
-            building_obj = my_grid.buildings[code]
-            close_buildings_set.add(building_obj)
-        my_grid.intersections[intersection_obj].close_buildings = close_buildings_set
+def project_grid(my_grid: AbstractGrid) -> None:
+    """Mutate my_grid to project the coordinates of all its buildings and intersections to local metres, around
+    the middle of its intersections (see entities.Projection). Distances involving them are then planar.
+    This must be done before the edges of my_grid are created, as edges measure their distance when created.
+    """
+    my_grid.projection = Projection.around(i.coordinates for i in my_grid.intersections.values())
+    for point in [*my_grid.intersections.values(), *my_grid.buildings.values()]:
+        point.projected = my_grid.projection.project(point.coordinates)
+
+
+def join_buildings_intersections(my_grid: AbstractGrid, buildings: Optional[list[Building]] = None) -> None:
+    """Helper method that mutates grid to connect buildings with closest intersections.
+    The closest intersections are found through a SpatialIndex, and give the same result as calling
+    my_grid.find_closest_intersection on every building, without scanning every intersection for every building.
+    Only street intersections are considered: routes start and end on the street, never at a building entrance.
+    If buildings is not None, only those buildings are connected, and the other close buildings are kept.
+    """
+    if buildings is None:
+        buildings = list(my_grid.buildings.values())
+        for intersection_obj in my_grid.intersections.values():
+            intersection_obj.close_buildings = set()
+    if not buildings:
+        return
+    index = SpatialIndex(i for i in my_grid.intersections.values() if i.building is None)
+
+    for building_obj in buildings:
+        closest = index.nearest(building_obj.coordinates, building_obj.projected)
+        building_obj.closest_intersection = closest
+        closest.close_buildings.add(building_obj)
+
+
+def reload_buildings(my_grid: AbstractGrid, building_file: str) -> AbstractGrid:
+    """Return a new grid with the buildings of building_file, on a copy of the routing graph of my_grid: its
+    intersections, building entrances, edges, weight profiles and projection are copied instead of being loaded
+    again from their files. The result is the grid loading every file again would give, when only building_file
+    changed. my_grid is not modified, so queries can keep searching it meanwhile.
+    Only the buildings that are new or moved are joined to their closest intersection: the others keep theirs.
+    Raise a ValueError if a building with entrances in my_grid is no longer in building_file.
+
+    Preconditions:
+      - building_file is the path to a csv file in the format of the provided building_data.csv
+      - my_grid was not contracted (see contract_degree_two), as a building could be closest to an intersection
+        it removed
+    """
+    buildings_dict = load_buildings(building_file)
+    intersections = _copy_routing_graph(my_grid)
+    for code, building in my_grid.buildings.items():
+        if building.entrances and code not in buildings_dict:
+            raise ValueError(f'building {code!r} has entrances, but it is not in {building_file}')
+        for name, entrance in building.entrances.items():
+            intersections[entrance.identifier].building = buildings_dict[code]
+            buildings_dict[code].entrances[name] = intersections[entrance.identifier]
+
+    weight_profiles = {name: array('d', weights) for name, weights in my_grid.weight_profiles.items()}
+    new_grid = AbstractGrid(intersections, buildings_dict, weight_profiles, AmenityIndex(buildings_dict))
+    new_grid.projection = my_grid.projection
+    if new_grid.projection is not None:
+        for building in buildings_dict.values():
+            building.projected = new_grid.projection.project(building.coordinates)
+
+    moved = []
+    for code, building in buildings_dict.items():
+        previous = my_grid.buildings.get(code)
+        if previous is None or previous.coordinates != building.coordinates or previous.closest_intersection is None:
+            moved.append(building)
+        else:
+            building.closest_intersection = intersections[previous.closest_intersection.identifier]
+            building.closest_intersection.close_buildings.add(building)
+    join_buildings_intersections(new_grid, moved)
+    return new_grid
+
+
+def _copy_routing_graph(my_grid: AbstractGrid) -> dict[int, Intersection]:
+    """Return a copy of the intersections of my_grid, keyed by identifier, joined by copies of its edges.
+    The copies have no close buildings, and the copied entrances still refer to the buildings of my_grid.
+    """
+    intersections = {}
+    for identifier, intersection in my_grid.intersections.items():
+        twin = copy.copy(intersection)
+        twin.edges = set()
+        twin.close_buildings = set()
+        intersections[identifier] = twin
+
+    for intersection in my_grid.intersections.values():
+        for edge in intersection.edges:
+            if edge.endpoints[0] is intersection:  # copy every edge once, from its first endpoint
+                twin = copy.copy(edge)
+                twin.endpoints = (intersections[edge.endpoints[0].identifier],
+                                  intersections[edge.endpoints[1].identifier])
+                twin.endpoints[0].edges.add(twin)
+                twin.endpoints[1].edges.add(twin)
+    return intersections
+
+
+def load_indoor_edges(my_grid: AbstractGrid, entrance_file: str, indoor_file: str) -> None:
+    """Mutate my_grid to add the entrances of its buildings as nodes of the routing graph, and the indoor edges
+    between them, so that paths can pass through buildings.
+
+    Each row of entrance_file is building,entrance,latitude,longitude. Every entrance becomes an Intersection
+    (with an identifier above those of the street intersections) joined to its closest street intersection.
+    Each row of indoor_file is building,entrance1,entrance2,distance: an indoor edge between two entrances of the
+    building. An empty distance is the straight-line distance between the entrances.
+
+    The new edges are indexed after the existing ones, and every weight profile already loaded is extended with
+    their distances, so this must be called before load_weight_profiles to give them other weights.
+    The closest_intersection of every building is unchanged: routes still start and end on the street.
+
+    Preconditions:
+      - entrance_file and indoor_file are paths to csv files in the format of the provided building_entrances.csv
+        and indoor_edges.csv
+      - every building in the files is in my_grid.buildings
+    """
+    index = SpatialIndex(my_grid.intersections.values())
+    next_id = max(my_grid.intersections, default=0) + 1
+    new_edges = []
+    first_index = len(my_grid.edge_weights(SHORTEST))
+
+    def add_edge(intersection1: Intersection, intersection2: Intersection) -> Edge:
+        """Add an edge between the two intersections, indexed after the edges of my_grid, and return it."""
+        edge = Edge(intersection1, intersection2, first_index + len(new_edges))
+        intersection1.edges.add(edge)
+        intersection2.edges.add(edge)
+        new_edges.append(edge)
+        return edge
+
+    with open(entrance_file) as imported_entrance_file:
+        entrance_reader = csv.reader(imported_entrance_file)
+        next(entrance_reader)
+        for row in entrance_reader:
+            building = my_grid.buildings[row[0]]
+            entrance = Intersection(next_id, {building.name, row[1] + ' entrance'}, (float(row[2]), float(row[3])))
+            next_id += 1
+            entrance.building = building
+            if my_grid.projection is not None:
+                entrance.projected = my_grid.projection.project(entrance.coordinates)
+            building.entrances[row[1]] = entrance
+            add_edge(entrance, index.nearest(entrance.coordinates, entrance.projected))
+            my_grid.intersections[entrance.identifier] = entrance
+
+    with open(indoor_file) as imported_indoor_file:
+        indoor_reader = csv.reader(imported_indoor_file)
+        next(indoor_reader)
+        for row in indoor_reader:
+            building = my_grid.buildings[row[0]]
+            edge = add_edge(building.entrances[row[1]], building.entrances[row[2]])
+            if len(row) > 3 and row[3] != '':
+                edge.distance = float(row[3])
+
+    for weights in my_grid.weight_profiles.values():
+        weights.extend(edge.distance for edge in new_edges)
+    label_components(my_grid)
+
+
+def label_components(my_grid: AbstractGrid) -> int:
+    """Mutate my_grid to set the component of every intersection to the identifier of its connected component,
+    using a union-find over the edges, and return the number of components.
+    Components are numbered from 0, in the order of their first intersection in my_grid.intersections.
+    Intersections without any edge are reported with a warning, as they are most likely errors in the data.
+    """
+    parent = {identifier: identifier for identifier in my_grid.intersections}
+
+    def find(identifier: int) -> int:
+        """Return the representative of the component of the given intersection."""
+        while parent[identifier] != identifier:
+            parent[identifier] = parent[parent[identifier]]
+            identifier = parent[identifier]
+        return identifier
+
+    for intersection in my_grid.intersections.values():
+        for edge in intersection.edges:
+            root1 = find(intersection.identifier)
+            root2 = find(edge.get_other_endpoint(intersection).identifier)
+            if root1 != root2:
+                parent[root1] = root2
+
+    components = {}
+    for identifier, intersection in my_grid.intersections.items():
+        intersection.component = components.setdefault(find(identifier), len(components))
+        if not intersection.edges:
+            logger.warning('Intersection %d (%s) is isolated: it has no edges', identifier,
+                           ' & '.join(sorted(intersection.name)))
+    if len(components) > 1:
+        logger.info('The grid has %d connected components', len(components))
+    return len(components)
+
+
+def load_weight_profiles(my_grid: AbstractGrid, profile_file: str) -> None:
+    """Mutate my_grid to add one edge-weight profile (see AbstractGrid.weight_profiles) for every column of
+    the given profile file after the first two.
+
+    Each row of the file is intersection1,intersection2,factor,factor,...: the weight of the edge between the two
+    intersections in a profile is its distance times the factor in that profile's column. A factor of inf makes
+    the edge impassable in that profile (for example stairs, for an accessible profile). Edges that are not listed,
+    or with an empty factor, weigh their distance.
+    The provided edge_profiles.csv has a single profile, covered, which lists every street segment with a factor
+    of 2, so that covered routes walk through buildings, along their indoor edges, where they can.
+
+    Preconditions:
+      - profile_file is the path to a csv file in the format of the provided edge_profiles.csv
+      - every edge in profile_file is in my_grid
+    """
+    distances = my_grid.edge_weights(SHORTEST)
+    with open(profile_file) as imported_profile_file:
+        profile_reader = csv.reader(imported_profile_file)
+        header = next(profile_reader)
+        profiles = {name: array('d', distances) for name in header[2:]}
+        for row in profile_reader:
+            intersection1 = my_grid.intersections[int(row[0])]
+            edge = intersection1.find_edge(my_grid.intersections[int(row[1])])
+            for name, factor in zip(header[2:], row[2:]):
+                if factor != '':
+                    profiles[name][edge.index] = edge.distance * float(factor)
+    my_grid.weight_profiles.update(profiles)
+
+
+def weight_profile_names(profile_file: str) -> list[str]:
+    """Return the names of the weight profiles of the given profile file (see load_weight_profiles), read from its
+    header, without loading the grid.
+
+    >>> weight_profile_names('data/edge_profiles.csv')
+    ['covered']
+    """
+    with open(profile_file) as imported_profile_file:
+        return next(csv.reader(imported_profile_file))[2:]
+
+
+def contract_degree_two(my_grid: AbstractGrid) -> int:
+    """Mutate my_grid to replace every chain of intersections that only continue a street by a single edge, and
+    return the number of intersections removed.
+
+    An intersection is removed when it has exactly two edges, to two different neighbours, and nothing else
+    depends on it: it is the closest intersection of no building, it is not a building entrance, crossing it
+    never involves waiting, and neither of its edges has a time profile. Its two edges are replaced by a single
+    edge between its neighbours, weighing the sum of their weights in every profile, whose via records the
+    coordinates of the removed intersections, so that routes are still drawn along the exact shape of the street.
+    Shortest paths between the remaining intersections are unchanged. The edges are then indexed again from 0.
+
+    This must be called after every other loading step (indoor edges, weight and time profiles), and before
+    anything is computed over the grid (landmark tables, frozen snapshots, search indexes). The identifiers of
+    the removed intersections are no longer valid.
+    """
+    my_grid.edge_weights(SHORTEST)
+    names = list(my_grid.weight_profiles)
+    merged_weights = {}  # the weights in every profile of the new edges, which have no index yet
+
+    def weights_of(edge: Edge) -> tuple[float, ...]:
+        """Return the weight of edge in every profile, in the order of names."""
+        if edge in merged_weights:
+            return merged_weights[edge]
+        return tuple(my_grid.weight_profiles[name][edge.index] for name in names)
+
+    removed = 0
+    for identifier in list(my_grid.intersections):
+        intersection = my_grid.intersections[identifier]
+        if len(intersection.edges) != 2 or intersection.close_buildings or intersection.building is not None \
+                or intersection.wait_profile is not None \
+                or any(edge.time_profile is not None for edge in intersection.edges):
+            continue
+        # in the order of their neighbours, so that the new edge does not depend on the order of a set
+        edge1, edge2 = sorted(intersection.edges, key=lambda e: e.get_other_endpoint(intersection).identifier)
+        neighbour1, neighbour2 = edge1.get_other_endpoint(intersection), edge2.get_other_endpoint(intersection)
+        if neighbour1 is neighbour2:
+            continue
+
+        edge = Edge(neighbour1, neighbour2)
+        edge.distance = edge1.distance + edge2.distance
+        edge.via = tuple(edge1.geometry(neighbour1)[1:] + edge2.geometry(intersection)[1:-1])
+        merged_weights[edge] = tuple(map(sum, zip(weights_of(edge1), weights_of(edge2))))
+        merged_weights.pop(edge1, None)
+        merged_weights.pop(edge2, None)
+        neighbour1.edges.remove(edge1)
+        neighbour2.edges.remove(edge2)
+        neighbour1.edges.add(edge)
+        neighbour2.edges.add(edge)
+        del my_grid.intersections[identifier]
+        removed += 1
+
+    # index the remaining edges again, in the order of their first endpoint in my_grid.intersections
+    edges = []
+    for intersection in my_grid.intersections.values():
+        for edge in sorted(intersection.edges,
+                           key=lambda e: (e.get_other_endpoint(intersection).identifier, e.distance)):
+            if edge.endpoints[0] is intersection:
+                edges.append((edge, weights_of(edge)))
+    for position, name in enumerate(names):
+        my_grid.weight_profiles[name] = array('d', (weights[position] for _, weights in edges))
+    for index, (edge, _) in enumerate(edges):
+        edge.index = index
+    logger.info('Contracted %d intersections: %d left, with %d edges', removed, len(my_grid.intersections),
+                len(edges))
+    return removed
+
+
+def load_time_profiles(my_grid: AbstractGrid, profile_file: str) -> None:
+    """Mutate my_grid to set the wait_profile of its intersections and the time_profile of its edges,
+    according to the given time profile file.
+
+    Each row of the file is either
+      - intersection,,start,end,wait: crossing the intersection takes wait seconds between start and end, or
+      - intersection,neighbour,start,end,factor: walking the edge between the intersection and its neighbour
+        takes factor times longer than usual between start and end,
+    where start and end are times of day written as HH:MM. A row applies to every time slot starting in
+    [start, end), and later rows override earlier ones. The profiles are expanded into one value per time slot
+    here, so that time-dependent searches only have to index them.
+
+    Preconditions:
+      - profile_file is the path to a csv file in the format of the provided time_profiles.csv
+      - every intersection and edge in profile_file is in my_grid
+    """
+    waits = {}
+    factors = {}
+    with open(profile_file) as imported_profile_file:
+        profile_reader = csv.reader(imported_profile_file)
+        next(profile_reader)
+        for row in profile_reader:
+            intersection = my_grid.intersections[int(row[0])]
+            first_slot = int(time_to_seconds(row[2]) // SLOT_SECONDS)
+            last_slot = int(-(-time_to_seconds(row[3]) // SLOT_SECONDS))
+            if row[1] == '':
+                profile = waits.setdefault(intersection, [0.0] * TIME_SLOTS)
+            else:
+                edge = intersection.find_edge(my_grid.intersections[int(row[1])])
+                profile = factors.setdefault(edge, [1.0] * TIME_SLOTS)
+            for slot in range(first_slot, min(last_slot, TIME_SLOTS)):
+                profile[slot] = float(row[4])
+
+    for intersection, profile in waits.items():
+        intersection.wait_profile = array('f', profile)
+    for edge, profile in factors.items():
+        base_time = edge.distance / WALKING_SPEED
+        edge.time_profile = array('f', [base_time * factor for factor in profile])
 
 
 if __name__ == '__main__':
@@ -6,6 +6,9 @@ Module Description
 This module is the main module you need to run our program! Just click Run on your Python Interpreter and watch the
 magic unfold as you become a speedy, efficient, and smart U of T Speedrunner!
 
+Run it with --watch to reload the data files whenever they change, without restarting the program: routes
+asked for after a reload use the new data (see hot_reload).
+
 Copyright and Usage Information
 ===============================
 
@@ -17,7 +20,12 @@ this code, whether modified or otherwise.
 This file is Copyright (c) 2023
 Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
 """
+import argparse
+import logging
+import map_generation as mg
 import user_interaction as ui
+from hot_reload import DEFAULT_INTERVAL
+from instrumentation import configure_logging
 
 
 if __name__ == '__main__':
@@ -25,4 +33,15 @@ if __name__ == '__main__':
 
     doctest.testmod()
 
+    parser = argparse.ArgumentParser(description='Run UofT Speedrunner.')
+    parser.add_argument('--watch', action='store_true',
+                        help='reload the data files in the background whenever they change')
+    parser.add_argument('--watch-interval', type=float, default=DEFAULT_INTERVAL,
+                        help='the number of seconds between two checks of the data files')
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.watch:
+        logging.getLogger('hot_reload').setLevel(logging.INFO)  # report every reload
+        mg.DATA.start(args.watch_interval)
     ui.io_main_menu()
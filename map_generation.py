@@ -19,15 +19,31 @@ This file is Copyright (c) 2023
 Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
 Special thanks to OpenStreetMaps for providing the map tile data.
 """
+from typing import Optional
 import folium
 import entities as ent
 import load_all_data
+import route_planning
+from hot_reload import DataWatcher, GridVersion
+from instrumentation import QueryStats, phase
+import logging
 import os
 import webbrowser
-import math
 
-# default grid data
-DEFAULT = load_all_data.load_data('data/building_data.csv', 'data/intersections_data.csv')
+logger = logging.getLogger(__name__)
+
+# default grid data, with its frozen snapshot, query planner and place index; in watcher mode (see main.py), it is
+# reloaded in the background whenever the data files change
+DATA = DataWatcher('data/building_data.csv', 'data/intersections_data.csv',
+                   ('data/building_entrances.csv', 'data/indoor_edges.csv'), 'data/edge_profiles.csv')
+
+
+def current() -> GridVersion:
+    """
+    Return the version of the default grid data served to new queries.
+    A query should call this once, and use the returned version until it is answered.
+    """
+    return DATA.current
 
 
 ## Map generation tools ##
@@ -55,27 +71,38 @@ def show_map(fmap: folium.Map) -> None:
 
 
 # ## general map generation mechanisms for buildings and intersections ##
-def generate_all_building_points(amenity: str = None, grid: ent.AbstractGrid = DEFAULT) -> None:
+def generate_all_building_points(amenity: str | list[str] = None, grid: Optional[ent.AbstractGrid] = None) -> None:
     """
     Visualize all buildings which have a specified amenity, or all buildings if amenity is None.
+    amenity can also be a list of amenities, to visualize the buildings providing all of them.
+    The buildings are read from the amenity index of grid, the current default grid if it is None.
 
     Preconditions:
-    - (amenity in ent.AMENITIES) or (amenity is None)
+    - (amenity in ent.AMENITIES) or (amenity is None) or all(a in ent.AMENITIES for a in amenity)
     """
+    if grid is None:
+        grid = current().grid
     data = grid.buildings
     names = []
     lat = []
     lon = []
     amenities = []
 
-    for i in [j for j in data if (amenity in data[j].amenities) or (amenity is None)]:
+    if amenity is None:
+        wanted = []
+    elif isinstance(amenity, str):
+        wanted = [amenity]
+    else:
+        wanted = amenity
+
+    for i in grid.buildings_with(wanted):
         # get list of all building names
         str3 = '[' + i + '] ' + data[i].name
         names.append(str3)
 
         # get amenities
         amenity_data = list(data[i].amenities)
-        print(amenity_data)
+        logger.debug('amenities of %s: %s', i, amenity_data)
         if len(amenity_data) == 0:
             amenities.append('')
         else:
@@ -104,10 +131,12 @@ def generate_all_building_points(amenity: str = None, grid: ent.AbstractGrid = D
     show_map(m)
 
 
-def generate_all_intersection_points(grid: ent.AbstractGrid = DEFAULT) -> None:
+def generate_all_intersection_points(grid: Optional[ent.AbstractGrid] = None) -> None:
     """
-    Generate all intersections extant in the intersection data file.
+    Generate all intersections extant in the intersection data file, or in grid if it is not None.
     """
+    if grid is None:
+        grid = current().grid
     data = grid.intersections
     names = []
     lat = []
@@ -146,11 +175,13 @@ def generate_all_intersection_points(grid: ent.AbstractGrid = DEFAULT) -> None:
     show_map(m)
 
 
-def generate_all_intersection_points_with_edges(grid: ent.AbstractGrid = DEFAULT,
+def generate_all_intersection_points_with_edges(grid: Optional[ent.AbstractGrid] = None,
                                                 ids: list[int] = None) -> None:
     """
-    Generate all intersection points with edges shown.
+    Generate all intersection points with edges shown, of the current default grid if grid is None.
     """
+    if grid is None:
+        grid = current().grid
     data = grid.intersections
     names = []
     lat = []
@@ -189,8 +220,9 @@ def generate_all_intersection_points_with_edges(grid: ent.AbstractGrid = DEFAULT
 
     for i in ids:
         edges_to_examine = list(data[i].edges)
-        print(edges_to_examine)
-        _visualize_path(m, edges_to_examine)
+        logger.debug('edges of intersection %s: %s', i, edges_to_examine)
+        for edge in edges_to_examine:
+            _visualize_path(m, ent.Route(data[i], [edge]))
 
     show_map(m)
 
@@ -303,57 +335,41 @@ def _generate_single_intersection(m: folium.Map, intersection: ent.Intersection,
 
 
 # path generation tools
-def _visualize_path(m: folium.Map, edges: list[ent.Edge]) -> None:
+def _visualize_path(m: folium.Map, route: ent.Route) -> None:
     """
-    Visualize paths between two nodes given a list of edges.
+    Visualize a route as a single line through its street points, in order: its intersections, and the points
+    along the edges contracted by load_all_data.contract_degree_two.
     """
-    # for each edge, get the coordinates for each endpoint
-    for edge in edges:
-        # getting endpoints
-        endpoint_1 = list(edge.endpoints)[0]
-        endpoint_2 = edge.get_other_endpoint(endpoint_1)
+    if len(route.nodes) < 2:
+        return
 
-        # getting the coordinates
-        points = [[endpoint_1.coordinates[0], endpoint_1.coordinates[1]],
-                  [endpoint_2.coordinates[0], endpoint_2.coordinates[1]]]
+    # getting the coordinates
+    points = [[latitude, longitude] for latitude, longitude in route.coordinates()]
+    logger.debug('route through intersections %s', route.identifiers())
 
-        str2 = 'id: ', endpoint_1.identifier, points[0], 'other intersection: ', \
-            endpoint_2.identifier, points[1]
-        print(str2)
+    # add the line
+    folium.PolyLine(points, color="red", weight=2.5, opacity=1).add_to(m)
 
-        # add the lines
-        folium.PolyLine(points, color="red", weight=2.5, opacity=1).add_to(m)
-
-def _visualize_intermediary_paths(m: folium.Map, edges: list[ent.Edge], intersections: list[ent.Intersection]) -> \
-        list[ent.Intersection]:
+def _visualize_intermediary_paths(m: folium.Map, route: ent.Route) -> None:
     """
-    Visualizes intermediary paths and their intersections.
+    Visualizes intermediary paths and their intersections, numbered from 2 after the first intersection.
     """
-    intersections_so_far = intersections
-
-    path_num = 2
-    for edge in edges:
-        latest_intersection = intersections_so_far[len(intersections_so_far) - 1]
-        other_endpoint = edge.get_other_endpoint(latest_intersection)
-        _generate_single_intersection(m, other_endpoint, path_num)
-        intersections_so_far.append(other_endpoint)
-        path_num += 1
+    for path_num in range(2, len(route.nodes) + 1):
+        _generate_single_intersection(m, route.nodes[path_num - 1], path_num)
 
     # map edges
-    _visualize_path(m, edges)
+    _visualize_path(m, route)
 
-    return intersections_so_far
 
-
-def _visualize_complete_path(m: folium.Map, edges: list[list[ent.Edge]], start: ent.Building,
+def _visualize_complete_path(m: folium.Map, routes: list[ent.Route], start: ent.Building,
                              end: ent.Building, stopovers: list[ent.Building],
                              chosen_amenities: list[str]) -> None:
     """
     Visualize the shortest path between TWO buildings, utilizing a set of intersections.
     Intermediary nodes are numbered from start to end.
 
-    Detours are optional. All detours are listed in edges[1:] in the form of a list of edges to the desired
-    amenity location.
+    Detours are optional. All detours are listed in routes[1:], each starting from an intersection of the main
+    route routes[0] and ending at the desired amenity location.
 
     Example:
     - start > 1 > 2 > 3 > 4 > 5
@@ -400,134 +416,105 @@ def _visualize_complete_path(m: folium.Map, edges: list[list[ent.Edge]], start:
     folium.PolyLine(points_e, color="red", weight=2.5, opacity=1).add_to(m)
 
     # map primary path
-    intersections_in_primary_path = _visualize_intermediary_paths(m, edges[0], [start.closest_intersection])
-
-    # map detour paths
-    if len(edges[1:]) > 0:
-        for path in edges[1:]:
-
-            # handle case where no intermediary paths are required for stopovers
-            if len(path) == 0:
-                pass
-
-            else:
-                # we need to get the first intersection into intersections_so_far to start path generation
-                add_intersection = list(path[0].endpoints)[0]
-                if add_intersection not in intersections_in_primary_path:
-                    add_intersection = path[0].get_other_endpoint(add_intersection)
+    _visualize_intermediary_paths(m, routes[0])
 
-                _visualize_intermediary_paths(m, path, [add_intersection])
+    # map detour paths; a detour without edges needs no intermediary path
+    for route in routes[1:]:
+        _visualize_intermediary_paths(m, route)
 
 
 # ## RUNNERS
-def visualize_djikstra(start: str, end: str) -> None:
+def visualize_djikstra(start: str, end: str, stats: Optional[QueryStats] = None,
+                       speculation: Optional[route_planning.SpeculativeRoute] = None,
+                       version: Optional[GridVersion] = None) -> None:
     """
     Generate and visualize a path between point A and point B.
     Note: in the final visualization of the path it is also possible for duplicates to be allowed,
     as this represent that a student may have different classes at different times and the optimal path between
     each of them may make use of an intersaction used "previously during the day".
+    If stats is not None, the search counters and the timings of every phase are recorded in it.
+    If speculation is a SpeculativeRoute started from start, the path is read from its precomputed results.
+    The path is planned on version, or on the current version of the default grid data if it is None.
 
     Preconditions:
     - start is a valid building code
     - end is a valid building code
     """
-    datum = DEFAULT
-    dji = load_all_data.DijkstraGrid(datum.intersections, datum.buildings)
     m = generate_map("OpenStreetMap")
+    version = current() if version is None else version
 
-    building_data = datum.buildings  # dict[str, Building]
+    try:
+        planned = version.planner.plan_route(start, end, [], stats, speculation)
+    except ValueError:
+        logger.warning('Sorry, it seems like your destination is not reacheable :(')
+        return
+    route, start_building, end_building = planned.main_route, planned.start, planned.end
 
-    # start/end building data
-    start_building = building_data[start]
-    end_building = building_data[end]
+    with phase(stats, 'render'):
+        _visualize_complete_path(m, [route], start_building, end_building, [], [])
 
-    # start/end intersection data
-    start_intersection = start_building.closest_intersection
-    end_intersection = end_building.closest_intersection
+        # output
+        show_map(m)
 
-    edges = dji.find_shortest_path(start_intersection.identifier, end_intersection.identifier)
-    _visualize_complete_path(m, [edges], start_building, end_building, [], [])
 
-    # output
-    show_map(m)
+def visualize_route(start: str, end: str, route: ent.Route, stats: Optional[QueryStats] = None,
+                    version: Optional[GridVersion] = None) -> None:
+    """
+    Visualize an already computed path between the buildings start and end, such as the path the user chose
+    from a Pareto front (see route_planning.pareto_routes).
+    If stats is not None, the rendering time is recorded in it.
+    The buildings are read from version, the version route was computed on, or from the current version of the
+    default grid data if it is None.
+
+    Preconditions:
+    - start is a valid building code
+    - end is a valid building code
+    - route goes from the closest intersection of start to the closest intersection of end
+    """
+    m = generate_map("OpenStreetMap")
+    buildings = (current() if version is None else version).grid.buildings
+    with phase(stats, 'render'):
+        _visualize_complete_path(m, [route], buildings[start], buildings[end], [], [])
+        show_map(m)
 
 
-def visualize_djikstra_with_stopovers(start: str, end: str, amenities: list[str]) -> None:
+def visualize_djikstra_with_stopovers(start: str, end: str, amenities: list[str],
+                                      stats: Optional[QueryStats] = None,
+                                      speculation: Optional[route_planning.SpeculativeRoute] = None,
+                                      version: Optional[GridVersion] = None) -> None:
     """
     Re-implementation of Djikstra on July 10, 2023.
     Generates a path from start to end, and then generates supplementary paths that 'branch' from the initial path
-    to the stopovers.
+    to the stopovers. The stopovers are chosen by route_planning.plan_route, on the engine picked by the planner of
+    version, or of the current version of the default grid data if it is None. If no building providing one of
+    the amenities is reachable, a warning is logged and no map is shown.
+    If stats is not None, the search counters and the timings of every phase are recorded in it.
+    If speculation is a SpeculativeRoute started from start, the paths are read from its precomputed results.
 
     Preconditions:
     - start is a valid building id
     - end is a valid building id
     - all elements of amenities are valid amenity strings
     """
-    data = DEFAULT
-    dji = load_all_data.DijkstraGrid(data.intersections, data.buildings)
     m = generate_map("OpenStreetMap")
 
-    building_data = data.buildings  # dict[str, Building]
+    version = current() if version is None else version
+    try:
+        route = version.planner.plan_route(start, end, amenities, stats, speculation)
+    except ValueError as error:
+        # no building provides an amenity, or none is reachable (the data may have been reloaded since the input)
+        logger.warning('Sorry, it seems like your route cannot be planned: %s :(', error)
+        return
+    logger.debug('main path: %d edges, %d stopovers', len(route.main_route.edges), len(route.stopovers))
 
-    # start/end building data
-    start_building = building_data[start]
-    end_building = building_data[end]
+    # list[Route]. Begin with the main route as the first element in the list.
+    all_routes = [route.main_route] + route.detours
 
-    # start/end intersection data
-    start_intersection = start_building.closest_intersection
-    end_intersection = end_building.closest_intersection
+    with phase(stats, 'render'):
+        _visualize_complete_path(m, all_routes, route.start, route.end, route.stopovers, amenities)
 
-    amenity_buildings = get_buildings_by_amenity_type(amenities)
-    main_path_edges = dji.find_shortest_path(start_intersection.identifier, end_intersection.identifier)
-    all_paths = [main_path_edges]  # list[list[Edge]]. Begin with the main path as the first element in the list.
-
-    # list building codes hosting amenities which are closest to main path \this is needed for generating stopovers.
-    stopovers = []
-
-    if main_path_edges:
-        main_path_intersections = edge_to_intersection_path(main_path_edges)
-        print(len(main_path_edges))
-        print(len(main_path_intersections))
-    else:
-        # In this case, the path contains no edges.
-        # This means that the start and end building have a common closest intersection,
-        # which is used as the only "middle point" in the path
-        assert building_data[start].closest_intersection == building_data[end].closest_intersection
-        # At this point, we can represent the path solely as the closest intersection.
-        main_path_intersections = [building_data[start].closest_intersection]
-
-    # 1. Go through each sublist.
-    # Eg: amenity_buildings = [['BN', 'GO', 'HH', 'VA', 'WS'], ['QPK', 'MUS', 'STG', 'SPD']].
-    # On the first iteration, list_of_amenity_buildings = ['BN', 'GO', 'HH', 'VA', 'WS'].
-    for list_of_amenity_buildings in amenity_buildings:
-        amenity_id_with_shortest_distance = None
-        main_intersection_id_with_shortest_distance = None
-        chosen_building = None
-        distance = math.inf
-        # 2. Go through each individual building.
-        # Eg: on the first iteration, amenity_building_code = BN.
-        for amenity_building_code in list_of_amenity_buildings:
-            amenity_building = building_data[amenity_building_code]
-            amenity_intersection = amenity_building.closest_intersection
-            amenity_id = amenity_intersection.identifier
-            # 3. Go through each intersection of the main path that goes from start to end.
-            for intersection in main_path_intersections:
-                distance_between_main_intersection_and_amenity \
-                                 = ent.get_distance(intersection.coordinates, amenity_building.coordinates)
-                if distance_between_main_intersection_and_amenity < distance:
-                        amenity_id_with_shortest_distance = amenity_id
-                        main_intersection_id_with_shortest_distance = intersection.identifier
-                        distance = distance_between_main_intersection_and_amenity
-                        chosen_building = amenity_building
-        optimal_path = \
-            dji.find_shortest_path(main_intersection_id_with_shortest_distance, amenity_id_with_shortest_distance)
-        all_paths.append(optimal_path)
-        stopovers.append(chosen_building)
-
-    _visualize_complete_path(m, all_paths, start_building, end_building, stopovers, amenities)
-
-    # output
-    show_map(m)
+        # output
+        show_map(m)
 
 
 def get_buildings_by_amenity_type(amenities: list[str]) -> list[list[str]]:
@@ -538,40 +525,7 @@ def get_buildings_by_amenity_type(amenities: list[str]) -> list[list[str]]:
     Eg. amenity_buildings = [['BN', 'GO', 'HH', 'VA', 'WS'], ['QPK', 'MUS', 'STG', 'SPD']] when
     amenities = ['gym', 'transportation'].
     """
-    building_data = DEFAULT.buildings
-    amenity_buildings = []
-    count = 0
-    for amenity in amenities:
-        amenity_buildings.append([])
-        for building_id in building_data:
-            if amenity in building_data[building_id].amenities:
-                amenity_buildings[count].append(building_id)
-        count += 1
-
-    return amenity_buildings
-
-
-def edge_to_intersection_path(edges: list[ent.Edge]) -> list[ent.Intersection]:
-    """Given a list of edges of a path, return the same path expressed in terms of the corresponding intersections.
-
-    Preconditions:
-     - edges != []
-    """
-    if len(edges) == 1:
-        return list(edges[0].endpoints)
-    else:
-        first_endpoints = edges[0].endpoints
-        second_endpoints = edges[1].endpoints
-        first_intersection = list(first_endpoints.difference(second_endpoints))[0]
-
-        # Now that we found the actual first intersection, we can iterate through the edges to find the path
-        path_so_far = [first_intersection]
-        for edge in edges:
-            other_endpoint = edge.get_other_endpoint(path_so_far[-1])
-            path_so_far.append(other_endpoint)
-
-        return path_so_far
-
+    return route_planning.get_buildings_by_amenity_type(current().grid, amenities)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,353 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module routes across several campuses (St. George, Mississauga, Scarborough), each loaded from its own pair
+of building and intersection files, and joined by transit links (shuttle or TTC rides) between buildings tagged
+'transportation'.
+
+Cross-campus queries use a two-level scheme. The boundary nodes of a campus are the closest intersections of its
+transit buildings. When the grid is loaded, a shortest-path tree is computed from every boundary node, giving the
+walking distance between any two boundary nodes of a campus. A cross-campus query then only searches the campus
+of its start (from the start to its boundary nodes), runs Dijkstra's algorithm on the small overlay graph of
+boundary nodes and transit links, and reads the walk from the boundary of the destination campus from the
+precomputed trees. No campus graph is ever searched in full for a single query beyond the start campus.
+
+Transit rides are weighed in "walking metres": the distance walked at WALKING_SPEED in the duration of the ride,
+so that they can be compared with walking distances.
+
+A campus file has one campus per line, in the csv format campus,building_file,intersection_file.
+A transit file has one link per line, in the csv format building1,building2,minutes, and is walkable both ways.
+Lines starting with '#' are skipped in both.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Iterator, Optional
+import csv
+import heapq
+import math
+
+import load_all_data
+from concrete_grid import ShortestPathTree
+from entities import SHORTEST, WALKING_SPEED, AbstractGrid, Building, Edge, Route
+from frozen_grid import FrozenGrid, freeze
+from instrumentation import QueryStats, phase
+
+# The amenity tagging the buildings that transit links can join.
+TRANSIT_AMENITY = 'transportation'
+
+
+class TransitLink:
+    """
+    A transit ride between two buildings, usually on different campuses.
+
+    Instance Attributes:
+      - building1, building2: the buildings the ride joins (in both directions)
+      - minutes: the duration of the ride, waiting included
+
+    Representation Invariants:
+      - self.minutes >= 0
+      - TRANSIT_AMENITY in self.building1.amenities and TRANSIT_AMENITY in self.building2.amenities
+    """
+    building1: Building
+    building2: Building
+    minutes: float
+
+    def __init__(self, building1: Building, building2: Building, minutes: float) -> None:
+        """Initialize a transit link between the two buildings."""
+        self.building1 = building1
+        self.building2 = building2
+        self.minutes = minutes
+
+    def cost(self) -> float:
+        """Return the cost of the ride, in walking metres (see the module description).
+
+        >>> b = Building('XX', 'Station', {'transportation'}, (43.66, -79.39))
+        >>> round(TransitLink(b, b, 10).cost())
+        840
+        """
+        return self.minutes * 60 * WALKING_SPEED
+
+
+class MultiCampusRoute:
+    """
+    A route that may ride transit links between campuses.
+
+    Instance Attributes:
+      - segments: the walking route on every campus visited, in order
+      - links: the transit link ridden after every segment but the last one, in order
+
+    Representation Invariants:
+      - len(self.segments) == len(self.links) + 1
+    """
+    segments: list[Route]
+    links: list[TransitLink]
+
+    def __init__(self, segments: list[Route], links: list[TransitLink]) -> None:
+        """Initialize a route from its walking segments and transit links."""
+        self.segments = segments
+        self.links = links
+
+    def walking_distance(self) -> float:
+        """Return the total distance walked (in metres)."""
+        return sum(segment.distance() for segment in self.segments)
+
+    def duration(self) -> float:
+        """Return the duration of the route (in seconds), walking at WALKING_SPEED."""
+        return self.walking_distance() / WALKING_SPEED + sum(link.minutes * 60 for link in self.links)
+
+
+class MultiCampusGrid(AbstractGrid):
+    """
+    The grids of several campuses, merged into one AbstractGrid and joined by transit links.
+    The intersections of every campus after the first are renumbered above those of the previous campuses, and
+    their edges are reindexed after theirs, so that the merged grid has unique identifiers and one set of
+    edge-weight arrays. Campuses are not joined by any edge: they are separate components of the street graph.
+
+    Instance Attributes:
+      - campus_of: the name of the campus of every intersection
+      - links: the transit links between buildings
+      - boundaries: the boundary nodes (closest intersections of transit buildings) of every campus
+
+    Representation Invariants:
+      - all(self.campus_of[i] == campus for campus in self.boundaries for i in self.boundaries[campus])
+    """
+    campus_of: dict[int, str]
+    links: list[TransitLink]
+    boundaries: dict[str, list[int]]
+    # Private Instance Attributes:
+    #   - _engine: the frozen snapshot of the merged grid that searches run on
+    #   - _trees: the shortest-path tree rooted at every boundary node
+    #   - _overlay: the edges of the overlay graph leaving every boundary node, as (cost, node, link) tuples,
+    #     where link is the transit link ridden, or None for a walk within a campus
+    _engine: FrozenGrid
+    _trees: dict[int, ShortestPathTree]
+    _overlay: dict[int, list[tuple[float, int, Optional[TransitLink]]]]
+
+    def __init__(self, campuses: dict[str, AbstractGrid], links: list[tuple[str, str, float]]) -> None:
+        """Merge the grids of the given campuses, keyed by name, and join them with the given transit links,
+        written as (building code, building code, minutes). The campus grids are mutated by the merge.
+        Raise a ValueError if two campuses have a building with the same code, or if a link joins an unknown
+        building or one that is not tagged TRANSIT_AMENITY.
+        """
+        intersections, buildings = {}, {}
+        self.campus_of = {}
+        id_offset = edge_offset = 0
+        for name, campus in campuses.items():
+            edge_count = len(campus.edge_weights(SHORTEST))
+            edges = {edge for intersection in campus.intersections.values() for edge in intersection.edges}
+            for edge in edges:
+                edge.index += edge_offset
+            for intersection in campus.intersections.values():
+                intersection.identifier += id_offset
+                intersections[intersection.identifier] = intersection
+                self.campus_of[intersection.identifier] = name
+            for code, building in campus.buildings.items():
+                if code in buildings:
+                    raise ValueError(f'building code {code!r} is used on two campuses')
+                buildings[code] = building
+            id_offset = _next_offset(max(intersections, default=0))
+            edge_offset += edge_count
+        AbstractGrid.__init__(self, intersections, buildings)
+        load_all_data.label_components(self)
+
+        self.links = []
+        for code1, code2, minutes in links:
+            for code in (code1, code2):
+                if code not in buildings or TRANSIT_AMENITY not in buildings[code].amenities:
+                    raise ValueError(f'{code!r} is not a building tagged {TRANSIT_AMENITY!r}')
+            self.links.append(TransitLink(buildings[code1], buildings[code2], minutes))
+
+        self.boundaries = {name: [] for name in campuses}
+        for link in self.links:
+            for building in (link.building1, link.building2):
+                identifier = building.closest_intersection.identifier
+                if identifier not in self.boundaries[self.campus_of[identifier]]:
+                    self.boundaries[self.campus_of[identifier]].append(identifier)
+        self._engine = freeze(self)
+        self._precompute()
+
+    def _precompute(self) -> None:
+        """Compute the shortest-path tree of every boundary node, and the overlay graph."""
+        self._trees = {}
+        self._overlay = {}
+        for boundary in self.boundaries.values():
+            for node in boundary:
+                self._trees[node] = self._engine.shortest_path_tree(node)
+                self._overlay[node] = [(self._trees[node].distances[other], other, None)
+                                       for other in boundary
+                                       if other != node and other in self._trees[node].distances]
+        for link in self.links:
+            node1 = link.building1.closest_intersection.identifier
+            node2 = link.building2.closest_intersection.identifier
+            self._overlay[node1].append((link.cost(), node2, link))
+            self._overlay[node2].append((link.cost(), node1, link))
+
+    def find_shortest_path(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST) -> Optional[list[Edge]]:
+        """Return the edges of the shortest walk from id1 to id2 on a single campus, or None if id2 is on another
+        campus or not reachable. Use find_multi_campus_route for routes that may ride transit.
+        """
+        return self._engine.find_shortest_path(id1, id2, stats, profile)
+
+    def find_multi_campus_route(self, id1: int, id2: int,
+                                stats: Optional[QueryStats] = None) -> Optional[MultiCampusRoute]:
+        """Return the cheapest route from id1 to id2, in walking metres, riding transit links between campuses
+        if needed, or None if there is no such route.
+        Routes within a single campus never ride transit: they are a single walking segment.
+
+        Preconditions:
+         - id1 in self.intersections
+         - id2 in self.intersections
+
+        Two campuses along a street running north, with a station at one end, joined by a 45 minute shuttle:
+
+        >>> from entities import Intersection
+        >>> def campus(latitudes: list[float], longitude: float, station: str, at: int) -> AbstractGrid:
+        ...     points = {i: Intersection(i, {'Main Street'}, (lat, longitude)) for i, lat in enumerate(latitudes, 1)}
+        ...     for i in range(1, len(latitudes)):
+        ...         edge = Edge(points[i], points[i + 1], i - 1)
+        ...         points[i].edges.add(edge)
+        ...         points[i + 1].edges.add(edge)
+        ...     building = Building(station, 'Station', {TRANSIT_AMENITY}, points[at].coordinates)
+        ...     building.closest_intersection = points[at]
+        ...     return AbstractGrid(points, {station: building})
+        >>> grid = MultiCampusGrid({'St. George': campus([43.660, 43.661, 43.662], -79.395, 'SG', 3),
+        ...                         'Mississauga': campus([43.548, 43.549], -79.662, 'UM', 1)}, [('SG', 'UM', 45)])
+        >>> grid.boundaries
+        {'St. George': [3], 'Mississauga': [100001]}
+        >>> route = grid.find_multi_campus_route(1, 100002)
+        >>> [segment.identifiers() for segment in route.segments]
+        [[1, 2, 3], [100001, 100002]]
+        >>> [(link.building1.code, link.building2.code, link.minutes) for link in route.links]
+        [('SG', 'UM', 45)]
+        >>> round(route.walking_distance())
+        334
+        """
+        if self.campus_of[id1] == self.campus_of[id2]:
+            route = self._engine.find_route(id1, id2, stats)
+            return None if route is None else MultiCampusRoute([route], [])
+
+        source_tree = self._trees.get(id1) or self._engine.shortest_path_tree(id1, stats)
+        with phase(stats, 'search'):
+            hops = self._search_overlay(source_tree, id2)
+        if hops is None:
+            return None
+        with phase(stats, 'reconstruction'):
+            return self._build_route(source_tree, hops, id2)
+
+    def _search_overlay(self, source_tree: ShortestPathTree, target_id: int) \
+            -> Optional[list[tuple[int, Optional[TransitLink]]]]:
+        """Run Dijkstra's algorithm on the overlay graph, from every boundary node of the start campus (at its
+        distance from the start) to target_id (through every boundary node of the target campus).
+        Return the boundary nodes of the cheapest route, in order, each with the transit link ridden to reach it
+        (None for the first node, and for walks within a campus), or None if target_id is not reachable.
+        """
+        start_campus = self.campus_of[source_tree.source_id]
+        target_campus = self.campus_of[target_id]
+        costs, previous = {}, {}
+        heap = []
+        for node in self.boundaries[start_campus]:
+            if node in source_tree.distances:
+                costs[node] = source_tree.distances[node]
+                previous[node] = (None, None)
+                heapq.heappush(heap, (costs[node], node))
+
+        best_cost, best_last = math.inf, None
+        settled = set()
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if cost >= best_cost:
+                break  # no cheaper route to the target is left
+            if node in settled:
+                continue
+            settled.add(node)
+            if self.campus_of[node] == target_campus:
+                tail = self._trees[node].distances.get(target_id, math.inf)
+                if cost + tail < best_cost:
+                    best_cost, best_last = cost + tail, node
+            for hop_cost, other, link in self._overlay[node]:
+                if cost + hop_cost < costs.get(other, math.inf):
+                    costs[other] = cost + hop_cost
+                    previous[other] = (node, link)
+                    heapq.heappush(heap, (costs[other], other))
+
+        if best_last is None:
+            return None
+        hops = []
+        node = best_last
+        while node is not None:
+            before, link = previous[node]
+            hops.append((node, link))
+            node = before
+        hops.reverse()
+        return hops
+
+    def _build_route(self, source_tree: ShortestPathTree, hops: list[tuple[int, Optional[TransitLink]]],
+                     target_id: int) -> MultiCampusRoute:
+        """Return the route made of the overlay hops found by _search_overlay, from the root of source_tree to
+        target_id, reading every walk from the precomputed trees.
+        """
+        segments, links = [], []
+        edges = list(source_tree.route_to(hops[0][0]).edges)
+        first = self._engine.intersections[source_tree.source_id]  # the trees walk the edges of the snapshot
+        for (node, _), (next_node, link) in zip(hops, hops[1:]):
+            if link is None:
+                edges.extend(self._trees[node].route_to(next_node).edges)
+            else:
+                segments.append(Route(first, edges))
+                links.append(link)
+                first, edges = self._engine.intersections[next_node], []
+        edges.extend(self._trees[hops[-1][0]].route_to(target_id).edges)
+        segments.append(Route(first, edges))
+        return MultiCampusRoute(segments, links)
+
+
+def load_campuses(campus_file: str, transit_file: str) -> MultiCampusGrid:
+    """Load every campus listed in campus_file and the transit links in transit_file (see the module description),
+    and return the merged grid.
+
+    Preconditions:
+      - campus_file and transit_file are paths to csv files in the format of the provided campuses.csv and
+        transit_links.csv
+    """
+    with open(campus_file) as imported_campus_file:
+        campuses = {row[0]: load_all_data.load_data(row[1], row[2]) for row in _data_rows(imported_campus_file)}
+    with open(transit_file) as imported_transit_file:
+        links = [(row[0], row[1], float(row[2])) for row in _data_rows(imported_transit_file)]
+    return MultiCampusGrid(campuses, links)
+
+
+def _data_rows(lines: Iterator[str]) -> Iterator[list[str]]:
+    """Yield the rows of a csv file after its header, skipping empty lines and lines starting with '#'."""
+    reader = csv.reader(lines)
+    next(reader)
+    for row in reader:
+        if row and row[0].strip() and not row[0].startswith('#'):
+            yield [field.strip() for field in row]
+
+
+def _next_offset(max_identifier: int) -> int:
+    """Return the first multiple of 100000 above max_identifier, where the identifiers of the next campus start.
+
+    >>> _next_offset(88), _next_offset(100000)
+    (100000, 200000)
+    """
+    return (max_identifier // 100000 + 1) * 100000
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
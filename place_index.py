@@ -0,0 +1,317 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains PlaceIndex, a search index over the named places of a grid: buildings (by code and by name)
+and streets (by the names of the intersections on them), for autocompleting what the user types.
+
+Two structures are built once, when the index is created:
+  - a sorted list of search terms (building codes, full names, and every name from each of its words onward,
+    so that "smith" finds "Sidney Smith Hall"). The terms starting with a typed prefix are a contiguous run of the
+    list, found by binary search: the flat form of a trie. Every term also has its place in the overall ranking of
+    the terms, and a sparse table gives the best-ranked term of any run in constant time, so the best few matches
+    of a prefix are found without looking at every term it matches (which may be thousands for a short prefix).
+  - a trigram index, mapping every 3-letter substring of the terms to the places whose terms contain it. A
+    misspelled query still shares most of its trigrams with the term it was meant to be, so the places sharing the
+    most trigrams with it are its closest matches. Only the rarer trigrams of the query are looked up: common ones
+    (like "str" in street names) match too many places to tell them apart.
+
+Prefix matches rank before fuzzy matches: exact codes first, then codes, names and words starting with the query
+(shorter names first), then fuzzy matches from the most to the least similar.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Iterator, Optional
+import bisect
+import heapq
+import re
+from array import array
+from collections import Counter
+
+from entities import AbstractGrid
+
+BUILDING = 'building'
+STREET = 'street'
+
+# The rank of a place matched on its code, name or word (see PlaceIndex.search); lower ranks come first.
+_EXACT, _CODE, _NAME, _WORD, _FUZZY = range(5)
+# Fuzzy matches are only kept if they share at least this fraction of the trigrams of the query.
+_MIN_SIMILARITY = 0.3
+# Trigrams of more places than this (or than 2% of the places, if that is more) are too common to search by.
+_MAX_POSTINGS = 200
+
+
+class Place:
+    """
+    A named place of the grid: a building, or a street.
+
+    Instance Attributes:
+      - kind: BUILDING or STREET
+      - key: the code of the building, or the name of the street
+      - label: the text shown to the user for this place
+      - intersections: the identifiers of the intersections of the street, or of the closest intersection of
+        the building
+
+    Representation Invariants:
+      - self.kind in {BUILDING, STREET}
+    """
+    kind: str
+    key: str
+    label: str
+    intersections: list[int]
+
+    def __init__(self, kind: str, key: str, label: str, intersections: list[int]) -> None:
+        """Initialize a place."""
+        self.kind = kind
+        self.key = key
+        self.label = label
+        self.intersections = intersections
+
+    def __repr__(self) -> str:
+        """Return a string representation of this place.
+
+        >>> Place(BUILDING, 'SS', 'SS: Sidney Smith Hall', [56])
+        Place('SS: Sidney Smith Hall')
+        """
+        return f'Place({self.label!r})'
+
+
+class PlaceIndex:
+    """
+    A prefix and fuzzy search index over the buildings and streets of a grid (see the module description).
+
+    Instance Attributes:
+      - places: every place of the index
+
+    >>> from entities import Building, Intersection
+    >>> class Grid:
+    ...     intersections = {1: Intersection(1, {'St. George Street', 'Harbord Street'}, (43.6626, -79.4000))}
+    ...     buildings = {'SS': Building('SS', 'Sidney Smith Hall', set(), (43.6625, -79.3986)),
+    ...                  'SI': Building('SI', 'Simcoe Hall', set(), (43.6605, -79.3948))}
+    >>> index = PlaceIndex(Grid())
+    >>> index.search('s')
+    [Place('SI: Simcoe Hall'), Place('SS: Sidney Smith Hall'), Place('St. George Street'), Place('Harbord Street')]
+    >>> index.search('smith'), index.search('harbrd st')
+    ([Place('SS: Sidney Smith Hall')], [Place('Harbord Street')])
+    """
+    places: list[Place]
+    # Private Instance Attributes:
+    #   - _terms: the sorted search terms
+    #   - _term_places: the position in self.places of the place of every term
+    #   - _term_ranks: the position of every term in the ranking of all terms (see the module description)
+    #   - _sparse: _sparse[k][i] is the term of best rank among the 2 ** k terms from position i
+    #   - _trigrams: the positions of the places whose terms contain each trigram
+    #   - _codes: the position of the place of every building code, in normalized form
+    _terms: list[str]
+    _term_places: array
+    _term_ranks: array
+    _sparse: list[array]
+    _trigrams: dict[str, array]
+    _codes: dict[str, int]
+
+    def __init__(self, grid: AbstractGrid) -> None:
+        """Initialize the index over the buildings of grid, and the streets of its street intersections."""
+        self.places = []
+        terms = set()
+        self._codes = {}
+        for code, building in grid.buildings.items():
+            position = len(self.places)
+            closest = [] if building.closest_intersection is None else [building.closest_intersection.identifier]
+            self.places.append(Place(BUILDING, code, f'{code}: {building.name}', closest))
+            self._codes[normalize(code)] = position
+            terms.add((normalize(code), _CODE, position))
+            terms.update((word, _NAME if i == 0 else _WORD, position) for i, word in _word_starts(building.name))
+
+        streets = {}
+        for intersection in grid.intersections.values():
+            if intersection.building is None:  # building entrances are named after their building
+                for street in intersection.name:
+                    streets.setdefault(street, []).append(intersection.identifier)
+        for street, identifiers in streets.items():
+            position = len(self.places)
+            self.places.append(Place(STREET, street, street, identifiers))
+            terms.update((word, _NAME if i == 0 else _WORD, position) for i, word in _word_starts(street))
+
+        terms = sorted(terms)
+        self._terms = [term for term, _, _ in terms]
+        self._term_places = array('l', (position for _, _, position in terms))
+        ranking = sorted(range(len(terms)), key=lambda i: (terms[i][1], *self._place_key(terms[i][2])))
+        self._term_ranks = array('l', [0]) * len(terms)
+        for rank, i in enumerate(ranking):
+            self._term_ranks[i] = rank
+        self._build_sparse_table()
+
+        trigrams_of = [set() for _ in self.places]
+        for term, _, position in terms:
+            trigrams_of[position].update(_trigrams(term))
+        self._trigrams = {}
+        for position, trigrams in enumerate(trigrams_of):
+            for trigram in trigrams:
+                self._trigrams.setdefault(trigram, array('l')).append(position)
+
+    def _place_key(self, position: int) -> tuple[int, str, int]:
+        """Return the key ordering places matched with the same rank: shorter labels first, then alphabetically."""
+        label = self.places[position].label
+        return (len(label), label, position)
+
+    def _build_sparse_table(self) -> None:
+        """Build self._sparse from self._term_ranks, doubling the length of the runs at every level."""
+        ranks = self._term_ranks
+        self._sparse = [array('l', range(len(ranks)))]
+        length = 1
+        while 2 * length <= len(ranks):
+            previous = self._sparse[-1]
+            self._sparse.append(array('l', [first if ranks[first] < ranks[second] else second
+                                            for first, second in zip(previous, previous[length:])]))
+            length *= 2
+
+    def _best_term(self, low: int, high: int) -> int:
+        """Return the position of the term of best rank among the terms at positions low to high - 1.
+
+        Preconditions:
+          - 0 <= low < high <= len(self._terms)
+        """
+        level = (high - low).bit_length() - 1
+        first, second = self._sparse[level][low], self._sparse[level][high - (1 << level)]
+        return first if self._term_ranks[first] < self._term_ranks[second] else second
+
+    def search(self, query: str, limit: int = 10, kind: Optional[str] = None) -> list[Place]:
+        """Return at most limit places matching query, best first (see the module description).
+        If kind is not None, only places of that kind (BUILDING or STREET) are returned.
+        """
+        query = normalize(query)
+        if query == '' or limit <= 0:
+            return []
+        found = []
+        if query in self._codes:
+            found.append(self._codes[query])
+        for position in self._prefix_matches(query):
+            if len(found) >= limit:
+                break
+            if position not in found and (kind is None or self.places[position].kind == kind):
+                found.append(position)
+        if found and (kind is not None and self.places[found[0]].kind != kind):
+            found.pop(0)  # an exact code, for a search of streets
+
+        if len(found) < limit:
+            fuzzy = [(similarity, position) for position, similarity in self._fuzzy(query)
+                     if position not in found and (kind is None or self.places[position].kind == kind)]
+            fuzzy.sort(key=lambda match: (-match[0], self._place_key(match[1])))
+            found.extend(position for _, position in fuzzy[:limit - len(found)])
+        return [self.places[position] for position in found]
+
+    def _prefix_matches(self, prefix: str) -> Iterator[int]:
+        """Yield the positions of the places with a term starting with prefix, best ranked first, each once.
+        The run of terms starting with prefix is split around its best term, and the best terms of the two
+        halves are kept in a heap, so every place yielded only costs a few heap operations.
+        """
+        low = bisect.bisect_left(self._terms, prefix)
+        high = bisect.bisect_left(self._terms, prefix + chr(0x10FFFF), low)
+        heap = []
+        if low < high:
+            best = self._best_term(low, high)
+            heap.append((self._term_ranks[best], best, low, high))
+        yielded = set()
+        while heap:
+            _, best, low, high = heapq.heappop(heap)
+            position = self._term_places[best]
+            if position not in yielded:
+                yielded.add(position)
+                yield position
+            for run_low, run_high in ((low, best), (best + 1, high)):
+                if run_low < run_high:
+                    run_best = self._best_term(run_low, run_high)
+                    heapq.heappush(heap, (self._term_ranks[run_best], run_best, run_low, run_high))
+
+    def resolve_building(self, text: str) -> Optional[str]:
+        """Return the code of the building text designates: its code (in any case), or the only building with
+        a code or name starting with text. Return None if there is no such building, or several.
+
+        >>> from entities import Building
+        >>> class Grid:
+        ...     intersections = {}
+        ...     buildings = {'SS': Building('SS', 'Sidney Smith Hall', set(), (43.6625, -79.3986)),
+        ...                  'SI': Building('SI', 'Simcoe Hall', set(), (43.6605, -79.3948))}
+        >>> index = PlaceIndex(Grid())
+        >>> index.resolve_building('ss'), index.resolve_building('sidney'), index.resolve_building('si')
+        ('SS', 'SS', 'SI')
+        >>> index.resolve_building('s') is None, index.resolve_building('hall') is None
+        (True, True)
+        """
+        query = normalize(text)
+        if query in self._codes:
+            return self.places[self._codes[query]].key
+        matches = []
+        for position in self._prefix_matches(query):
+            place = self.places[position]
+            name = place.label.split(': ', 1)[-1]
+            if place.kind == BUILDING and (normalize(place.key).startswith(query)
+                                           or normalize(name).startswith(query)):
+                matches.append(place.key)
+                if len(matches) > 1:
+                    return None
+        return matches[0] if matches else None
+
+    def _fuzzy(self, query: str) -> list[tuple[int, float]]:
+        """Return the (position, similarity) of the places sharing at least _MIN_SIMILARITY of the rarer trigrams
+        of query (see the module description), where the similarity is the fraction of those trigrams they share.
+        """
+        postings = sorted((self._trigrams[trigram] for trigram in _trigrams(query) if trigram in self._trigrams),
+                          key=len)
+        limit = max(_MAX_POSTINGS, len(self.places) // 50)
+        rare = [places for places in postings if len(places) <= limit]
+        if not rare:
+            return []  # every trigram of the query is common: it is too vague to be a misspelling of anything
+        shared = Counter()
+        for places in rare:
+            shared.update(places)
+        needed = _MIN_SIMILARITY * len(rare)
+        return [(position, count / len(rare)) for position, count in shared.items() if count >= needed]
+
+
+def normalize(text: str) -> str:
+    """Return text in the form it is indexed and searched in: lower case, with punctuation removed and single
+    spaces between words.
+
+    >>> normalize("  St. George  Street's ")
+    'st george streets'
+    """
+    return ' '.join(re.sub(r'[^\w\s]', '', text.casefold()).split())
+
+
+def _word_starts(name: str) -> list[tuple[int, str]]:
+    """Return the (index, normalized name from that word onward) of every word of name.
+
+    >>> _word_starts('Sidney Smith Hall')
+    [(0, 'sidney smith hall'), (1, 'smith hall'), (2, 'hall')]
+    """
+    words = normalize(name).split()
+    return [(i, ' '.join(words[i:])) for i in range(len(words))]
+
+
+def _trigrams(term: str) -> set[str]:
+    """Return the trigrams of term, padded with a space on each side so that short terms and word boundaries
+    have trigrams too.
+
+    >>> sorted(_trigrams('ss'))
+    [' ss', 'ss ']
+    """
+    padded = f' {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
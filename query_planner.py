@@ -0,0 +1,323 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains QueryPlanner, which picks the routing engine of every query instead of its caller.
+
+Each engine is the cheapest one for some queries only. Plain Dijkstra on the frozen snapshot has no preprocessing
+and the least work per settled intersection, so it wins on small grids; A* settles fewer intersections, which
+pays off on large grids; ALT settles fewer still, but needs a precomputed landmark table. Routes through a few
+unordered intermediate intersections are cheapest to chain from shortest routes (falling back to the DFS branch
+and bound when the chained route walks an intersection twice), and only ParetoGrid finds Pareto fronts.
+choose_engine encodes these trade-offs, measured with benchmarks.py, as thresholds on the size of the grid.
+
+The planner records the engine it chose and the latency of the query in the QueryStats of the query, if any.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from itertools import permutations
+from typing import Callable, Optional, TypeVar
+import logging
+import time
+
+import route_planning
+from concrete_grid import CROSSINGS, AStarGrid, DFSGrid, DijkstraGrid, ParetoGrid, ParetoPath
+from entities import SHORTEST, AbstractGrid, Route
+from frozen_grid import FrozenGrid, GridHolder, freeze
+from instrumentation import QueryStats
+from landmarks import ALTGrid, LandmarkTable
+
+logger = logging.getLogger(__name__)
+
+# The types of queries the planner answers.
+ROUTE = 'route'  # the shortest route between two intersections
+STOPOVERS = 'stopovers'  # a route between two buildings, with detours to amenities (see route_planning.plan_route)
+INTERMEDIATES = 'intermediates'  # the shortest route visiting a set of intersections in any order
+PARETO = 'pareto'  # the Pareto front of the routes between two buildings (see route_planning.pareto_routes)
+QUERY_TYPES = (ROUTE, STOPOVERS, INTERMEDIATES, PARETO)
+
+# The engines the planner dispatches to, named as in benchmarks.ENGINES.
+FROZEN = 'frozen'
+ASTAR = 'astar'
+ALT = 'alt'
+DFS = 'dfs'
+PARETO_ENGINE = 'pareto'
+# The engine name recorded for intermediate queries answered by chaining shortest routes (see choose_engine).
+LEGS = 'legs'
+# The engine name recorded for the routes read from a SpeculativeRoute built on a plain DijkstraGrid, which the
+# planner never chooses itself.
+DIJKSTRA = 'dijkstra'
+# The name of the engine of every engine class, subclasses first (see engine_name).
+_ENGINE_CLASSES = ((FrozenGrid, FROZEN), (ALTGrid, ALT), (ParetoGrid, PARETO_ENGINE), (AStarGrid, ASTAR),
+                   (DFSGrid, DFS), (DijkstraGrid, DIJKSTRA))
+
+# On synthetic grids (benchmarks.py, 300 queries per grid), A* answers queries 30% faster than the frozen snapshot
+# on average from 1,000 intersections on (1.0 against 1.5 ms), and 25% faster at 50,000. On the 94 campus
+# intersections, both take about 0.1 ms, and the immutable frozen snapshot is kept. ALT is faster than both from 1,000
+# intersections on, once its landmark table is available.
+ASTAR_MIN_NODES = 1_000
+ALT_MIN_NODES = 1_000
+# Routes through at most this many intermediates are chained from shortest routes, trying every order of the
+# intermediates (5! = 120 orders, from 30 shortest routes). The DFS branch and bound, which is exponential in the
+# length of the route, is only used for more intermediates, where they prune most of its search, and for the
+# chained routes that walk an intersection twice when the caller asks for a simple path.
+MAX_LEG_INTERMEDIATES = 5
+# The bound on the weight of the paths the DFS branch and bound searches, DFSGrid's default max_distance. Its search
+# grows exponentially with the bound: on the campus, a simple path of 5.5 km through 3 intermediates takes 15 s
+# to find, against 20 ms for the paths within this bound.
+DFS_MAX_DISTANCE = 2000
+
+_T = TypeVar('_T')
+
+
+def choose_engine(query_type: str, n_nodes: int, n_intermediates: int = 0, landmarks: bool = False) -> str:
+    """Return the name of the cheapest engine answering a query of the given type correctly, on a grid of n_nodes
+    intersections, through n_intermediates intermediate intersections, where landmarks tells whether a landmark
+    table is available for the weight profile of the query.
+
+    Stopover queries use the same engine as their main route: their detours are found by a single multi-source
+    search, whatever the engine (see route_planning.nearest_stopovers). Intermediate queries through up to
+    MAX_LEG_INTERMEDIATES intermediates chain the shortest routes between them, in the best order (LEGS), which
+    is the shortest walk through them. That walk may visit some intersection twice, when that is shorter; when
+    it does not, it is also the shortest simple path, which the DFS branch and bound would find
+    (see QueryPlanner.find_route_through).
+
+    Preconditions:
+      - query_type in QUERY_TYPES
+      - n_nodes >= 0
+      - n_intermediates >= 0
+
+    >>> choose_engine(ROUTE, 94)
+    'frozen'
+    >>> choose_engine(ROUTE, 94, landmarks=True), choose_engine(ROUTE, 50_000, landmarks=True)
+    ('frozen', 'alt')
+    >>> choose_engine(STOPOVERS, 500), choose_engine(STOPOVERS, 5_000)
+    ('frozen', 'astar')
+    >>> choose_engine(INTERMEDIATES, 94, 3), choose_engine(INTERMEDIATES, 94, 8)
+    ('legs', 'dfs')
+    >>> choose_engine(INTERMEDIATES, 50_000, 0)
+    'astar'
+    """
+    if query_type == PARETO:
+        return PARETO_ENGINE
+    if query_type == INTERMEDIATES and n_intermediates > 0:
+        return LEGS if n_intermediates <= MAX_LEG_INTERMEDIATES else DFS
+    if landmarks and n_nodes >= ALT_MIN_NODES:
+        return ALT
+    if n_nodes >= ASTAR_MIN_NODES:
+        return ASTAR
+    return FROZEN
+
+
+def engine_name(engine: AbstractGrid | FrozenGrid) -> str:
+    """Return the name of the engine the given routing engine is an instance of.
+
+    >>> engine_name(AStarGrid({}, {})), engine_name(freeze(DijkstraGrid({}, {})))
+    ('astar', 'frozen')
+    """
+    return next(name for engine_class, name in _ENGINE_CLASSES if isinstance(engine, engine_class))
+
+
+class QueryPlanner:
+    """
+    The routing front end of a grid: every query is answered by the engine choose_engine picks for it.
+    Engines are built the first time they are chosen, and shared by every query after that.
+
+    Instance Attributes:
+      - grid: the grid the engines search
+      - serving: the holder of the frozen snapshot of grid that the frozen engine searches
+      - landmarks: the landmark table of grid, or None if there is none; ALT is only chosen with a table
+
+    Representation Invariants:
+      - self.landmarks is None or set(self.landmarks.positions) == set(self.grid.intersections)
+    """
+    grid: AbstractGrid
+    serving: GridHolder
+    landmarks: Optional[LandmarkTable]
+    # Private Instance Attributes:
+    #   - _engines: the engines built so far, keyed by name (all but the frozen engine, read from serving)
+    _engines: dict[str, AbstractGrid]
+
+    def __init__(self, grid: AbstractGrid, serving: Optional[GridHolder] = None,
+                 landmarks: Optional[LandmarkTable] = None) -> None:
+        """Initialize a planner for grid. If serving is None, grid is frozen into a new holder."""
+        self.grid = grid
+        self.serving = GridHolder(freeze(grid)) if serving is None else serving
+        self.landmarks = landmarks
+        self._engines = {}
+
+    def choose(self, query_type: str, n_intermediates: int = 0, profile: str = SHORTEST) -> str:
+        """Return the name of the engine for a query of the given type and weight profile (see choose_engine)."""
+        landmarks = self.landmarks is not None and self.landmarks.profile == profile
+        return choose_engine(query_type, len(self.grid.intersections), n_intermediates, landmarks)
+
+    def engine(self, name: str) -> AbstractGrid | FrozenGrid:
+        """Return the engine of the given name, building it if it is the first time it is used.
+
+        Preconditions:
+          - name in {FROZEN, ASTAR, ALT, DFS, PARETO_ENGINE}
+          - name != ALT or self.landmarks is not None
+        """
+        if name == FROZEN:
+            return self.serving.current
+        if name not in self._engines:
+            grid = self.grid
+            arguments = (grid.intersections, grid.buildings, grid.weight_profiles, grid.amenity_index)
+            if name == ALT:
+                self._engines[name] = ALTGrid(*arguments, landmarks=self.landmarks)
+            else:
+                self._engines[name] = {ASTAR: AStarGrid, DFS: DFSGrid, PARETO_ENGINE: ParetoGrid}[name](*arguments)
+        return self._engines[name]
+
+    def find_route(self, id1: int, id2: int, stats: Optional[QueryStats] = None,
+                   profile: str = SHORTEST) -> Optional[Route]:
+        """Return the shortest route from id1 to id2 for the given weight profile, or None if there is none.
+
+        Preconditions:
+          - id1 in self.grid.intersections
+          - id2 in self.grid.intersections
+        """
+        name = self.choose(ROUTE, profile=profile)
+        return self._run(name, stats, lambda: self.engine(name).find_route(id1, id2, stats, profile))
+
+    def find_route_through(self, id1: int, id2: int, intermediates: set[int], stats: Optional[QueryStats] = None,
+                           profile: str = SHORTEST, simple: bool = True) -> Optional[Route]:
+        """Return the shortest route from id1 to id2 visiting every intersection of intermediates, in any order,
+        for the given weight profile (see choose_engine). Return None if one of them is not reachable, or, with
+        more than MAX_LEG_INTERMEDIATES intermediates, if the DFS branch and bound finds no route within
+        DFS_MAX_DISTANCE.
+
+        If simple is True, the route is a simple path, as DFSGrid returns (it never visits an intersection twice),
+        unless no simple path is within DFS_MAX_DISTANCE. The route chained from shortest routes is returned if it
+        is simple, as no simple path is shorter; otherwise, the DFS branch and bound searches the simple paths
+        within DFS_MAX_DISTANCE, and the chained route is returned if it finds none.
+        If simple is False, the shortest walk is returned, which may visit some intersections twice.
+        The engine recorded in stats is the one that found the route returned.
+
+        Preconditions:
+          - id1 in self.grid.intersections
+          - id2 in self.grid.intersections
+          - all(i in self.grid.intersections for i in intermediates)
+        """
+        intermediates = set(intermediates) - {id1, id2}
+        name = self.choose(INTERMEDIATES, len(intermediates), profile)
+        start = time.perf_counter()
+        try:
+            if name == DFS:
+                return self._route_through_dfs(id1, id2, intermediates, stats, profile)
+            if name != LEGS:
+                return self.engine(name).find_route(id1, id2, stats, profile)
+            route = self._route_through_legs(id1, id2, intermediates, stats, profile)
+            if not simple or route is None or len(set(route.identifiers())) == len(route.nodes):
+                return route
+            weights = self.engine(DFS).edge_weights(profile)
+            if sum(weights[edge.index] for edge in route.edges) >= DFS_MAX_DISTANCE:
+                return route  # no simple path is shorter than the chained route, so none is within the bound
+            path = self._route_through_dfs(id1, id2, intermediates, stats, profile)
+            if path is None:
+                return route
+            name = DFS
+            return path
+        finally:
+            self._record(name, stats, start)
+
+    def plan_route(self, start: str, end: str, amenities: Optional[list[str]] = None,
+                   stats: Optional[QueryStats] = None,
+                   speculation: Optional[route_planning.SpeculativeRoute] = None,
+                   profile: str = SHORTEST) -> route_planning.PlannedRoute:
+        """Return the route from the building start to the building end, with one stopover for every amenity
+        (see route_planning.plan_route). If speculation is a SpeculativeRoute started from start, the route is
+        read from its precomputed results instead, and the engine recorded is the one speculation searched.
+        Raise a ValueError as route_planning.plan_route does.
+
+        Preconditions:
+          - start in self.grid.buildings
+          - end in self.grid.buildings
+        """
+        if speculation is not None and speculation.start == start:
+            return self._run(engine_name(speculation.engine), stats,
+                             lambda: speculation.plan(end, amenities, stats, profile))
+        name = self.choose(STOPOVERS if amenities else ROUTE, profile=profile)
+        return self._run(name, stats, lambda: route_planning.plan_route(self.engine(name), start, end, amenities,
+                                                                       stats, profile=profile))
+
+    def pareto_routes(self, start: str, end: str, criterion: str = CROSSINGS, stats: Optional[QueryStats] = None,
+                      profile: str = SHORTEST) -> list[ParetoPath]:
+        """Return the Pareto front of the paths from the building start to the building end (see
+        route_planning.pareto_routes). Raise a ValueError if the destination is not reachable.
+        """
+        name = self.choose(PARETO, profile=profile)
+        return self._run(name, stats, lambda: route_planning.pareto_routes(self.engine(name), start, end, criterion,
+                                                                          stats, profile))
+
+    def _run(self, name: str, stats: Optional[QueryStats], query: Callable[[], _T]) -> _T:
+        """Return the result of query, answered by the engine name, and record name and the latency of query
+        in stats if it is not None, even if query raises an error.
+        """
+        start = time.perf_counter()
+        try:
+            return query()
+        finally:
+            self._record(name, stats, start)
+
+    def _record(self, name: str, stats: Optional[QueryStats], start: float) -> None:
+        """Record that the engine name answered a query started at the given time.perf_counter() time, in stats if
+        it is not None.
+        """
+        latency = time.perf_counter() - start
+        logger.debug('%s engine answered in %.3f ms', name, latency * 1000)
+        if stats is not None:
+            stats.record_engine(name, latency)
+
+    def _route_through_dfs(self, id1: int, id2: int, intermediates: set[int], stats: Optional[QueryStats],
+                           profile: str) -> Optional[Route]:
+        """Return the shortest simple path from id1 to id2 through every intersection of intermediates, within
+        DFS_MAX_DISTANCE, or None if there is none.
+        """
+        edges = self.engine(DFS).find_shortest_path(id1, id2, intermediates, DFS_MAX_DISTANCE, stats, profile)
+        return None if not edges and id1 != id2 else Route(self.grid.intersections[id1], edges)
+
+    def _route_through_legs(self, id1: int, id2: int, intermediates: set[int], stats: Optional[QueryStats],
+                            profile: str) -> Optional[Route]:
+        """Return the shortest route from id1 to id2 through every intersection of intermediates, chained from
+        the shortest routes between them in the best order, or None if one of them is not reachable.
+        """
+        name = self.choose(ROUTE, profile=profile)
+        engine = self.engine(name)
+        weights = engine.edge_weights(profile)
+        legs, costs = {}, {}
+        for source in [id1] + list(intermediates):
+            for target in list(intermediates) + [id2]:
+                if source != target:
+                    leg = engine.find_route(source, target, stats, profile)
+                    if leg is None:
+                        return None
+                    legs[(source, target)] = leg
+                    costs[(source, target)] = sum(weights[edge.index] for edge in leg.edges)
+
+        def length(order: tuple[int, ...]) -> float:
+            """Return the weight of the route visiting the intermediates in the given order."""
+            stops = (id1,) + order + (id2,)
+            return sum(costs[(stops[i], stops[i + 1])] for i in range(len(stops) - 1))
+
+        best = min(permutations(sorted(intermediates)), key=length)
+        stops = (id1,) + best + (id2,)
+        edges = [edge for i in range(len(stops) - 1) for edge in legs[(stops[i], stops[i + 1])].edges]
+        return Route(engine.intersections[id1], edges)  # the edges of the engine join its own intersections
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
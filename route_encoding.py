@@ -0,0 +1,135 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains the compact wire format of routes, for clients that draw routes themselves instead of
+loading the Folium maps: the coordinates of the street points of a route, as an encoded polyline in the format of
+the Google Maps polyline algorithm.
+
+Every coordinate is rounded to a fixed number of decimals (5 by default, about a metre) and written as the
+difference from the previous one, so that the numbers stay small along a route. Every difference is then
+zigzag-encoded (so that its sign is its lowest bit) and written in 5-bit groups, lowest first, each group as one
+printable ASCII character, with a continuation bit on every group but the last. A step of a few metres along a
+street takes 2 characters per coordinate, where GeoJSON takes about 20.
+
+Routes are encoded straight from the list of edges returned by find_shortest_path (see encode_edges), or from a
+Route (see encode_route). to_geojson gives the same route as a GeoJSON LineString, for comparison.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import itertools
+
+from entities import Edge, Intersection, Route
+
+# The number of decimals of the encoded coordinates: 5 (about a metre) is the precision of Google polylines.
+PRECISION = 5
+
+
+def encode_polyline(points: Iterable[tuple[float, float]], precision: int = PRECISION) -> str:
+    """Return the encoded polyline of the given (latitude, longitude) points (see the module description).
+
+    >>> encode_polyline([(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)])
+    '_p~iF~ps|U_ulLnnqC_mqNvxq`@'
+    """
+    factor = 10 ** precision
+    characters = []
+    previous_latitude = previous_longitude = 0
+    for latitude, longitude in points:
+        latitude, longitude = round(latitude * factor), round(longitude * factor)
+        for delta in (latitude - previous_latitude, longitude - previous_longitude):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                characters.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            characters.append(chr(value + 63))
+        previous_latitude, previous_longitude = latitude, longitude
+    return ''.join(characters)
+
+
+def decode_polyline(polyline: str, precision: int = PRECISION) -> list[tuple[float, float]]:
+    """Return the (latitude, longitude) points of an encoded polyline, rounded to the given precision.
+    Raise a ValueError if polyline is not a valid encoded polyline.
+
+    >>> decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+    [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+    """
+    factor = 10 ** precision
+    deltas = []
+    result = shift = 0
+    for byte in polyline.encode('ascii'):
+        byte -= 63
+        result |= (byte & 0x1f) << shift
+        if byte < 0x20:  # the last group of this number
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+            result = shift = 0
+        else:
+            shift += 5
+    if shift != 0 or len(deltas) % 2 != 0:
+        raise ValueError('truncated polyline')
+    latitudes = (value / factor for value in itertools.accumulate(deltas[0::2]))
+    longitudes = (value / factor for value in itertools.accumulate(deltas[1::2]))
+    return list(zip(latitudes, longitudes))
+
+
+def encode_edges(edges: list[Edge], first: Optional[Intersection] = None, precision: int = PRECISION) -> str:
+    """Return the encoded polyline of the street points of the path made of edges, as returned by
+    find_shortest_path.
+    The path starts at first if it is given. Otherwise, it starts at the endpoint of its first edge that is not
+    shared with the second edge; first must be given for single-edge paths, which can be walked either way.
+    An empty path has an empty polyline.
+
+    Preconditions:
+      - edges is a path: consecutive edges share an endpoint
+      - first is not None or len(edges) != 1
+    """
+    if not edges:
+        return ''
+    if first is None:
+        shared = set(edges[1].endpoints)
+        first = next(endpoint for endpoint in edges[0].endpoints if endpoint not in shared)
+    points = [first.coordinates]
+    current = first
+    for edge in edges:
+        if edge.via:
+            points.extend(edge.geometry(current)[1:])
+        else:
+            points.append(edge.get_other_endpoint(current).coordinates)
+        current = edge.get_other_endpoint(current)
+    return encode_polyline(points, precision)
+
+
+def encode_route(route: Route, precision: int = PRECISION) -> str:
+    """Return the encoded polyline of the street points of route, in order (see Route.coordinates)."""
+    return encode_polyline(route.coordinates(), precision)
+
+
+def to_geojson(route: Route) -> dict[str, object]:
+    """Return route as a GeoJSON LineString Feature, with the distance walked as a property.
+    GeoJSON positions are written (longitude, latitude).
+    """
+    return {
+        'type': 'Feature',
+        'geometry': {
+            'type': 'LineString',
+            'coordinates': [[longitude, latitude] for latitude, longitude in route.coordinates()],
+        },
+        'properties': {'distance': route.distance()},
+    }
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
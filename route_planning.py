@@ -0,0 +1,330 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains the route planning logic shared by the map visualizations and the batch query interface:
+given a start building, a destination building and a list of amenities, it computes the main path between the
+two buildings and a detour from the main path to a building providing each amenity.
+It also contains SpeculativeRoute, which starts this work in the background before the whole query is known.
+Nothing in this module depends on Folium, so it can be used without generating any map.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Optional
+import heapq
+import math
+import threading
+import route_encoding
+from concrete_grid import CROSSINGS, DijkstraGrid, ParetoGrid, ParetoPath, ShortestPathTree
+from entities import AMENITIES, SHORTEST, AbstractGrid, Building, Edge, Intersection, Route
+from instrumentation import QueryStats, phase
+
+
+class PlannedRoute:
+    """
+    A route between two buildings, with optional detours to buildings providing amenities.
+
+    Instance Attributes:
+      - start: the building the route starts from
+      - end: the destination building
+      - main_route: the route from the closest intersection of start to the one of end
+      - amenities: the amenities requested along the route
+      - stopovers: the building chosen for each amenity, at the same index as in amenities
+      - detours: the route from the main route to each stopover, at the same index as in amenities
+
+    Representation Invariants:
+      - len(self.amenities) == len(self.stopovers) == len(self.detours)
+      - all(self.amenities[i] in self.stopovers[i].amenities for i in range(len(self.amenities)))
+      - all(detour.nodes[0] in self.main_route.nodes for detour in self.detours)
+    """
+    start: Building
+    end: Building
+    main_route: Route
+    amenities: list[str]
+    stopovers: list[Building]
+    detours: list[Route]
+
+    def __init__(self, start: Building, end: Building, main_route: Route) -> None:
+        """Initialize a route from start to end following main_route, with no stopovers yet."""
+        self.start = start
+        self.end = end
+        self.main_route = main_route
+        self.amenities = []
+        self.stopovers = []
+        self.detours = []
+
+    def distance(self) -> float:
+        """Return the length (in metres) of the main route."""
+        return self.main_route.distance()
+
+    def as_dict(self, polyline: bool = False) -> dict[str, object]:
+        """Return a plain dictionary representation of this route, suitable for JSON output.
+        If polyline is True, the path of the main route and of every detour is written as the encoded polyline
+        of its coordinates (see route_encoding) instead of the list of its intersection identifiers.
+        """
+        stopovers = []
+        for i in range(len(self.amenities)):
+            stopovers.append({
+                'amenity': self.amenities[i],
+                'building': self.stopovers[i].code,
+                'distance': self.detours[i].distance(),
+                **_path_dict(self.detours[i], polyline),
+            })
+        return {
+            'start': self.start.code,
+            'end': self.end.code,
+            'distance': self.distance(),
+            **_path_dict(self.main_route, polyline),
+            'stopovers': stopovers,
+        }
+
+
+def _path_dict(route: Route, polyline: bool) -> dict[str, object]:
+    """Return the path of route for PlannedRoute.as_dict: its encoded polyline, or its intersection identifiers."""
+    if polyline:
+        return {'polyline': route_encoding.encode_route(route)}
+    return {'intersections': route.identifiers()}
+
+
+def plan_route(engine: AbstractGrid, start: str, end: str, amenities: Optional[list[str]] = None,
+               stats: Optional[QueryStats] = None, tree: Optional[ShortestPathTree] = None,
+               amenity_buildings: Optional[dict[str, list[str]]] = None, profile: str = SHORTEST) -> PlannedRoute:
+    """Return the route from the building start to the building end, with one stopover for every amenity.
+
+    For every amenity, the stopover is the building providing it that is the fewest metres of walking away from
+    the main path, and the detour is the shortest path to it from the nearest intersection of the main path.
+    The detours of all amenities are found by a single search (see nearest_stopovers).
+
+    tree and amenity_buildings are optional precomputed results (see SpeculativeRoute): a shortest-path tree
+    rooted at the closest intersection of start (or of end), and the codes of the buildings providing each
+    amenity. A main path starting (or ending) at the root of the tree is read from it instead of being searched.
+
+    Paths are shortest for the given weight profile (see AbstractGrid.weight_profiles).
+
+    Raise a ValueError if the destination is not reachable, or if no building reachable from the main path
+    provides one of the amenities.
+
+    Preconditions:
+      - start in engine.buildings
+      - end in engine.buildings
+      - amenities is None or all(a in AMENITIES for a in amenities)
+    """
+    start_building = engine.buildings[start]
+    end_building = engine.buildings[end]
+    if tree is not None and (tree.source_id not in {start_building.closest_intersection.identifier,
+                                                    end_building.closest_intersection.identifier}
+                             or tree.profile != profile):
+        tree = None  # the tree was computed for another route or profile
+    main_route = _find_route(engine, start_building.closest_intersection.identifier,
+                             end_building.closest_intersection.identifier, stats, tree, profile)
+    if main_route is None:
+        raise ValueError(f'{end} is not reachable from {start}')
+    route = PlannedRoute(start_building, end_building, main_route)
+    if not amenities:
+        return route
+
+    if amenity_buildings is None:
+        candidate_lists = get_buildings_by_amenity_type(engine, amenities)
+    else:
+        candidate_lists = [amenity_buildings.get(amenity, []) for amenity in amenities]
+
+    for amenity, candidates in zip(amenities, candidate_lists):
+        if not candidates:
+            raise ValueError(f'no building provides the {amenity} amenity')
+    with phase(stats, 'search'):
+        detours = nearest_stopovers(engine, main_route.nodes, candidate_lists, stats, profile)
+    for amenity, detour in zip(amenities, detours):
+        if detour is None:
+            raise ValueError(f'no building providing the {amenity} amenity is reachable from the route')
+        route.amenities.append(amenity)
+        route.stopovers.append(detour[0])
+        route.detours.append(detour[1])
+
+    return route
+
+
+def nearest_stopovers(engine: AbstractGrid, sources: list[Intersection], candidate_lists: list[list[str]],
+                      stats: Optional[QueryStats] = None,
+                      profile: str = SHORTEST) -> list[Optional[tuple[Building, Route]]]:
+    """Return, for every list of candidate building codes, the candidate whose closest intersection is nearest
+    to any of the sources, and the shortest route to it from the nearest source; None if no candidate of the list
+    is reachable from the sources.
+
+    This is a single multi-source run of Dijkstra's algorithm: every source starts at distance 0, so the
+    intersections are settled in order of their distance to the nearest source, and the first candidate settled
+    for a list is the nearest one. The search stops as soon as every list has one. Ties between candidates at
+    the same intersection go to the first one in its list.
+    If stats is not None, the search counters are added to it.
+
+    Preconditions:
+      - all(code in engine.buildings for candidates in candidate_lists for code in candidates)
+    """
+    weights = engine.edge_weights(profile)
+    # the (list index, building) pairs waiting at the closest intersection of every candidate building
+    waiting = {}
+    for i, candidates in enumerate(candidate_lists):
+        for code in candidates:
+            building = engine.buildings[code]
+            waiting.setdefault(building.closest_intersection.identifier, []).append((i, building))
+    found = [None] * len(candidate_lists)
+    remaining = sum(1 for candidates in candidate_lists if candidates)
+
+    distances = {source.identifier: 0.0 for source in sources}
+    predecessors = {}
+    settled = set()
+    heap = [(0.0, identifier) for identifier in distances]
+    heapq.heapify(heap)
+    relaxations = queue_operations = 0
+    while heap and remaining > 0:
+        distance, current_id = heapq.heappop(heap)
+        queue_operations += 1
+        if current_id in settled:
+            continue  # a stale entry, superseded by a shorter distance
+        settled.add(current_id)
+        for i, building in waiting.get(current_id, ()):
+            if found[i] is None:
+                found[i] = (building, _route_from_sources(engine, current_id, predecessors))
+                remaining -= 1
+        current_intersection = engine.intersections[current_id]
+        for edge in current_intersection.edges:
+            relaxations += 1
+            neighbour_id = edge.get_other_endpoint(current_intersection).identifier
+            new_distance = distance + weights[edge.index]
+            if new_distance < distances.get(neighbour_id, math.inf):
+                distances[neighbour_id] = new_distance
+                predecessors[neighbour_id] = edge
+                heapq.heappush(heap, (new_distance, neighbour_id))
+                queue_operations += 1
+
+    if stats is not None:
+        stats.add_search_counts(len(settled), relaxations, queue_operations)
+    return found
+
+
+def _route_from_sources(engine: AbstractGrid, target_id: int, predecessors: dict[int, Edge]) -> Route:
+    """Return the route to target_id made of the predecessor edges recorded by nearest_stopovers, starting
+    at the source it was reached from (the sources are the only intersections without a predecessor).
+    """
+    edges = []
+    current = engine.intersections[target_id]
+    while current.identifier in predecessors:
+        edge = predecessors[current.identifier]
+        edges.append(edge)
+        current = edge.get_other_endpoint(current)
+    edges.reverse()
+    return Route(current, edges)
+
+
+def _find_route(engine: AbstractGrid, id1: int, id2: int, stats: Optional[QueryStats],
+                tree: Optional[ShortestPathTree], profile: str) -> Optional[Route]:
+    """Return the shortest route from id1 to id2, read from tree if it is rooted at id1 or id2 (the streets are
+    walkable both ways), or searched with engine.
+    """
+    if tree is not None and tree.source_id == id1:
+        return tree.route_to(id2)
+    if tree is not None and tree.source_id == id2:
+        route = tree.route_to(id1)
+        return None if route is None else route.reversed()
+    return engine.find_route(id1, id2, stats, profile)
+
+
+def pareto_routes(engine: ParetoGrid, start: str, end: str, criterion: str = CROSSINGS,
+                  stats: Optional[QueryStats] = None, profile: str = SHORTEST) -> list[ParetoPath]:
+    """Return the Pareto front of the paths from the building start to the building end, trading the distance
+    (weighted by profile) against the given secondary criterion (see ParetoGrid.find_pareto_paths),
+    shortest path first. Raise a ValueError if the destination is not reachable.
+
+    Preconditions:
+      - start in engine.buildings
+      - end in engine.buildings
+    """
+    paths = engine.find_pareto_paths(engine.buildings[start].closest_intersection.identifier,
+                                     engine.buildings[end].closest_intersection.identifier,
+                                     criterion, stats, profile)
+    if not paths:
+        raise ValueError(f'{end} is not reachable from {start}')
+    return paths
+
+
+class SpeculativeRoute:
+    """
+    Routing work started in the background as soon as the start building of a route is known.
+
+    A background thread computes the shortest-path tree rooted at the closest intersection of the start
+    building, and the buildings providing every amenity. When the rest of the query is known, plan() waits
+    for the thread (usually long finished) and reads the main route from those results.
+
+    The detours to the stopovers are not precomputed: a stopover is the provider nearest to any intersection of
+    the main route, so it depends on the destination. The nearest provider from the start alone is often not
+    the one chosen, so the detour search (see nearest_stopovers) still runs in plan(), once the destination
+    is known.
+
+    Instance Attributes:
+      - engine: the routing engine the tree is computed with, such as a DijkstraGrid or a frozen_grid.FrozenGrid
+      - start: the code of the start building
+      - tree: the shortest-path tree, once computed (None before, or if computing it failed)
+      - amenity_buildings: the codes of the buildings providing each amenity, once computed
+    """
+    engine: DijkstraGrid
+    start: str
+    tree: Optional[ShortestPathTree]
+    amenity_buildings: Optional[dict[str, list[str]]]
+    # Private Instance Attributes:
+    #   - _thread: the background thread doing the work
+    _thread: threading.Thread
+
+    def __init__(self, engine: DijkstraGrid, start: str) -> None:
+        """Start computing the speculative results for routes from the building start.
+
+        Preconditions:
+          - start in engine.buildings
+        """
+        self.engine = engine
+        self.start = start
+        self.tree = None
+        self.amenity_buildings = None
+        self._thread = threading.Thread(target=self._precompute, daemon=True)
+        self._thread.start()
+
+    def _precompute(self) -> None:
+        """Compute the shortest-path tree and the buildings providing each amenity (in the background thread)."""
+        source_id = self.engine.buildings[self.start].closest_intersection.identifier
+        amenities = sorted(AMENITIES)
+        self.amenity_buildings = dict(zip(amenities, get_buildings_by_amenity_type(self.engine, amenities)))
+        self.tree = self.engine.shortest_path_tree(source_id)
+
+    def plan(self, end: str, amenities: Optional[list[str]] = None,
+             stats: Optional[QueryStats] = None, profile: str = SHORTEST) -> PlannedRoute:
+        """Wait for the background work, and return the route from self.start to end (see plan_route).
+        The main route is read from the precomputed tree, and the detours to the amenities are searched from it.
+        If the background work failed, or the tree was computed for another profile, the route is computed
+        from scratch.
+        """
+        self._thread.join()
+        return plan_route(self.engine, self.start, end, amenities, stats, self.tree, self.amenity_buildings,
+                          profile)
+
+
+def get_buildings_by_amenity_type(grid: AbstractGrid, amenities: list[str]) -> list[list[str]]:
+    """Return the codes of the buildings of grid providing the given amenities, read from its amenity index.
+    In the returned list, each sublist at a given index corresponds to the buildings that provide
+    the amenity listed at the same index in amenities.
+    """
+    return [grid.buildings_with([amenity]) for amenity in amenities]
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,143 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module contains SpatialIndex, a bucket grid over the coordinates of the intersections.
+It answers nearest-intersection queries by scanning the buckets in growing rings around the query point,
+instead of computing the distance to every intersection of the grid.
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Iterable, Optional
+import math
+from entities import Intersection, get_distance
+
+# Metres per degree of latitude, slightly underestimated so that ring bounds stay conservative.
+_METRES_PER_DEGREE = 0.99 * math.pi * 6.371 * (10 ** 6) / 180
+
+
+class SpatialIndex:
+    """
+    A bucket grid over the coordinates of a set of intersections.
+
+    Instance Attributes:
+      - cell_size: the side of a bucket, in degrees
+
+    Representation Invariants:
+      - self.cell_size > 0
+    """
+    cell_size: float
+    # Private Instance Attributes:
+    #   - _cells: the (insertion position, intersection) pairs in each bucket, keyed by (row, column) of the bucket
+    #   - _min_cell_metres: a lower bound on the side of a bucket, in metres
+    #   - _bounds: the smallest and largest row and column of the non-empty buckets
+    _cells: dict[tuple[int, int], list[tuple[int, Intersection]]]
+    _min_cell_metres: float
+    _bounds: tuple[int, int, int, int]
+
+    def __init__(self, intersections: Iterable[Intersection], cell_size: Optional[float] = None) -> None:
+        """Initialize the index over the given intersections.
+        If cell_size is None, it is chosen so that every bucket holds about one intersection.
+        """
+        intersections = list(intersections)
+        if cell_size is None:
+            cell_size = _default_cell_size(intersections)
+        self.cell_size = cell_size
+        self._cells = {}
+        max_latitude = 0.0
+        for position, intersection in enumerate(intersections):
+            self._cells.setdefault(self._cell_of(intersection.coordinates), []).append((position, intersection))
+            max_latitude = max(max_latitude, abs(intersection.coordinates[0]))
+
+        # a bucket is narrowest (in metres) along the longitude, at the latitude furthest from the equator
+        cos_latitude = math.cos(math.radians(min(max_latitude + cell_size, 90.0)))
+        self._min_cell_metres = cell_size * _METRES_PER_DEGREE * cos_latitude
+
+        rows = [cell[0] for cell in self._cells] or [0]
+        columns = [cell[1] for cell in self._cells] or [0]
+        self._bounds = (min(rows), max(rows), min(columns), max(columns))
+
+    def _cell_of(self, coordinates: tuple[float, float]) -> tuple[int, int]:
+        """Return the (row, column) of the bucket containing the given coordinates."""
+        return (math.floor(coordinates[0] / self.cell_size), math.floor(coordinates[1] / self.cell_size))
+
+    def nearest(self, coordinates: tuple[float, float],
+                projected: Optional[tuple[float, float]] = None) -> Optional[Intersection]:
+        """Return the intersection closest to the given coordinates, or None if the index is empty.
+        If the projected coordinates of the point are given, distances are measured between projected
+        coordinates, in the planar distance mode (see entities.distance_between).
+        Among intersections at the same distance, the one inserted first is returned, matching
+        AbstractGrid.find_closest_intersection.
+
+        >>> a = Intersection(1, {'A Street'}, (43.6600, -79.3950))
+        >>> b = Intersection(2, {'B Street'}, (43.6650, -79.3990))
+        >>> SpatialIndex([a, b]).nearest((43.6645, -79.3980)).identifier
+        2
+        """
+        if not self._cells:
+            return None
+        row, column = self._cell_of(coordinates)
+        min_row, max_row, min_column, max_column = self._bounds
+        last_ring = max(row - min_row, max_row - row, column - min_column, max_column - column)
+        best = None
+        best_key = (math.inf, math.inf)
+        for ring in range(last_ring + 1):
+            for cell in _ring(row, column, ring):
+                for position, intersection in self._cells.get(cell, ()):
+                    if projected is not None and intersection.projected is not None:
+                        key = (math.dist(projected, intersection.projected), position)
+                    else:
+                        key = (get_distance(coordinates, intersection.coordinates), position)
+                    if key < best_key:
+                        best, best_key = intersection, key
+            # every intersection outside the scanned rings is at least ring * cell metres away
+            if best_key[0] < ring * self._min_cell_metres:
+                break
+        return best
+
+
+def _ring(row: int, column: int, radius: int) -> list[tuple[int, int]]:
+    """Return the buckets at Chebyshev distance exactly radius from the bucket (row, column).
+
+    >>> _ring(0, 0, 0)
+    [(0, 0)]
+    >>> len(_ring(0, 0, 2))
+    16
+    """
+    if radius == 0:
+        return [(row, column)]
+    cells = []
+    for c in range(column - radius, column + radius + 1):
+        cells.append((row - radius, c))
+        cells.append((row + radius, c))
+    for r in range(row - radius + 1, row + radius):
+        cells.append((r, column - radius))
+        cells.append((r, column + radius))
+    return cells
+
+
+def _default_cell_size(intersections: list[Intersection]) -> float:
+    """Return a bucket side (in degrees) giving about one intersection per bucket."""
+    if len(intersections) < 2:
+        return 0.01
+    latitudes = [i.coordinates[0] for i in intersections]
+    longitudes = [i.coordinates[1] for i in intersections]
+    area = max(max(latitudes) - min(latitudes), 1e-6) * max(max(longitudes) - min(longitudes), 1e-6)
+    return math.sqrt(area / len(intersections))
+
+
+if __name__ == '__main__':
+    import doctest
+
+    doctest.testmod()
@@ -0,0 +1,291 @@
+"""
+UofT Speedrunner
+
+Module Description
+==================
+This module generates synthetic campus datasets, for testing and benchmarking on graphs that are much larger
+than the St. George campus. The generated files are in exactly the same format as data/building_data.csv and
+data/intersections_data.csv, so they can be loaded with load_all_data.load_data.
+
+The street graph is a random geometric graph: intersections are scattered uniformly at random around the campus,
+and every intersection is joined to its nearest neighbours until it reaches a degree drawn from the degree
+distribution of the real campus (mostly 3-way intersections, some 2-way and 4-way ones). Components are then
+joined to their nearest neighbours, so the whole graph is connected.
+Buildings are placed close to random intersections, with random subsets of AMENITIES.
+
+Usage:
+    python synthetic_data.py 100000 --seed 1 --out-dir data/synthetic
+
+Copyright and Usage Information
+===============================
+
+This file is provided solely for the personal and private use of the students
+mentioned below and all CSC111 course staff at the University of Toronto.
+Any other parties not mentioned may not use or possess copies of
+this code, whether modified or otherwise.
+
+This file is Copyright (c) 2023
+Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
+"""
+from __future__ import annotations
+from typing import Optional
+import argparse
+import csv
+import math
+import os
+import random
+from entities import AMENITIES
+
+# The center of the St. George campus, used as the center of the generated grids.
+CAMPUS_CENTER = (43.66217731498653, -79.39539894245203)
+
+# Headers of the data files, as expected by load_all_data.load_data.
+BUILDING_HEADER = ['code', 'name', 'latitude', 'longitude'] + [f'amenity_{i}' for i in range(1, 8)]
+INTERSECTION_HEADER = ['ID', 'street1', 'street2', 'latitude', 'longitude'] + \
+                      [f'neighbour {i}' for i in range(1, 6)]
+MAX_DEGREE = 5
+
+# Frequencies of intersection degrees and of the number of amenities per building on the real campus.
+DEGREE_WEIGHTS = {2: 21, 3: 50, 4: 14, 5: 3}
+AMENITY_COUNT_WEIGHTS = {0: 111, 1: 16, 2: 13, 3: 4, 4: 7, 5: 1, 6: 1}
+
+# Buildings per intersection on the real campus.
+BUILDINGS_PER_INTERSECTION = 153 / 88
+
+_METRES_PER_DEGREE = math.pi * 6.371 * (10 ** 6) / 180
+
+
+def generate_grid_data(n_intersections: int, n_buildings: Optional[int] = None, seed: int = 0,
+                       spacing: float = 150.0, center: tuple[float, float] = CAMPUS_CENTER, shape_points: int = 0) \
+        -> tuple[list[list[str]], list[list[str]]]:
+    """Return the rows (header included) of a synthetic building file and a synthetic intersection file.
+
+    n_intersections: the number of intersections of the street graph.
+    n_buildings: the number of buildings. Defaults to the same buildings-per-intersection ratio as the campus.
+    seed: the seed of the random generator. The same arguments always give the same rows.
+    spacing: the average distance between neighbouring intersections, in metres.
+    center: the (latitude, longitude) of the center of the generated grid.
+    shape_points: the number of points every street between two intersections is drawn through, as in
+     OpenStreetMap ways. Each is written as an intersection of degree 2, after the n_intersections others.
+
+    Preconditions:
+      - n_intersections >= 2
+      - n_buildings is None or n_buildings >= 0
+      - spacing > 0
+      - shape_points >= 0
+
+    >>> buildings, intersections = generate_grid_data(50, 10, seed=1)
+    >>> len(buildings), len(intersections)
+    (11, 51)
+    >>> buildings[0] == BUILDING_HEADER and intersections[0] == INTERSECTION_HEADER
+    True
+    >>> _, shaped = generate_grid_data(50, 10, seed=1, shape_points=2)
+    >>> len(shaped) - 1 == 50 + 2 * sum(len(row) - row.count('') - 5 for row in intersections[1:]) // 2
+    True
+    """
+    rng = random.Random(seed)
+    if n_buildings is None:
+        n_buildings = round(n_intersections * BUILDINGS_PER_INTERSECTION)
+
+    side = spacing * math.sqrt(n_intersections)
+    points = [(rng.uniform(-side / 2, side / 2), rng.uniform(-side / 2, side / 2)) for _ in range(n_intersections)]
+    neighbours = _connect_points(points, spacing, rng)
+    if shape_points > 0:
+        _add_shape_points(points, neighbours, shape_points, spacing, rng)
+
+    metres_per_degree_longitude = _METRES_PER_DEGREE * math.cos(math.radians(center[0]))
+    coordinates = [(center[0] + y / _METRES_PER_DEGREE, center[1] + x / metres_per_degree_longitude)
+                   for x, y in points]
+
+    intersection_rows = [INTERSECTION_HEADER]
+    for i, (latitude, longitude) in enumerate(coordinates):
+        x, y = points[i]
+        row = [str(i + 1), f'Street {round(y / spacing)}', f'Avenue {round(x / spacing)}',
+               f'{latitude:.6f}', f'{longitude:.6f}']
+        row.extend(str(j + 1) for j in sorted(neighbours[i]))
+        row.extend([''] * (len(INTERSECTION_HEADER) - len(row)))
+        intersection_rows.append(row)
+
+    amenities = sorted(AMENITIES)
+    counts, count_weights = list(AMENITY_COUNT_WEIGHTS), list(AMENITY_COUNT_WEIGHTS.values())
+    building_rows = [BUILDING_HEADER]
+    for code in _building_codes(n_buildings):
+        x, y = points[rng.randrange(n_intersections)]  # next to a street intersection, not a shape point
+        x += rng.uniform(-spacing / 3, spacing / 3)
+        y += rng.uniform(-spacing / 3, spacing / 3)
+        latitude = center[0] + y / _METRES_PER_DEGREE
+        longitude = center[1] + x / metres_per_degree_longitude
+        chosen = rng.sample(amenities, rng.choices(counts, count_weights)[0])
+        row = [code, f'Synthetic Building {code}', f'{latitude:.6f}', f'{longitude:.6f}'] + chosen
+        row.extend([''] * (len(BUILDING_HEADER) - len(row)))
+        building_rows.append(row)
+
+    return building_rows, intersection_rows
+
+
+def write_grid_data(building_file: str, intersection_file: str, n_intersections: int,
+                    n_buildings: Optional[int] = None, seed: int = 0, spacing: float = 150.0,
+                    center: tuple[float, float] = CAMPUS_CENTER, shape_points: int = 0) -> None:
+    """Generate a synthetic dataset (see generate_grid_data) and write it to the two given csv files."""
+    building_rows, intersection_rows = generate_grid_data(n_intersections, n_buildings, seed, spacing, center,
+                                                          shape_points)
+    for path, rows in ((building_file, building_rows), (intersection_file, intersection_rows)):
+        with open(path, 'w', newline='') as output_file:
+            csv.writer(output_file, lineterminator='\n').writerows(rows)
+
+
+def _connect_points(points: list[tuple[float, float]], spacing: float, rng: random.Random) -> list[set[int]]:
+    """Return the neighbours of every point of a connected random geometric graph over points.
+    Every point is joined to its nearest points with spare degree, until it reaches a degree drawn from
+    DEGREE_WEIGHTS. The components left are then joined through their closest pair of points found.
+    """
+    cells = {}
+    for i, (x, y) in enumerate(points):
+        cells.setdefault((math.floor(x / spacing), math.floor(y / spacing)), []).append(i)
+
+    degrees, degree_weights = list(DEGREE_WEIGHTS), list(DEGREE_WEIGHTS.values())
+    targets = rng.choices(degrees, degree_weights, k=len(points))
+    neighbours = [set() for _ in points]
+
+    order = list(range(len(points)))
+    rng.shuffle(order)
+    for i in order:
+        if len(neighbours[i]) >= targets[i]:
+            continue
+        for j in _nearby_points(points, cells, spacing, i, 2):
+            if len(neighbours[i]) >= targets[i]:
+                break
+            if j not in neighbours[i] and len(neighbours[j]) < targets[j]:
+                neighbours[i].add(j)
+                neighbours[j].add(i)
+
+    _join_components(points, cells, spacing, neighbours)
+    return neighbours
+
+
+def _add_shape_points(points: list[tuple[float, float]], neighbours: list[set[int]], shape_points: int,
+                      spacing: float, rng: random.Random) -> None:
+    """Mutate points and neighbours to draw every street between two points through shape_points new points,
+    appended to points. The new points are spread along a slight random bend, and each one is only joined to
+    the points before and after it along the street.
+    """
+    streets = [(i, j) for i in range(len(points)) for j in sorted(neighbours[i]) if i < j]
+    for i, j in streets:
+        (x1, y1), (x2, y2) = points[i], points[j]
+        length = math.hypot(x2 - x1, y2 - y1) or 1.0
+        bend = rng.uniform(-spacing / 10, spacing / 10)
+        neighbours[i].remove(j)
+        neighbours[j].remove(i)
+        previous = i
+        for k in range(1, shape_points + 1):
+            t = k / (shape_points + 1)
+            offset = bend * math.sin(math.pi * t)  # perpendicular to the street, largest in its middle
+            points.append((x1 + t * (x2 - x1) - offset * (y2 - y1) / length,
+                           y1 + t * (y2 - y1) + offset * (x2 - x1) / length))
+            neighbours.append({previous})
+            neighbours[previous].add(len(points) - 1)
+            previous = len(points) - 1
+        neighbours[previous].add(j)
+        neighbours[j].add(previous)
+
+
+def _nearby_points(points: list[tuple[float, float]], cells: dict[tuple[int, int], list[int]],
+                   spacing: float, i: int, radius: int) -> list[int]:
+    """Return the points (other than i) in the cells within radius cells of point i, closest first."""
+    x, y = points[i]
+    cx, cy = math.floor(x / spacing), math.floor(y / spacing)
+    found = []
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            found.extend(j for j in cells.get((cx + dx, cy + dy), ()) if j != i)
+    found.sort(key=lambda j: (points[j][0] - x) ** 2 + (points[j][1] - y) ** 2)
+    return found
+
+
+def _join_components(points: list[tuple[float, float]], cells: dict[tuple[int, int], list[int]],
+                     spacing: float, neighbours: list[set[int]]) -> None:
+    """Mutate neighbours, adding edges until the graph is connected.
+    Every component is joined to the closest point (of another component) found in growing rings of cells
+    around its points. Points already at MAX_DEGREE are never given new neighbours.
+    """
+    parent = list(range(len(points)))
+
+    def find(i: int) -> int:
+        """Return the representative of the component of point i."""
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, adjacent in enumerate(neighbours):
+        for j in adjacent:
+            parent[find(i)] = find(j)
+
+    components = {}
+    for i in range(len(points)):
+        components.setdefault(find(i), []).append(i)
+
+    # join every component but the largest to another one; each join merges two components
+    max_radius = max(max(abs(cx), abs(cy)) for cx, cy in cells) * 2 + 1
+    for members in sorted(components.values(), key=len)[:-1]:
+        radius = 1
+        best = None
+        while best is None:
+            # once the rings cover the whole grid, allow going over MAX_DEGREE rather than failing
+            degree_cap = MAX_DEGREE if radius <= max_radius else math.inf
+            for i in members:
+                if len(neighbours[i]) >= degree_cap:
+                    continue
+                for j in _nearby_points(points, cells, spacing, i, radius):
+                    if find(j) != find(i) and len(neighbours[j]) < degree_cap:
+                        distance = (points[j][0] - points[i][0]) ** 2 + (points[j][1] - points[i][1]) ** 2
+                        if best is None or distance < best[0]:
+                            best = (distance, i, j)
+                        break
+            radius *= 2
+        _, i, j = best
+        neighbours[i].add(j)
+        neighbours[j].add(i)
+        parent[find(i)] = find(j)
+
+
+def _building_codes(n: int) -> list[str]:
+    """Return n distinct building codes made of upper case letters, all of the same length (at least 2).
+
+    >>> _building_codes(3)
+    ['AA', 'AB', 'AC']
+    """
+    length = 2
+    while 26 ** length < n:
+        length += 1
+    codes = []
+    for i in range(n):
+        letters = []
+        for _ in range(length):
+            i, remainder = divmod(i, 26)
+            letters.append(chr(ord('A') + remainder))
+        codes.append(''.join(reversed(letters)))
+    return codes
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """Parse the command line arguments and write a synthetic dataset."""
+    parser = argparse.ArgumentParser(description='Generate a synthetic UofT Speedrunner dataset.')
+    parser.add_argument('intersections', type=int, help='number of intersections')
+    parser.add_argument('--buildings', type=int, default=None, help='number of buildings')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spacing', type=float, default=150.0,
+                        help='average distance between neighbouring intersections, in metres')
+    parser.add_argument('--shape-points', type=int, default=0,
+                        help='number of points every street between two intersections is drawn through')
+    parser.add_argument('--out-dir', default='.')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    write_grid_data(os.path.join(args.out_dir, 'building_data.csv'),
+                    os.path.join(args.out_dir, 'intersections_data.csv'),
+                    args.intersections, args.buildings, args.seed, args.spacing, shape_points=args.shape_points)
+
+
+if __name__ == '__main__':
+    main()
@@ -16,13 +16,24 @@ this code, whether modified or otherwise.
 This file is Copyright (c) 2023
 Jason Barahan, Vibhas Raizada, Benjamin Sandoval, Eleonora Scognamiglio.
 """
+from typing import Optional
 import load_all_data
 import map_generation as mg
+from hot_reload import GridVersion
+from instrumentation import QueryStats
+from place_index import BUILDING, PlaceIndex
+from route_planning import SpeculativeRoute
 
 
-def run_path_generation(start: str, end: str, amenities: list[str] = None) -> None:
+def run_path_generation(start: str, end: str, amenities: list[str] = None,
+                        stats: Optional[QueryStats] = None,
+                        speculation: Optional[SpeculativeRoute] = None,
+                        version: Optional[GridVersion] = None) -> None:
     """
     Generate a path using the SpeedRunner.
+    If stats is not None, the search counters and the timings of every phase are recorded in it.
+    If speculation is not None, the paths are read from the results it precomputed for the start building.
+    The path is planned on version, or on the current version of the map data if it is None.
 
     Preconditions:
     - start is a valid building code
@@ -30,9 +41,9 @@ def run_path_generation(start: str, end: str, amenities: list[str] = None) -> No
     - all elements in amenities are valid amenity strings
     """
     if amenities is None or len(amenities) == 0:
-        mg.visualize_djikstra(start, end)
+        mg.visualize_djikstra(start, end, stats, speculation, version)
     else:
-        mg.visualize_djikstra_with_stopovers(start, end, amenities)
+        mg.visualize_djikstra_with_stopovers(start, end, amenities, stats, speculation, version)
 
 
 # IO functions
@@ -48,7 +59,9 @@ def io_main_menu() -> None:
     print('[A] Show me buildings at the University of Toronto')
     print('[B] Show me all the intersections at the University of Toronto')
     print('[C] Get me somewhere')
-    while string not in {'A', 'B', 'C'}:
+    print('[D] Compare routes by distance and road crossings')
+    print('[E] Pass by several buildings, in any order')
+    while string not in {'A', 'B', 'C', 'D', 'E'}:
         string = input()
 
         # user chooses option A
@@ -63,6 +76,14 @@ def io_main_menu() -> None:
         elif string == 'C':
             io_get_path()
 
+        # user chooses option D
+        elif string == 'D':
+            io_compare_routes()
+
+        # user chooses option E
+        elif string == 'E':
+            io_pass_by()
+
         # non recognizable input
         else:
             print("Invalid entry.")
@@ -74,56 +95,30 @@ def io_get_path() -> None:
     CLI IO handling for getting a desired shortest path.
     Asks te user for their starting point and final destination,
     as well as any potential stopovers.
+    As soon as the start building is known, the routes from it are precomputed in the background
+    (see route_planning.SpeculativeRoute) while the user types the rest of the query.
+    The whole query is answered on the version of the map data current when it starts, even if the data is
+    reloaded meanwhile (see hot_reload).
     """
-    # get building data
-    a = load_all_data.load_data('data/building_data.csv', 'data/intersections_data.csv')
-    building_codes = list(a.buildings)
-    code, code2, code3 = 'a', 'a', 'a'
+    code3 = 'a'
     amenities = []  # List of amenity strings. For example: ['gym', 'library']
+    version = mg.current()
 
-    # initial menu
-    print('For reference, here are the building codes:')
-
-    # print out all building codes
-    for key in a.buildings:
-        print(key + ': ' + a.buildings[key].name)
-
-    print('Lost? Use [ctrl] + [f]')
-
-    # 1: input start building
+    # 1: input start building, and start routing from it while the user keeps typing
     print('\n')
-    print('Input your start building code')
-    while code not in building_codes:
-        code = input('')
-
-        # destination in building codes
-        if code in building_codes:
-            pass
-
-        # non recognizable input
-        else:
-            print('Invalid entry.')
+    code = io_read_building('Input your start building (a code, a name or part of one)', version.places)
+    speculation = SpeculativeRoute(version.frozen, code)
 
     # 2: input end building
     print('\n')
-    print('Print your destination')
-    while code2 not in building_codes:
-        code2 = input('')
-
-        # destination in building codes
-        if code2 in building_codes:
-            pass
-
-        # non recognizable input
-        else:
-            print('Invalid entry.')
+    code2 = io_read_building('Print your destination', version.places)
 
     # 3: input stopovers
     print('\n')
     print('Input an amenity you would like your route to include (no quotation marks): ')
     print(str(load_all_data.AMENITIES))
     print('Or press enter if you have none to add')
-    while code3 not in building_codes and code3 != '':
+    while code3 != '':
         code3 = input('')
 
         # no more stopovers
@@ -131,7 +126,7 @@ def io_get_path() -> None:
             # print final info / generate path
             print('Directions from ' + code + ' to ' + code2 + ' including ' + str(amenities))
             print('Now processing...')
-            run_path_generation(code, code2, amenities)
+            run_path_generation(code, code2, amenities, speculation=speculation, version=version)
 
         # stopover is an amenity
         elif code3 in load_all_data.AMENITIES:
@@ -145,21 +140,106 @@ def io_get_path() -> None:
             print('Invalid entry.')
 
 
+def io_read_building(prompt: str, places: Optional[PlaceIndex] = None) -> str:
+    """
+    CLI IO handling for reading a building. Prints the prompt, and reads entries until one designates a single
+    building of places (see PlaceIndex.resolve_building), whose code is returned. If places is None, the place
+    index of the current version of the map data is used.
+    Other entries list the closest building matches, including misspelled ones, which can be picked by number.
+    """
+    if places is None:
+        places = mg.current().places
+    print(prompt)
+    suggestions = []
+    while True:
+        text = input('')
+        if text.isdigit() and 1 <= int(text) <= len(suggestions):
+            return suggestions[int(text) - 1].key
+        code = places.resolve_building(text)
+        if code is not None:
+            print(places.search(code, 1)[0].label)
+            return code
+
+        suggestions = places.search(text, 5, BUILDING)
+        if suggestions:
+            print('Did you mean (type the number):')
+            for i, place in enumerate(suggestions, start=1):
+                print(f'[{i}] {place.label}')
+        else:
+            print('Invalid entry.')
+
+
+def io_compare_routes() -> None:
+    """
+    CLI IO handling for choosing among the routes that trade walking distance against road crossings.
+    Asks the user for their starting point and final destination, lists the Pareto-optimal routes
+    (see route_planning.pareto_routes), and shows the one the user picks.
+    """
+    version = mg.current()
+    start = io_read_building('Input your start building (a code, a name or part of one)', version.places)
+    end = io_read_building('Print your destination', version.places)
+
+    try:
+        paths = version.planner.pareto_routes(start, end)
+    except ValueError as error:
+        print(error)
+        return
+
+    print('\n')
+    print('Pick a route:')
+    for i, path in enumerate(paths, start=1):
+        print(f'[{i}] {round(path.distance)} m, {int(path.cost)} road crossings')
+    choice = input('')
+    while not choice.isdigit() or not 1 <= int(choice) <= len(paths):
+        print('Invalid entry.')
+        choice = input('')
+    mg.visualize_route(start, end, paths[int(choice) - 1].route, version=version)
+
+
+def io_pass_by() -> None:
+    """
+    CLI IO handling for getting the shortest path passing by several buildings, in any order.
+    Asks the user for their starting point, final destination and the buildings to pass by, and shows the route
+    the query planner finds through their closest intersections (see QueryPlanner.find_route_through).
+    """
+    version = mg.current()
+    start = io_read_building('Input your start building (a code, a name or part of one)', version.places)
+    end = io_read_building('Print your destination', version.places)
+    passed = []
+    print('Type anything to add a building to pass by, or press enter if you have none to add')
+    while input('') != '':
+        passed.append(io_read_building('Input the building to pass by', version.places))
+        print('Type anything to add another building, or press enter if you are finished')
+
+    buildings = version.grid.buildings
+    intermediates = {buildings[code].closest_intersection.identifier for code in passed}
+    route = version.planner.find_route_through(buildings[start].closest_intersection.identifier,
+                                               buildings[end].closest_intersection.identifier, intermediates)
+    if route is None:
+        print('Sorry, it seems like your destination is not reacheable :(')
+        return
+    print('Directions from ' + start + ' to ' + end + ' passing by ' + str(passed))
+    mg.visualize_route(start, end, route, version=version)
+
+
 def io_show_buildings() -> None:
     """
-    CLI IO handling for showing all buildings, or showing buildings with a certain amenity.
+    CLI IO handling for showing all buildings, or showing buildings with certain amenities.
     """
     io = 'a'
+    wanted = []
     print('Are you looking for a building with a certain amenity in mind?')
     print('We have:' + str(list(load_all_data.AMENITIES)))
-    print('Type one of the above options, or press enter to show all buildings:')
+    print('Type one of the above options (or several, separated by commas, to find buildings with all of them),')
+    print('or press enter to show all buildings:')
     print('No quotation marks please')
-    while (io != '') and (io not in load_all_data.AMENITIES):
+    while (io != '') and not (wanted and all(a in load_all_data.AMENITIES for a in wanted)):
         io = input()
+        wanted = [a.strip() for a in io.split(',') if a.strip() != '']
         if io == '':
             mg.generate_all_building_points()
-        elif io in load_all_data.AMENITIES:
-            mg.generate_all_building_points(io)
+        elif wanted and all(a in load_all_data.AMENITIES for a in wanted):
+            mg.generate_all_building_points(wanted)
         else:
             print('Invalid entry. Try again')
 